@@ -0,0 +1,312 @@
+# ann.py
+# Approximate nearest-neighbour search for large galleries (tens of thousands of
+# identities): an IVF (inverted file) index in NumPy. Embeddings are clustered with
+# spherical k-means; a query only scores the members of its `nprobe` closest clusters.
+# nprobe is the recall/latency knob: nprobe = nlist is exact search.
+
+import math
+import threading
+
+import numpy as np
+
+from gallery import GalleryMatcher, drop_mismatched, l2_normalize
+
+
+# ---------------- K-MEANS ----------------
+def spherical_kmeans(vectors, k, iters=10, sample=None, seed=0):
+    """Unit-length centroids (k, dim) for unit-length `vectors`, trained on a sample."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    if sample and n > sample:
+        vectors = vectors[rng.choice(n, sample, replace=False)]
+        n = sample
+    k = max(1, min(k, n))
+    centroids = vectors[rng.choice(n, k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # re-seed empty clusters with random points so every list gets used
+            sums[empty] = vectors[rng.choice(n, int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+# ---------------- IVF INDEX ----------------
+class IVFIndex:
+    """
+    Inverted-file index over unit vectors, keyed by non-negative integer keys.
+
+    Each list keeps its members in a contiguous float32 block that grows by doubling,
+    so add() and remove() are incremental (remove swaps the last member into the hole).
+    The centroids are fixed after training; needs_retrain() tells when the gallery has
+    grown (or shrunk) far past what they were trained on.
+    """
+
+    def __init__(self, centroids, nprobe=8):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nlist, self.dim = self.centroids.shape
+        self.nprobe = nprobe
+        self.vecs = [np.zeros((0, self.dim), dtype=np.float32) for _ in range(self.nlist)]
+        self.keys = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+        self.sizes = np.zeros(self.nlist, dtype=np.int64)
+        self.where = {}  # key -> (list, position)
+        self.trained_size = 0
+
+    @classmethod
+    def train(cls, vectors, nlist=None, nprobe=8, iters=10, sample_per_list=40, seed=0):
+        vectors = l2_normalize(vectors)
+        if nlist is None:
+            nlist = default_nlist(len(vectors))
+        centroids = spherical_kmeans(vectors, nlist, iters=iters, sample=nlist * sample_per_list, seed=seed)
+        index = cls(centroids, nprobe)
+        index.trained_size = len(vectors)
+        return index
+
+    def __len__(self):
+        return len(self.where)
+
+    def _grow(self, lst, need):
+        cap = len(self.keys[lst])
+        if need <= cap:
+            return
+        cap = max(need, 2 * cap, 16)
+        vecs = np.zeros((cap, self.dim), dtype=np.float32)
+        keys = np.full(cap, -1, dtype=np.int64)
+        size = self.sizes[lst]
+        vecs[:size] = self.vecs[lst][:size]
+        keys[:size] = self.keys[lst][:size]
+        self.vecs[lst], self.keys[lst] = vecs, keys
+
+    def add(self, keys, vectors):
+        """Insert (or replace) vectors under `keys`."""
+        keys = np.asarray(keys, dtype=np.int64).ravel()
+        vectors = l2_normalize(vectors)
+        self.remove([k for k in keys.tolist() if k in self.where])
+        lists = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(lists, kind="stable")
+        bounds = np.flatnonzero(np.diff(lists[order])) + 1
+        for group in np.split(order, bounds):
+            if not len(group):
+                continue
+            lst = int(lists[group[0]])
+            start = int(self.sizes[lst])
+            self._grow(lst, start + len(group))
+            self.vecs[lst][start:start + len(group)] = vectors[group]
+            self.keys[lst][start:start + len(group)] = keys[group]
+            self.sizes[lst] = start + len(group)
+            for pos, key in enumerate(keys[group].tolist(), start):
+                self.where[key] = (lst, pos)
+
+    def remove(self, keys):
+        for key in keys:
+            loc = self.where.pop(int(key), None)
+            if loc is None:
+                continue
+            lst, pos = loc
+            last = int(self.sizes[lst]) - 1
+            if pos != last:
+                moved = int(self.keys[lst][last])
+                self.vecs[lst][pos] = self.vecs[lst][last]
+                self.keys[lst][pos] = moved
+                self.where[moved] = (lst, pos)
+            self.keys[lst][last] = -1
+            self.sizes[lst] = last
+
+    def search(self, queries, k=1, nprobe=None):
+        """
+        (keys, scores), both (n_queries, k), best first. Missing results (fewer than
+        k members in the probed lists) have key -1 and score -inf.
+        """
+        q = l2_normalize(queries)
+        n = q.shape[0]
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        best_keys = np.full((n, k), -1, dtype=np.int64)
+        best_scores = np.full((n, k), -np.inf, dtype=np.float32)
+        if not len(self.where):
+            return best_keys, best_scores
+
+        coarse = q @ self.centroids.T
+        if nprobe < self.nlist:
+            probe = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probe = np.broadcast_to(np.arange(self.nlist), (n, self.nlist))
+
+        # score list by list, each against all the queries that probe it
+        flat_lists = probe.ravel()
+        flat_queries = np.repeat(np.arange(n), probe.shape[1])
+        order = np.argsort(flat_lists, kind="stable")
+        flat_lists, flat_queries = flat_lists[order], flat_queries[order]
+        bounds = np.flatnonzero(np.diff(flat_lists)) + 1
+        for lists, qs in zip(np.split(flat_lists, bounds), np.split(flat_queries, bounds)):
+            lst = int(lists[0])
+            size = int(self.sizes[lst])
+            if not size:
+                continue
+            sims = q[qs] @ self.vecs[lst][:size].T
+            if size > k:
+                top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                sims = np.take_along_axis(sims, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(size), sims.shape)
+            cand_keys = np.concatenate([best_keys[qs], self.keys[lst][top]], axis=1)
+            cand_scores = np.concatenate([best_scores[qs], sims], axis=1)
+            keep = np.argsort(-cand_scores, axis=1)[:, :k]
+            best_keys[qs] = np.take_along_axis(cand_keys, keep, axis=1)
+            best_scores[qs] = np.take_along_axis(cand_scores, keep, axis=1)
+        return best_keys, best_scores
+
+    def members(self):
+        """(keys, vectors) of everything in the index."""
+        keys = [self.keys[i][:self.sizes[i]] for i in range(self.nlist)]
+        vecs = [self.vecs[i][:self.sizes[i]] for i in range(self.nlist)]
+        return np.concatenate(keys), np.concatenate(vecs)
+
+    def needs_retrain(self, factor=4.0):
+        """True once the index holds `factor` times more (or fewer) vectors than it was trained on."""
+        n, t = len(self.where), max(self.trained_size, 1)
+        return n > factor * t or n * factor < t
+
+
+def default_nlist(n):
+    """About 2*sqrt(n) lists: ~sqrt(n)/2 members each, at least 1."""
+    return max(1, int(round(2 * math.sqrt(n))))
+
+
+# ---------------- IVF GALLERY MATCHER ----------------
+class IVFGalleryMatcher(GalleryMatcher):
+    """
+    GalleryMatcher with an IVF index instead of the exact matrix product. Unlike the
+    exact matcher it is updated in place: apply_changes() inserts/replaces/removes
+    employees without retraining, and searches and updates are serialized by a lock,
+    so the recognizer can keep matching while the gallery changes. Only one thread
+    (the gallery reloader) may call apply_changes.
+    """
+
+    def __init__(self, ids, names, contacts, embeddings, nlist=None, nprobe=8, seed=0):
+        if not (len(ids) == len(names) == len(contacts) == len(embeddings)):
+            raise ValueError("ids, names, contacts and embeddings must have the same length")
+        self._lock = threading.RLock()
+        self._records = []      # slot -> record dict (None for a free slot)
+        self._slot_of = {}      # emp_id -> slot
+        self._free = []
+        self.nlist, self.nprobe, self.seed = nlist, nprobe, seed
+        ids, names, contacts, vecs = drop_mismatched(list(ids), list(names), list(contacts), embeddings)
+        vectors = np.stack(vecs) if vecs else None
+        self._dim = vectors.shape[1] if vectors is not None else 0
+        self.index = None
+        if vectors is not None:
+            self._train(vectors)
+            slots = self._assign_slots(ids, names, contacts)
+            self.index.add(slots, vectors)
+
+    @classmethod
+    def from_records(cls, records, **kwargs):
+        return cls(
+            [r["id"] for r in records],
+            [r["name"] for r in records],
+            [r.get("contact") for r in records],
+            [r["embedding"] for r in records],
+            **kwargs,
+        )
+
+    def _train(self, vectors):
+        self.index = IVFIndex.train(vectors, self.nlist, self.nprobe, seed=self.seed)
+        self._dim = vectors.shape[1]
+
+    def _assign_slots(self, ids, names, contacts):
+        slots = []
+        for emp_id, name, contact in zip(ids, names, contacts):
+            rec = {"id": emp_id, "name": name, "contact": contact}
+            slot = self._slot_of.get(emp_id)
+            if slot is None:
+                slot = self._free.pop() if self._free else len(self._records)
+                if slot == len(self._records):
+                    self._records.append(None)
+                self._slot_of[emp_id] = slot
+            self._records[slot] = rec
+            slots.append(slot)
+        return slots
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    @property
+    def ids(self):
+        with self._lock:
+            return [self._records[s]["id"] for s in sorted(self._slot_of.values())]
+
+    @property
+    def dim(self):
+        return self._dim
+
+    def record(self, idx):
+        return dict(self._records[idx])
+
+    def apply_changes(self, upserted, deleted_ids=()):
+        """`upserted`: records ({"id", "name", "embedding", "contact"}) added or changed."""
+        upserted, deleted_ids = list(upserted), list(deleted_ids)
+        if self._dim:
+            # a changed row of the wrong size leaves the gallery instead of breaking the index
+            bad = [r for r in upserted if np.asarray(r["embedding"]).size != self._dim]
+            for r in bad:
+                print(f"[WARN] Skipping employee {r['id']}: embedding has "
+                      f"{np.asarray(r['embedding']).size} values, expected {self._dim}")
+            upserted = [r for r in upserted if np.asarray(r["embedding"]).size == self._dim]
+            deleted_ids += [r["id"] for r in bad]
+        with self._lock:
+            gone = [self._slot_of.pop(i) for i in deleted_ids if i in self._slot_of]
+            if self.index is not None:
+                self.index.remove(gone)
+            for slot in gone:
+                self._records[slot] = None
+                self._free.append(slot)
+            if not upserted:
+                return
+            vectors = np.stack([np.asarray(r["embedding"], dtype=np.float32).ravel() for r in upserted])
+            if self.index is None:
+                self._train(vectors)
+            slots = self._assign_slots([r["id"] for r in upserted], [r["name"] for r in upserted],
+                                       [r.get("contact") for r in upserted])
+            self.index.add(slots, vectors)
+            retrain = len(self.index) > 0 and self.index.needs_retrain()
+            if retrain:
+                keys, vectors = self.index.members()
+        if retrain:
+            # k-means runs outside the lock; the single writer means nothing changes meanwhile
+            index = IVFIndex.train(vectors, self.nlist, self.nprobe, seed=self.seed)
+            index.add(keys, vectors)
+            with self._lock:
+                self.index = index
+
+    def search(self, queries, k=1):
+        """Same contract as GalleryMatcher.search; indices are slots for record()."""
+        q = np.asarray(queries, dtype=np.float32)
+        nq = 1 if q.ndim == 1 else q.shape[0]
+        with self._lock:
+            n = len(self._slot_of)
+            if n == 0 or self.index is None:
+                return np.zeros((nq, 0), dtype=np.int64), np.zeros((nq, 0), dtype=np.float32)
+            keys, scores = self.index.search(q, max(1, min(k, n)))
+        # lists can hold fewer than k candidates; trim columns nobody filled
+        filled = (keys >= 0).any(axis=0)
+        return keys[:, filled], scores[:, filled]
+
+    def match_batch(self, queries, k=1):
+        with self._lock:
+            idx, scores = self.search(queries, k)
+            return [[(self.record(int(i)), float(s)) for i, s in zip(row_i, row_s) if i >= 0]
+                    for row_i, row_s in zip(idx, scores)]
+
+    def best_match(self, embedding):
+        with self._lock:
+            idx, scores = self.search(embedding, 1)
+            if idx.shape[1] == 0 or idx[0, 0] < 0:
+                return None, 0
+            score = float(scores[0, 0])
+            if score <= 0:
+                return None, 0
+            return self.record(int(idx[0, 0])), score
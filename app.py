@@ -2,20 +2,35 @@
 # app.py (Final Merged Version)
 
 import os
-import pickle
 import random
-import numpy as np
+import secrets
 import mysql.connector
-from flask import Flask, render_template, request, jsonify, url_for, session, redirect, send_file, abort
+from flask import Flask, render_template, request, jsonify, url_for, session, redirect, send_file, abort, g, Response
 from datetime import datetime, date, timedelta, time as dtime
 import io
+import threading
+import time
+import traceback
 import pandas as pd
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # --- For face capture / embeddings ---
 import cv2
 import cv2.data
-from keras_facenet import FaceNet
+from tflite_embedder import load_facenet
+from detection import create_detector
+from embedding import BatchEmbedder
+from enrollment import EnrollmentCapture, ENROLL_BATCH
+from enrollment_jobs import JobRunner, JobError
+from gallery import DuplicateIndex
+from gallery_sync import GallerySync, bump_gallery_version
+from embedding_codec import encode_embedding, decode_embedding
+import metrics
+import profiling
+from contextlib import contextmanager
+from db import ConnectionPool
+import migrations
+from attendance_cache import AttendanceCache, attendance_version, bump_attendance_versions
 
 # ---------------- CONFIG ----------------
 app = Flask(__name__)
@@ -28,69 +43,107 @@ DB_CONFIG = {
     "database": "face_db"
 }
 
+# ---------------- metrics ----------------
+# Prometheus text format on GET /metrics (local requests only unless METRICS_ALLOW_REMOTE=1)
+METRICS_ALLOW_REMOTE = os.environ.get("METRICS_ALLOW_REMOTE", "0") == "1"
+REQUEST_SECONDS = metrics.histogram("app_request_seconds", "Flask request latency by route",
+                                    ["route", "method", "status"])
+DB_QUERY_SECONDS = metrics.histogram("app_db_query_seconds", "Flask app DB statement time by verb", ["op"])
+EXCEL_EXPORT_SECONDS = metrics.histogram("app_excel_export_seconds", "Time to build an Excel attendance export",
+                                         ["route"])
+
+
+# On-demand profiling (see profiling.py) of the next N requests to one route: POST
+# /admin/profile (route, count, mode) or PROFILE_REQUESTS=N PROFILE_ROUTE=<rule> at startup.
+request_profiler = profiling.Profiler("requests")
+profiling.arm_from_env(request_profiler, "PROFILE_REQUESTS", "PROFILE_ROUTE")
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    if request_profiler.session is not None and request.url_rule is not None:
+        g.profile = request_profiler.begin(request.url_rule.rule, root=f"route:{request.url_rule.rule}")
+
+
+@app.teardown_request
+def _end_request_profile(exc):
+    request_profiler.end(g.pop("profile", None))
+
+
+@app.after_request
+def _observe_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        REQUEST_SECONDS.labels(route=route, method=request.method,
+                               status=response.status_code).observe(time.perf_counter() - started)
+    return response
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not METRICS_ALLOW_REMOTE and request.remote_addr not in ("127.0.0.1", "::1"):
+        return abort(403)
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@contextmanager
+def excel_export(route):
+    """Times an Excel export for metrics and profiles."""
+    started = time.perf_counter()
+    with profiling.stage("excel"):
+        yield
+    EXCEL_EXPORT_SECONDS.labels(route=route).observe(time.perf_counter() - started)
+
+
+# ---------------- DB CONNECTION POOL ----------------
+# Requests check a connection out of one process-wide pool (db.ConnectionPool) and
+# return it when their `with db_connection()` block ends. A checkout pings the
+# connection first and waits up to DB_POOL_TIMEOUT_SEC when all are in use.
+DB_POOL_SIZE = int(os.environ.get("APP_DB_POOL_SIZE", "8"))  # mysql.connector allows at most 32
+DB_POOL_TIMEOUT_SEC = float(os.environ.get("APP_DB_POOL_TIMEOUT", "10"))
+db_pool = ConnectionPool(DB_CONFIG, size=DB_POOL_SIZE, name="app_pool", timeout=DB_POOL_TIMEOUT_SEC)
+metrics.gauge("app_db_pool_in_use", "Pooled DB connections checked out").set_function(lambda: db_pool.in_use)
+metrics.gauge("app_db_pool_size", "DB connection pool size").set(DB_POOL_SIZE)
+
+# ---------------- Attendance read cache ----------------
+# /admin/attendance/<emp_id> and /api/attendance_range responses, per employee and
+# date range. An entry is used only while the employee's attendance_versions counter
+# (bumped by every attendance writer, in any process) still matches; see attendance_cache.py.
+ATTENDANCE_CACHE_SIZE = int(os.environ.get("APP_ATTENDANCE_CACHE_SIZE", "2048"))  # 0 disables
+ATTENDANCE_CACHE_TTL_SEC = float(os.environ.get("APP_ATTENDANCE_CACHE_TTL", "300"))
+attendance_cache = AttendanceCache(ATTENDANCE_CACHE_SIZE, ATTENDANCE_CACHE_TTL_SEC)
+metrics.gauge("app_attendance_cache_entries", "Cached attendance responses").set_function(lambda: len(attendance_cache))
+
+@contextmanager
+def db_connection():
+    """Pooled connection (queries timed for metrics), returned to the pool on exit."""
+    with db_pool.connection() as conn:
+        yield metrics.TimedConnection(conn, DB_QUERY_SECONDS)
+
 def get_db_conn():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Pooled connection for code that closes it itself (GallerySync); close() returns it."""
+    return metrics.TimedConnection(db_pool.connect(), DB_QUERY_SECONDS)
 
 # ---------------- ensure tables exist ----------------
 def ensure_tables():
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS employees (
-        id VARCHAR(50) PRIMARY KEY,
-        name VARCHAR(100),
-        embedding LONGBLOB,
-        password_hash VARCHAR(255),
-        contact_number VARCHAR(20)
-    );
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS attendance (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        emp_id VARCHAR(50),
-        date DATE,
-        in1 TIME,
-        out1 TIME,
-        in2 TIME,
-        out2 TIME,
-        FOREIGN KEY (emp_id) REFERENCES employees(id)
-    );
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-    # ---------------- Admins table ----------------
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS admins (
-        admin_id VARCHAR(50) PRIMARY KEY,
-        name VARCHAR(100),
-        password_hash VARCHAR(255),
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
-    conn.commit()
-
-    # Auto-create default admin only if missing
-    cur.execute("SELECT admin_id FROM admins WHERE admin_id='admin'")
-    if not cur.fetchone():
-        pw_hash = generate_password_hash("admin123")
-        cur.execute("""
-            INSERT INTO admins (admin_id, name, password_hash)
-            VALUES ('admin', 'Super Admin', %s)
-        """, (pw_hash,))
-        conn.commit()
+    # Schema changes live in migrations.py; this applies any that are pending.
+    with db_connection() as conn:
+        migrations.migrate(conn)
+        cur = conn.cursor()
+
+        # Auto-create default admin only if missing
+        cur.execute("SELECT admin_id FROM admins WHERE admin_id='admin'")
+        if not cur.fetchone():
+            pw_hash = generate_password_hash("admin123")
+            cur.execute("""
+                INSERT INTO admins (admin_id, name, password_hash)
+                VALUES ('admin', 'Super Admin', %s)
+            """, (pw_hash,))
+            conn.commit()
 
-    cur.close()
-    conn.close()
+        cur.close()
 
 ensure_tables()
 
@@ -144,70 +197,139 @@ def seconds_between(start_t, end_t):
         return 0
 
 # ---------------- FACE MODEL (Lazy Loading) ----------------
+# EMBED_BACKEND=tflite runs registration capture on the converted model (see
+# convert_tflite.py); keep it the same model recognize.py uses.
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "keras")
+TFLITE_MODEL_PATH = os.environ.get("TFLITE_MODEL", "models/facenet_int8.tflite")
 facenet_model = None
 
 def get_facenet():
     global facenet_model
     if facenet_model is None:
-        facenet_model = FaceNet()
+        facenet_model = load_facenet(EMBED_BACKEND, TFLITE_MODEL_PATH)
     return facenet_model
 
-CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
-
-def face_distance(a, b):
-    a = a.astype("float32")
-    b = b.astype("float32")
-    return float(np.linalg.norm(a - b))
+# Registration capture sees one large face close to the camera, so the coarser
+# "haar-enroll" preset is enough; any detection.DETECTOR_PRESETS name works.
+ENROLL_DETECTOR = os.environ.get("ENROLL_DETECTOR", "haar-enroll")
+# Registration camera: a device index ("0") or a stream URL.
+ENROLL_CAMERA = os.environ.get("ENROLL_CAMERA", "0")
+face_detector = None
+
+def get_face_detector():
+    global face_detector
+    if face_detector is None:
+        face_detector = create_detector(ENROLL_DETECTOR)
+    return face_detector
+
+def enroll_camera_source():
+    return int(ENROLL_CAMERA) if ENROLL_CAMERA.isdigit() else ENROLL_CAMERA
+
+# ---------------- DUPLICATE FACE CHECK ----------------
+# Registration refuses a face within DUPLICATE_DISTANCE (Euclidean) of an enrolled one.
+# The enrolled embeddings are kept in a process-wide DuplicateIndex, loaded on first
+# use; every check first asks GallerySync whether `sync_versions` moved (one small
+# query) and applies only the employees added, changed or deleted since.
+DUPLICATE_DISTANCE = 0.9
+face_index = DuplicateIndex()
+face_index_sync = None
+face_index_lock = threading.Lock()
+
+def _index_records(records):
+    for rec in records:
+        try:
+            face_index.upsert(rec["id"], rec["name"], rec["embedding"])
+        except ValueError as e:
+            print(f"[WARN] duplicate index: {e}")
+
+def refresh_face_index():
+    """Bring the duplicate index up to date with `employees`; returns it."""
+    global face_index_sync
+    with face_index_lock:
+        if face_index_sync is None:
+            sync = GallerySync(get_db_conn, decode_embedding)
+            t0 = time.perf_counter()
+            _index_records(sync.load())
+            face_index_sync = sync
+            print(f"[INFO] Duplicate index: {len(face_index)} faces loaded in {time.perf_counter() - t0:.2f}s")
+        else:
+            changes = face_index_sync.check()
+            if changes:
+                upserted, deleted = changes
+                for emp_id in deleted:
+                    face_index.remove(emp_id)
+                _index_records(face_index_sync.records[i] for i in upserted if i in face_index_sync.records)
+    return face_index
+
+def find_duplicate_face(embedding, max_distance=DUPLICATE_DISTANCE):
+    """(emp_id, name) of an enrolled face within max_distance of `embedding`, else None."""
+    index = refresh_face_index()
+    with face_index_lock:
+        try:
+            hit = index.nearest(embedding)
+        except ValueError:  # enrolled with a different model (embedding size)
+            return None
+    if hit is not None and hit[2] <= max_distance:
+        return hit[0], hit[1]
+    return None
 
-def capture_face_embedding(num_images=50):
-    model = get_facenet()
-    if face_cascade.empty():
+enroll_embedder = None
+
+def get_enroll_embedder():
+    global enroll_embedder
+    if enroll_embedder is None:
+        enroll_embedder = BatchEmbedder(get_facenet(), capacity=ENROLL_BATCH)
+    return enroll_embedder
+
+def capture_face_embedding(num_images=50, progress=None, cancelled=None):
+    """
+    Enrollment embedding from ENROLL_CAMERA: at most `num_images` usable frames, fewer
+    once the mean has converged (see enrollment.py). Returns (True, embedding) or
+    (False, message). progress(**fields) is called after every frame; capture stops
+    when cancelled() turns true.
+    """
+    try:
+        detector = get_face_detector()
+    except (ValueError, FileNotFoundError) as e:
+        print(f"[ERROR] Face detector '{ENROLL_DETECTOR}': {e}")
         return False, "Face detection model not loaded."
+    embedder = get_enroll_embedder()
 
-    cap = cv2.VideoCapture(0)
+    cap = cv2.VideoCapture(enroll_camera_source())
     if not cap.isOpened():
         return False, "Unable to access camera."
 
-    collected = []
+    capture = EnrollmentCapture(embedder, detector, max_samples=num_images)
+    # runs on an enrollment job worker thread: no preview window (cv2.imshow/waitKey
+    # belong to the main thread); the page shows progress and has a cancel button
     try:
-        while len(collected) < num_images:
+        while not capture.done:
+            if cancelled is not None and cancelled():
+                return False, "Face capture cancelled."
             ret, frame = cap.read()
             if not ret:
                 continue
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-
-            if len(faces):
-                x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
-                pad = 10
-                x1 = max(x - pad, 0)
-                y1 = max(y - pad, 0)
-                x2 = min(x + w + pad, frame.shape[1])
-                y2 = min(y + h + pad, frame.shape[0])
-                face_img = frame[y1:y2, x1:x2]
-                face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-                face_rgb = cv2.resize(face_rgb, (160, 160))
-                emb = model.embeddings([face_rgb])[0]
-                collected.append(emb)
-
-            cv2.imshow("Face Capture - Press q to cancel", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                cap.release()
-                cv2.destroyAllWindows()
-                return False, "Face capture cancelled."
-
+            _, reason = capture.add_frame(frame)
+            if progress is not None:
+                progress(frames=capture.frames, accepted=capture.accepted, target=num_images,
+                         no_face=capture.no_face, rejected=dict(capture.rejected), last_reject=reason,
+                         convergence=capture.last_change)
+    except Exception:
+        traceback.print_exc()
+        return False, "Face capture failed. Please try again."
+    finally:
         cap.release()
-        cv2.destroyAllWindows()
-        return True, np.mean(collected, axis=0)
 
-    except Exception as e:
-        try:
-            cap.release()
-            cv2.destroyAllWindows()
-        except:
-            pass
-        return False, f"Error: {e}"
+    emb = capture.result()
+    stats = capture.stats()
+    rejected = ", ".join(f"{k} {v}" for k, v in sorted(stats["rejected"].items())) or "none"
+    print(f"[INFO] Enrollment capture: {stats['embedded']} faces from {stats['frames']} frames "
+          f"in {stats['seconds']:.1f}s (stop: {stats['stop']}, no face {stats['no_face']}, "
+          f"rejected: {rejected}, {stats['batches']} batches, {stats['embed_s']:.2f}s inference)")
+    if emb is None or stats["embedded"] < capture.min_samples:
+        return False, ("Face not captured clearly. Face the camera in good light and hold still, "
+                       "then try again.")
+    return True, emb
 
 # ---------------- ROLE SELECTION PAGE ----------------
 @app.route("/", methods=["GET"])
@@ -221,12 +343,11 @@ def admin_login():
         admin_id = request.form.get("admin_id", "").strip()
         password = request.form.get("password", "").strip()
 
-        conn = get_db_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT password_hash, name FROM admins WHERE admin_id=%s", (admin_id,))
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT password_hash, name FROM admins WHERE admin_id=%s", (admin_id,))
+            row = cur.fetchone()
+            cur.close()
 
         if not row:
             return render_template("admin_login.html", error="Admin not found.")
@@ -266,12 +387,11 @@ def admin_employees():
     if not session.get("is_admin"):
         return jsonify({"error": "unauthorized"}), 403
 
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, contact_number FROM employees ORDER BY id")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, name, contact_number FROM employees ORDER BY id")
+        rows = cur.fetchall()
+        cur.close()
 
     arr = [{"id": r[0], "name": r[1], "contact": r[2]} for r in rows]
     return jsonify(arr)
@@ -282,28 +402,32 @@ def admin_attendance(emp_id):
     if not session.get("is_admin"):
         return jsonify({"error": "unauthorized"}), 403
 
-    conn = get_db_conn()
-    cur = conn.cursor()
+    cache_key = (emp_id, "admin")
+    with db_connection() as conn:
+        cur = conn.cursor()
+        version = attendance_version(cur, emp_id)  # before the rows, see attendance_cache.py
+        cached = attendance_cache.get(cache_key, version) if ATTENDANCE_CACHE_SIZE else None
+        if cached is not None:
+            cur.close()
+            return jsonify(cached)
 
-    # Get employee name
-    cur.execute("SELECT name FROM employees WHERE id=%s", (emp_id,))
-    r = cur.fetchone()
-    if not r:
-        cur.close()
-        conn.close()
-        return jsonify({"error": "not found"}), 404
+        # Get employee name
+        cur.execute("SELECT name FROM employees WHERE id=%s", (emp_id,))
+        r = cur.fetchone()
+        if not r:
+            cur.close()
+            return jsonify({"error": "not found"}), 404
 
-    name = r[0]
+        name = r[0]
 
-    # Get attendance rows
-    cur.execute("""
-        SELECT date, in1, out1, in2, out2 
-        FROM attendance 
-        WHERE emp_id=%s ORDER BY date DESC LIMIT 365
-    """, (emp_id,))
-    raw_rows = cur.fetchall()
-    cur.close()
-    conn.close()
+        # Get attendance rows
+        cur.execute("""
+            SELECT date, in1, out1, in2, out2 
+            FROM attendance 
+            WHERE emp_id=%s ORDER BY date DESC LIMIT 365
+        """, (emp_id,))
+        raw_rows = cur.fetchall()
+        cur.close()
 
     formatted = []
     for (d, in1, out1, in2, out2) in raw_rows:
@@ -332,7 +456,10 @@ def admin_attendance(emp_id):
             "present_hours": float(total_hours)
         })
 
-    return jsonify({"name": name, "rows": formatted})
+    payload = {"name": name, "rows": formatted}
+    if ATTENDANCE_CACHE_SIZE:
+        attendance_cache.put(cache_key, version, payload)
+    return jsonify(payload)
 
 # --------------------- ADMIN: DELETE EMPLOYEE ---------------------
 @app.route("/admin/delete_employee/<emp_id>", methods=["POST"])
@@ -340,16 +467,17 @@ def admin_delete_employee(emp_id):
     if not session.get("is_admin"):
         return jsonify({"error": "unauthorized"}), 403
 
-    conn = get_db_conn()
-    cur = conn.cursor()
+    with db_connection() as conn:
+        cur = conn.cursor()
 
-    # Delete attendance first
-    cur.execute("DELETE FROM attendance WHERE emp_id=%s", (emp_id,))
-    cur.execute("DELETE FROM employees WHERE id=%s", (emp_id,))
+        # Delete attendance first
+        cur.execute("DELETE FROM attendance WHERE emp_id=%s", (emp_id,))
+        cur.execute("DELETE FROM employees WHERE id=%s", (emp_id,))
+        bump_gallery_version(cur)
+        bump_attendance_versions(cur, [emp_id])
 
-    conn.commit()
-    cur.close()
-    conn.close()
+        conn.commit()
+        cur.close()
 
     return jsonify({"ok": True})
 
@@ -365,21 +493,47 @@ def admin_update_employee(emp_id):
     if not name:
         return jsonify({"error": "Name required"}), 400
 
-    conn = get_db_conn()
-    cur = conn.cursor()
+    with db_connection() as conn:
+        cur = conn.cursor()
 
-    cur.execute("""
-        UPDATE employees 
-        SET name=%s, contact_number=%s 
-        WHERE id=%s
-    """, (name, contact, emp_id))
+        cur.execute("""
+            UPDATE employees 
+            SET name=%s, contact_number=%s 
+            WHERE id=%s
+        """, (name, contact, emp_id))
+        bump_gallery_version(cur)
+        bump_attendance_versions(cur, [emp_id])  # cached responses carry the name
 
-    conn.commit()
-    cur.close()
-    conn.close()
+        conn.commit()
+        cur.close()
 
     return jsonify({"ok": True})
 
+# --------------------- ADMIN: PROFILING ---------------------
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """GET: profiler status. POST route=<rule>&count=N&mode=cprofile|sample: profile the next N requests."""
+    if not session.get("is_admin"):
+        return jsonify({"error": "unauthorized"}), 403
+    if request.method == "GET":
+        return jsonify(request_profiler.status())
+
+    data = request.get_json(silent=True) or request.form
+    route = (data.get("route") or "").strip() or None
+    mode = data.get("mode") or "cprofile"
+    try:
+        count = int(data.get("count") or 20)
+    except (TypeError, ValueError):
+        return jsonify({"error": "count must be a number"}), 400
+    if mode not in profiling.MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(profiling.MODES)}"}), 400
+    if route and route not in {r.rule for r in app.url_map.iter_rules()}:
+        return jsonify({"error": f"unknown route {route}"}), 400
+    if count < 1:
+        return jsonify({"error": "count must be at least 1"}), 400
+    request_profiler.arm(count, mode, route)
+    return jsonify(request_profiler.status())
+
 # --------------------- ADMIN: DOWNLOAD ANY EMPLOYEE ATTENDANCE ---------------------
 @app.route("/admin/download/<emp_id>")
 def admin_download(emp_id):
@@ -387,16 +541,6 @@ def admin_download(emp_id):
     if not session.get("is_admin"):
         return abort(403)
 
-    # Fetch employee name from DB
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM employees WHERE id=%s", (emp_id,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
-
-    emp_name = row[0] if row else "Unknown"
-
     # Read date range
     start = request.args.get("start")
     end = request.args.get("end")
@@ -407,19 +551,23 @@ def admin_download(emp_id):
     except:
         return "Invalid date format", 400
 
-    # Fetch attendance rows
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT date, in1, out1, in2, out2
-        FROM attendance
-        WHERE emp_id=%s AND date BETWEEN %s AND %s
-        ORDER BY date
-    """, (emp_id, start_date, end_date))
+    # Fetch employee name and attendance rows (one pooled connection)
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM employees WHERE id=%s", (emp_id,))
+        row = cur.fetchone()
 
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+        cur.execute("""
+            SELECT date, in1, out1, in2, out2
+            FROM attendance
+            WHERE emp_id=%s AND date BETWEEN %s AND %s
+            ORDER BY date
+        """, (emp_id, start_date, end_date))
+
+        rows = cur.fetchall()
+        cur.close()
+
+    emp_name = row[0] if row else "Unknown"
 
     # Convert to DataFrame
     df_rows = []
@@ -432,48 +580,49 @@ def admin_download(emp_id):
             "out2": time_to_str_safe(out2) or ""
         })
 
-    df = pd.DataFrame(df_rows)
-    output = io.BytesIO()
+    with excel_export("admin_download"):
+        df = pd.DataFrame(df_rows)
+        output = io.BytesIO()
 
-    # Excel writer with formatting
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        workbook = writer.book
-        worksheet = workbook.add_worksheet("Attendance")
-        writer.sheets["Attendance"] = worksheet
+        # Excel writer with formatting
+        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+            workbook = writer.book
+            worksheet = workbook.add_worksheet("Attendance")
+            writer.sheets["Attendance"] = worksheet
 
-        # Styles
-        header_format = workbook.add_format({
-            "bold": True, "font_color": "white",
-            "bg_color": "#4F81BD", "border": 1, "align": "center"
-        })
-        label_format = workbook.add_format({"bold": True, "bg_color": "#DCE6F1", "border": 1})
-        value_format = workbook.add_format({"border": 1})
+            # Styles
+            header_format = workbook.add_format({
+                "bold": True, "font_color": "white",
+                "bg_color": "#4F81BD", "border": 1, "align": "center"
+            })
+            label_format = workbook.add_format({"bold": True, "bg_color": "#DCE6F1", "border": 1})
+            value_format = workbook.add_format({"border": 1})
 
-        # Title
-        worksheet.merge_range("A1:F1", "Employee Attendance Report", header_format)
+            # Title
+            worksheet.merge_range("A1:F1", "Employee Attendance Report", header_format)
 
-        # Employee details
-        worksheet.write("A3", "Employee Name", label_format)
-        worksheet.write("B3", emp_name, value_format)
+            # Employee details
+            worksheet.write("A3", "Employee Name", label_format)
+            worksheet.write("B3", emp_name, value_format)
 
-        worksheet.write("A4", "Employee ID", label_format)
-        worksheet.write("B4", emp_id, value_format)
+            worksheet.write("A4", "Employee ID", label_format)
+            worksheet.write("B4", emp_id, value_format)
 
-        worksheet.write("A5", "From Date", label_format)
-        worksheet.write("B5", str(start_date), value_format)
+            worksheet.write("A5", "From Date", label_format)
+            worksheet.write("B5", str(start_date), value_format)
 
-        worksheet.write("A6", "To Date", label_format)
-        worksheet.write("B6", str(end_date), value_format)
+            worksheet.write("A6", "To Date", label_format)
+            worksheet.write("B6", str(end_date), value_format)
 
-        # Insert DataFrame starting row 8
-        df.to_excel(writer, index=False, startrow=7, sheet_name="Attendance")
+            # Insert DataFrame starting row 8
+            df.to_excel(writer, index=False, startrow=7, sheet_name="Attendance")
 
-        # Auto column widths
-        for i, col in enumerate(df.columns):
-            column_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.set_column(i, i, column_len)
+            # Auto column widths
+            for i, col in enumerate(df.columns):
+                column_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
+                worksheet.set_column(i, i, column_len)
 
-    output.seek(0)
+        output.seek(0)
     filename = f"{emp_id}attendance{start_date}_{end_date}.xlsx"
 
     return send_file(
@@ -493,12 +642,11 @@ def login():
         emp_id = request.form.get("emp_id", "").strip()
         password = request.form.get("password", "").strip()
 
-        conn = get_db_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT name, password_hash FROM employees WHERE id=%s", (emp_id,))
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT name, password_hash FROM employees WHERE id=%s", (emp_id,))
+            row = cur.fetchone()
+            cur.close()
 
         if not row:
             return render_template("login.html", error="Employee ID not found.")
@@ -535,106 +683,199 @@ def dashboard():
     )
 
 # ---------------- TWILIO OTP (SMS) ----------------
-from twilio.rest import Client
+from notifications import (NotificationDispatcher, TwilioTransport, FakeTransport, RecipientRateLimiter,
+                           RATE_LIMITED, QUEUE_FULL, FAILED)
 
 TWILIO_SID = "AC6f8a011f27b34f08f88a00f380d9c54d"
 TWILIO_AUTH_TOKEN = "5354c85f6ad595a17692ace32be21bc5"
 TWILIO_SMS_FROM = "+13135133191"
 
+# One reused Twilio client; OTPs are queued so /forgot_password never waits on Twilio.
+# NOTIFY_TRANSPORT=fake records messages locally instead of sending them.
+if os.environ.get("NOTIFY_TRANSPORT", "twilio") == "fake":
+    sms_transport = FakeTransport()
+else:
+    sms_transport = TwilioTransport(TWILIO_SID, TWILIO_AUTH_TOKEN, TWILIO_SMS_FROM)
+
+sms_dispatcher = NotificationDispatcher(
+    sms_transport,
+    name="otp-sms",
+    workers=2,
+    queue_depth=128,
+    max_retries=2,
+    backoff=1.0,
+    rate_limiter=RecipientRateLimiter(per_minute=3, burst=3)
+)
+
 def send_otp_sms(phone_number, otp):
-    client = Client(TWILIO_SID, TWILIO_AUTH_TOKEN)
-    message = client.messages.create(
-        body=f"Your OTP is {otp}. It is valid for 5 minutes.",
-        from_=TWILIO_SMS_FROM,
-        to="+91" + phone_number[-10:]
-    )
-    return message.sid
+    """Queue the OTP SMS; returns its notifications.Delivery (false if rate limited or the queue is full)."""
+    return sms_dispatcher.send("+91" + phone_number[-10:], f"Your OTP is {otp}. It is valid for 5 minutes.")
+
+# Deliveries of the OTPs handed out, by token (kept in the session as fp_sms), so the
+# verify page can tell the user when the SMS could not be sent after all.
+OTP_DELIVERY_KEEP_SEC = 600
+otp_deliveries = {}
+otp_deliveries_lock = threading.Lock()
+
+def track_otp_delivery(delivery):
+    token = secrets.token_urlsafe(12)
+    now = time.monotonic()
+    with otp_deliveries_lock:
+        for k in [k for k, (_, t) in otp_deliveries.items() if now - t > OTP_DELIVERY_KEEP_SEC]:
+            del otp_deliveries[k]
+        otp_deliveries[token] = (delivery, now)
+    return token
+
+def otp_delivery_status():
+    """Status of the session's OTP SMS (queued / sent / failed), or None if unknown."""
+    with otp_deliveries_lock:
+        entry = otp_deliveries.get(session.get("fp_sms"))
+    return entry[0].status if entry else None
 
 def generate_otp(length=6):
     return "".join(random.choices("0123456789", k=length))
 
 # ---------------- EMPLOYEE REGISTER ----------------
-@app.route("/register", methods=["GET", "POST"])
-def register():
-    if request.method == "GET":
-        return render_template("register.html")
-
-    try:
-        emp_id = request.form.get("emp_id", "").strip()
-        emp_name = request.form.get("emp_name", "").strip()
-        password = request.form.get("password", "").strip()
-        confirm = request.form.get("confirm", "").strip()
-        contact = request.form.get("contact", "").strip()
+# A registration POST only validates the form and queues an enrollment job; the
+# capture, duplicate check and INSERT run on an enrollment_jobs worker. The page polls
+# /enroll/jobs/<id> for progress. Jobs for the same camera run one at a time.
+ENROLL_JOB_WORKERS = int(os.environ.get("ENROLL_JOB_WORKERS", "1"))
+enroll_jobs = JobRunner(workers=ENROLL_JOB_WORKERS)
+
+def validate_registration(form):
+    """(fields, None) for a valid registration form, else (None, error message)."""
+    emp_id = form.get("emp_id", "").strip()
+    emp_name = form.get("emp_name", "").strip()
+    password = form.get("password", "").strip()
+    confirm = form.get("confirm", "").strip()
+    contact = form.get("contact", "").strip()
+
+    if not emp_id or not emp_name or not password or not confirm or not contact:
+        return None, "All fields are required."
 
-        if not emp_id or not emp_name or not password or not confirm or not contact:
-            return jsonify({"error": "All fields are required."})
-
-        if password != confirm:
-            return jsonify({"error": "Passwords do not match."})
+    if password != confirm:
+        return None, "Passwords do not match."
 
-        if len(password) < 6:
-            return jsonify({"error": "Password must be at least 6 characters."})
+    if len(password) < 6:
+        return None, "Password must be at least 6 characters."
 
-        import re
-        if not re.match(r"^CS\d{3}$", emp_id):
-            return jsonify({"error": "Employee ID format must be like CS001."})
+    import re
+    if not re.match(r"^CS\d{3}$", emp_id):
+        return None, "Employee ID format must be like CS001."
 
-        if not re.match(r"^[A-Za-z ]+$", emp_name):
-            return jsonify({"error": "Name must contain only letters."})
+    if not re.match(r"^[A-Za-z ]+$", emp_name):
+        return None, "Name must contain only letters."
 
-        if not re.match(r"^[6-9]\d{9}$", contact):
-            return jsonify({"error": "Invalid 10-digit mobile number."})
+    if not re.match(r"^[6-9]\d{9}$", contact):
+        return None, "Invalid 10-digit mobile number."
 
-        normalized_contact = "+91" + contact
+    return {
+        "emp_id": emp_id,
+        "emp_name": emp_name,
+        "password_hash": generate_password_hash(password),
+        "contact": "+91" + contact,
+    }, None
 
-        conn = get_db_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM employees WHERE id=%s", (emp_id,))
-        if cur.fetchone():
+def start_registration():
+    """Validate the POSTed form and queue its enrollment job; JSON response either way."""
+    try:
+        fields, error = validate_registration(request.form)
+        if error:
+            return jsonify({"error": error})
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id FROM employees WHERE id=%s", (fields["emp_id"],))
+            exists = cur.fetchone()
             cur.close()
-            conn.close()
+        if exists or enroll_jobs.find(emp_id=fields["emp_id"]):
             return jsonify({"error": "Employee ID already registered."})
 
-        # ------- Face capture (50 images) -------
-        ok, result = capture_face_embedding(num_images=50)
-        if not ok:
-            cur.close()
-            conn.close()
-            return jsonify({"error": result})
+        owner = session.setdefault("enroll_owner", secrets.token_urlsafe(16))
+        job = enroll_jobs.submit(run_enrollment, ENROLL_CAMERA, meta=dict(fields, owner=owner))
+        job.update(stage="queued")
+        return jsonify({
+            "job_id": job.id,
+            "status_url": url_for("enroll_job_status", job_id=job.id),
+            "cancel_url": url_for("enroll_job_cancel", job_id=job.id),
+        }), 202
 
-        new_emb = result
+    except Exception as e:
+        print("Registration error:", e)
+        return jsonify({"error": "Server error. Please try again."}), 500
 
-        cur.execute("SELECT id, name, embedding FROM employees WHERE embedding IS NOT NULL")
-        for other_id, other_name, emb_blob in cur.fetchall():
-            try:
-                existing_emb = pickle.loads(emb_blob)
-                if face_distance(new_emb, existing_emb) <= 0.9:
-                    cur.close()
-                    conn.close()
-                    return jsonify({
-                        "duplicate": True,
-                        "error": f"Face already registered for {other_name} ({other_id})."
-                    })
-            except:
-                continue
+def run_enrollment(job):
+    """Enrollment job: capture (no DB connection held), duplicate check, then a short INSERT."""
+    fields = job.meta
+    job.update(stage="capturing")
+    ok, result = capture_face_embedding(num_images=50, progress=job.update, cancelled=lambda: job.cancelled)
+    if not ok:
+        raise JobError(result)
+    new_emb = result
+
+    job.update(stage="duplicate-check")
+    duplicate = find_duplicate_face(new_emb)
+    if duplicate:
+        other_id, other_name = duplicate
+        job.update(duplicate={"emp_id": other_id, "name": other_name})
+        raise JobError(f"Face already registered for {other_name} ({other_id}).", duplicate=True)
+    job.update(stage="saving", duplicate=None)
 
-        password_hash = generate_password_hash(password)
-        emb_blob = pickle.dumps(new_emb.astype(np.float32))
+    try:
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO employees (id, name, embedding, password_hash, contact_number)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (fields["emp_id"], fields["emp_name"], encode_embedding(new_emb),
+                  fields["password_hash"], fields["contact"]))
+            bump_gallery_version(cur)
+            bump_attendance_versions(cur, [fields["emp_id"]])  # drops cached "unknown employee" reads
+            conn.commit()
+            cur.close()
+    except mysql.connector.IntegrityError:
+        raise JobError("Employee ID already registered.")
 
-        cur.execute("""
-            INSERT INTO employees (id, name, embedding, password_hash, contact_number)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (emp_id, emp_name, emb_blob, password_hash, normalized_contact))
+    job.update(stage="done")
+    return {"emp_id": fields["emp_id"], "emp_name": fields["emp_name"],
+            "count": job.progress.get("accepted", 0)}
 
-        conn.commit()
-        cur.close()
-        conn.close()
+@app.route("/register", methods=["GET", "POST"])
+def register():
+    if request.method == "GET":
+        return render_template("register.html")
+    return start_registration()
 
-        return render_template("success.html", emp_id=emp_id, emp_name=emp_name, count=50)
+def session_enroll_job(job_id):
+    """The job if this browser session submitted it, else None (a job id alone grants nothing)."""
+    job = enroll_jobs.get(job_id)
+    owner = session.get("enroll_owner")
+    if job is None or owner is None or not secrets.compare_digest(job.meta.get("owner", ""), owner):
+        return None
+    return job
+
+@app.route("/enroll/jobs/<job_id>")
+def enroll_job_status(job_id):
+    job = session_enroll_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired registration job."}), 404
+    status = job.status(enroll_jobs.position(job))
+    if job.state == "done":
+        status["redirect"] = url_for("enroll_job_success", job_id=job.id)
+    return jsonify(status)
+
+@app.route("/enroll/jobs/<job_id>/cancel", methods=["POST"])
+def enroll_job_cancel(job_id):
+    if session_enroll_job(job_id) is None or not enroll_jobs.cancel(job_id):
+        return jsonify({"error": "Job already finished or unknown."}), 409
+    return jsonify({"ok": True})
 
-    except Exception as e:
-        print("Registration error:", e)
-        return jsonify({"error": "Server error. Please try again."}), 500
+@app.route("/enroll/jobs/<job_id>/success")
+def enroll_job_success(job_id):
+    job = session_enroll_job(job_id)
+    if job is None or job.state != "done":
+        abort(404)
+    return render_template("success.html", **job.result)
 
 # ---------------- FORGOT PASSWORD ----------------
 @app.route("/forgot_password", methods=["GET", "POST"])
@@ -654,12 +895,11 @@ def forgot_password():
     else:
         return render_template("forgot_password.html", error="Enter valid mobile number.")
 
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT contact_number FROM employees WHERE id=%s", (emp_id,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT contact_number FROM employees WHERE id=%s", (emp_id,))
+        row = cur.fetchone()
+        cur.close()
 
     if not row:
         return render_template("forgot_password.html", error="ID not found.")
@@ -675,11 +915,21 @@ def forgot_password():
     session["fp_otp"] = otp
     session["fp_expires"] = expires_at.isoformat()
 
-    send_otp_sms(db_contact, otp)
+    delivery = send_otp_sms(db_contact, otp)
+    if delivery.status == RATE_LIMITED:
+        return render_template("forgot_password.html", error="Too many OTP requests. Please try again later.")
+    if delivery.status == QUEUE_FULL:
+        return render_template("forgot_password.html", error="SMS service is busy. Please try again in a minute.")
+    session["fp_sms"] = track_otp_delivery(delivery)
     masked = f"+91******{db_contact[-4:]}"
 
     return render_template("verify_otp.html", emp_id=emp_id, masked_contact=masked)
 
+@app.route("/forgot_password/sms_status")
+def otp_sms_status():
+    """Polled by verify_otp.html so a failed OTP delivery is reported instead of awaited."""
+    return jsonify({"status": otp_delivery_status()})
+
 @app.route("/verify_otp", methods=["POST"])
 def verify_otp():
     emp_id = request.form.get("emp_id", "").strip()
@@ -704,6 +954,8 @@ def verify_otp():
         return render_template("verify_otp.html", error="Wrong ID.", emp_id=emp_id)
 
     if otp_input != session_otp:
+        if otp_delivery_status() == FAILED:
+            return render_template("forgot_password.html", error="We could not send the OTP. Please request a new one.")
         return render_template("verify_otp.html", error="Invalid OTP.", emp_id=emp_id)
 
     session["allow_reset_for"] = emp_id
@@ -726,12 +978,11 @@ def reset_password():
 
     password_hash = generate_password_hash(password)
 
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE employees SET password_hash=%s WHERE id=%s", (password_hash, emp_id))
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE employees SET password_hash=%s WHERE id=%s", (password_hash, emp_id))
+        conn.commit()
+        cur.close()
 
     session.pop("allow_reset_for", None)
 
@@ -769,18 +1020,31 @@ def attendance_range():
     if start_date > end_date:
         start_date, end_date = end_date, start_date
 
-    # Fetch attendance from database
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT date, in1, out1, in2, out2
-        FROM attendance
-        WHERE emp_id=%s AND date BETWEEN %s AND %s
-        ORDER BY date
-    """, (emp_id_to_fetch, start_date, end_date))
+    # Fetch attendance and employee name; the connection goes back before formatting
+    cache_key = (emp_id_to_fetch, "range", start_date, end_date)
+    with db_connection() as conn:
+        cur = conn.cursor()
+        version = attendance_version(cur, emp_id_to_fetch)  # before the rows, see attendance_cache.py
+        cached = attendance_cache.get(cache_key, version) if ATTENDANCE_CACHE_SIZE else None
+        if cached is not None:
+            cur.close()
+            return jsonify(cached)
+
+        cur.execute("""
+            SELECT date, in1, out1, in2, out2
+            FROM attendance
+            WHERE emp_id=%s AND date BETWEEN %s AND %s
+            ORDER BY date
+        """, (emp_id_to_fetch, start_date, end_date))
+        raw_rows = cur.fetchall()
+
+        cur.execute("SELECT name FROM employees WHERE id=%s", (emp_id_to_fetch,))
+        emp = cur.fetchone()
+        emp_name = emp[0] if emp else ""
+        cur.close()
 
     rows = []
-    for (d, in1, out1, in2, out2) in cur.fetchall():
+    for (d, in1, out1, in2, out2) in raw_rows:
         s_in1 = time_to_str_safe(in1)
         s_out1 = time_to_str_safe(out1)
         s_in2 = time_to_str_safe(in2)
@@ -804,21 +1068,14 @@ def attendance_range():
             "present_hours": total_hours
         })
 
-    cur.close()
-
-    # Fetch employee name
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM employees WHERE id=%s", (emp_id_to_fetch,))
-    emp = cur.fetchone()
-    emp_name = emp[0] if emp else ""
-    cur.close()
-    conn.close()
-
-    return jsonify({
+    payload = {
         "emp_id": emp_id_to_fetch,
         "name": emp_name,
         "rows": rows
-    })
+    }
+    if ATTENDANCE_CACHE_SIZE:
+        attendance_cache.put(cache_key, version, payload)
+    return jsonify(payload)
 
 
 # ---------------- DOWNLOAD ATTENDANCE ----------------
@@ -831,15 +1088,6 @@ def download_attendance():
     if session.get("is_admin"):
         emp_id = request.args.get("emp_id") or emp_id
 
-    # ✅ Fetch employee name
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM employees WHERE id=%s", (emp_id,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
-    emp_name = row[0] if row else "Unknown"
-
     # ✅ Get date range
     start = request.args.get("start")
     end = request.args.get("end")
@@ -849,18 +1097,20 @@ def download_attendance():
     except:
         return "Invalid date format", 400
 
-    # ✅ Fetch attendance records
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT date, in1, out1, in2, out2
-        FROM attendance
-        WHERE emp_id=%s AND date BETWEEN %s AND %s
-        ORDER BY date
-    """, (emp_id, start_date, end_date))
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    # ✅ Fetch employee name and attendance records (one pooled connection)
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM employees WHERE id=%s", (emp_id,))
+        row = cur.fetchone()
+        cur.execute("""
+            SELECT date, in1, out1, in2, out2
+            FROM attendance
+            WHERE emp_id=%s AND date BETWEEN %s AND %s
+            ORDER BY date
+        """, (emp_id, start_date, end_date))
+        rows = cur.fetchall()
+        cur.close()
+    emp_name = row[0] if row else "Unknown"
 
     if not rows:
         return "No attendance records found", 404
@@ -876,57 +1126,58 @@ def download_attendance():
             "out2": time_to_str_safe(out2) or "-"
         })
 
-    df = pd.DataFrame(df_rows)
-    output = io.BytesIO()
-
-    # ✅ Write with proper formatting
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        workbook = writer.book
-        worksheet = workbook.add_worksheet("Attendance")
-        writer.sheets["Attendance"] = worksheet
-
-        # --- Formats ---
-        title_format = workbook.add_format({
-            "bold": True, "font_color": "white", "bg_color": "#4472C4",
-            "align": "center", "valign": "vcenter", "font_size": 14
-        })
-        label_format = workbook.add_format({
-            "bold": True, "bg_color": "#DCE6F1", "border": 1
-        })
-        value_format = workbook.add_format({"border": 1})
-        header_format = workbook.add_format({
-            "bold": True, "bg_color": "#4F81BD", "font_color": "white", "border": 1, "align": "center"
-        })
-        cell_format = workbook.add_format({"border": 1})
-
-        # --- Title Row ---
-        worksheet.merge_range("A1:E1", "Employee Attendance Report", title_format)
-
-        # --- Details Section ---
-        worksheet.write("A3", "Employee Name", label_format)
-        worksheet.write("B3", emp_name, value_format)
-        worksheet.write("A4", "Employee ID", label_format)
-        worksheet.write("B4", emp_id, value_format)
-        worksheet.write("A5", "From Date", label_format)
-        worksheet.write("B5", str(start_date), value_format)
-        worksheet.write("A6", "To Date", label_format)
-        worksheet.write("B6", str(end_date), value_format)
-
-        # --- Table Header ---
-        for col_num, col_name in enumerate(df.columns):
-            worksheet.write(7, col_num, col_name, header_format)
-
-        # --- Table Data ---
-        for row_num, record in enumerate(df.values):
-            for col_num, value in enumerate(record):
-                worksheet.write(row_num + 8, col_num, value, cell_format)
-
-        # --- Auto-adjust columns ---
-        for i, col in enumerate(df.columns):
-            column_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.set_column(i, i, column_len)
-
-    output.seek(0)
+    with excel_export("download_attendance"):
+        df = pd.DataFrame(df_rows)
+        output = io.BytesIO()
+
+        # ✅ Write with proper formatting
+        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+            workbook = writer.book
+            worksheet = workbook.add_worksheet("Attendance")
+            writer.sheets["Attendance"] = worksheet
+
+            # --- Formats ---
+            title_format = workbook.add_format({
+                "bold": True, "font_color": "white", "bg_color": "#4472C4",
+                "align": "center", "valign": "vcenter", "font_size": 14
+            })
+            label_format = workbook.add_format({
+                "bold": True, "bg_color": "#DCE6F1", "border": 1
+            })
+            value_format = workbook.add_format({"border": 1})
+            header_format = workbook.add_format({
+                "bold": True, "bg_color": "#4F81BD", "font_color": "white", "border": 1, "align": "center"
+            })
+            cell_format = workbook.add_format({"border": 1})
+
+            # --- Title Row ---
+            worksheet.merge_range("A1:E1", "Employee Attendance Report", title_format)
+
+            # --- Details Section ---
+            worksheet.write("A3", "Employee Name", label_format)
+            worksheet.write("B3", emp_name, value_format)
+            worksheet.write("A4", "Employee ID", label_format)
+            worksheet.write("B4", emp_id, value_format)
+            worksheet.write("A5", "From Date", label_format)
+            worksheet.write("B5", str(start_date), value_format)
+            worksheet.write("A6", "To Date", label_format)
+            worksheet.write("B6", str(end_date), value_format)
+
+            # --- Table Header ---
+            for col_num, col_name in enumerate(df.columns):
+                worksheet.write(7, col_num, col_name, header_format)
+
+            # --- Table Data ---
+            for row_num, record in enumerate(df.values):
+                for col_num, value in enumerate(record):
+                    worksheet.write(row_num + 8, col_num, value, cell_format)
+
+            # --- Auto-adjust columns ---
+            for i, col in enumerate(df.columns):
+                column_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
+                worksheet.set_column(i, i, column_len)
+
+        output.seek(0)
     filename = f"attendance_{emp_name}_{emp_id}_{start_date}_{end_date}.xlsx"
 
     return send_file(
@@ -947,84 +1198,13 @@ def admin_register():
         return render_template("register.html")
 
     # POST => same registration logic as employee register
-    try:
-        emp_id = request.form.get("emp_id", "").strip()
-        emp_name = request.form.get("emp_name", "").strip()
-        password = request.form.get("password", "").strip()
-        confirm = request.form.get("confirm", "").strip()
-        contact = request.form.get("contact", "").strip()
-
-        if not emp_id or not emp_name or not password or not confirm or not contact:
-            return jsonify({"error": "All fields are required."})
-
-        if password != confirm:
-            return jsonify({"error": "Passwords do not match."})
-
-        if len(password) < 6:
-            return jsonify({"error": "Password must be at least 6 characters."})
-
-        import re
-        if not re.match(r"^CS\d{3}$", emp_id):
-            return jsonify({"error": "Employee ID format must be like CS001."})
-
-        if not re.match(r"^[A-Za-z ]+$", emp_name):
-            return jsonify({"error": "Name must contain only letters."})
-
-        if not re.match(r"^[6-9]\d{9}$", contact):
-            return jsonify({"error": "Invalid 10-digit mobile number."})
-
-        normalized_contact = "+91" + contact
+    return start_registration()
 
-        conn = get_db_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM employees WHERE id=%s", (emp_id,))
-        if cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({"error": "Employee ID already registered."})
-
-        ok, result = capture_face_embedding(num_images=50)
-        if not ok:
-            cur.close()
-            conn.close()
-            return jsonify({"error": result})
-
-        new_emb = result
-
-        cur.execute("SELECT id, name, embedding FROM employees WHERE embedding IS NOT NULL")
-        for other_id, other_name, emb_blob in cur.fetchall():
-            try:
-                existing_emb = pickle.loads(emb_blob)
-                if face_distance(new_emb, existing_emb) <= 0.9:
-                    cur.close(); conn.close()
-                    return jsonify({"duplicate": True, "error": f"Face already registered for {other_name} ({other_id})."})
-            except:
-                continue
-
-        password_hash = generate_password_hash(password)
-        emb_blob = pickle.dumps(new_emb.astype(np.float32))
-
-        cur.execute(
-            "INSERT INTO employees (id, name, embedding, password_hash, contact_number) "
-            "VALUES (%s, %s, %s, %s, %s)",
-            (emp_id, emp_name, emb_blob, password_hash, normalized_contact)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        return render_template("success.html", emp_id=emp_id, emp_name=emp_name, count=50)
-
-    except Exception as e:
-        return jsonify({"error": "Server error. Please try again."}), 500
 @app.route("/register_employee", methods=["POST"])
 def register_employee():
     # call the original register() function
     return register()
 
-
-import threading
-import time
 import os
 from flask import request
 
@@ -0,0 +1,127 @@
+# attendance_cache.py
+# Read-through cache for the web app's attendance reads (/admin/attendance/<emp_id>,
+# /api/attendance_range), invalidated through a per-employee version counter.
+#
+# Every writer that changes what an employee's attendance reads return
+# (recognize.py's mark_attendance and AttendanceWriter; app.py's employee register,
+# update and delete) bumps that employee's row in `attendance_versions` in the same
+# transaction. A cached response remembers the version it was built from; a read
+# first fetches the current version (one primary-key lookup) and only uses the entry
+# if it still matches. The counter lives in MySQL, so a write in the recognizer
+# process invalidates the web app's cache on its next read, and each app process
+# can keep its own cache.
+#
+# Entries also expire after `ttl_s` as a backstop for changes made outside these
+# writers (e.g. hand-edited rows), and the least recently used ones are evicted
+# beyond `max_entries`.
+
+import threading
+import time
+from collections import OrderedDict
+
+from mysql.connector import errorcode, errors
+
+import metrics
+
+CACHE_EVENTS = metrics.counter("app_attendance_cache_total", "Attendance read cache lookups by result", ["result"])
+
+
+_warned_missing = False
+
+
+def bump_attendance_versions(cur, emp_ids):
+    """Call in the same transaction as any change to these employees' attendance rows."""
+    global _warned_missing
+    emp_ids = sorted({e for e in emp_ids if e})  # fixed order so concurrent writers don't deadlock
+    if not emp_ids:
+        return
+    try:
+        cur.executemany(
+            "INSERT INTO attendance_versions (emp_id, version) VALUES (%s, 1) "
+            "ON DUPLICATE KEY UPDATE version = version + 1",
+            [(e,) for e in emp_ids],
+        )
+    except errors.ProgrammingError as e:
+        # schema not migrated yet (migration 005): the attendance write itself must
+        # still go through; only the failed statement is rolled back, not the transaction
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        if not _warned_missing:
+            _warned_missing = True
+            print("[WARN] attendance_versions table missing; run migrations.py. "
+                  "Attendance read caches are not invalidated until then.")
+
+
+def attendance_version(cur, emp_id):
+    """Current version of one employee's attendance (0 if never written)."""
+    cur.execute("SELECT version FROM attendance_versions WHERE emp_id=%s", (emp_id,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+class AttendanceCache:
+    """
+    LRU + TTL map of key -> (version, value); thread-safe.
+
+        version = attendance_version(cur, emp_id)        # read before the rows
+        value = cache.get(key, version)
+        if value is None:
+            value = build(...)
+            cache.put(key, version, value)
+
+    The version must be read before the rows it is stored with: a write that lands
+    in between then only makes the entry look older than it is, never newer.
+    Keys start with the employee id, so invalidate(emp_id) can drop them locally.
+    """
+
+    def __init__(self, max_entries=2048, ttl_s=300.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()  # key -> (version, expires, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                result = "miss"
+            elif entry[0] != version:
+                result = "stale"
+            elif entry[1] < now:
+                result = "expired"
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_EVENTS.labels(result="hit").inc()
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        CACHE_EVENTS.labels(result=result).inc()
+        return None
+
+    def put(self, key, version, value):
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current[0] > version:
+                return  # a concurrent reader already stored a newer build
+            self._entries[key] = (version, time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                CACHE_EVENTS.labels(result="evicted").inc()
+
+    def invalidate(self, emp_id):
+        """Drop every entry for one employee (keys are tuples starting with emp_id)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == emp_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,232 @@
+# attendance_writer.py
+# Background attendance writer: recognition events are queued, grouped into
+# batches and applied with one conditional upsert per event over a pooled connection.
+
+import datetime
+import queue
+import threading
+import time
+
+import mysql.connector
+
+import metrics
+import migrations
+from attendance_cache import bump_attendance_versions
+from pipeline import StageQueue, DROP_NEWEST
+
+# Same slot rule as recognize.mark_attendance: morning until 13:45, then afternoon.
+AFTERNOON_FROM = datetime.time(13, 45)
+
+WRITE_SECONDS = metrics.histogram("attendance_write_seconds", "Time to write one batch of attendance events")
+WRITE_BATCH_EVENTS = metrics.histogram("attendance_write_batch_events", "Attendance events per write batch",
+                                       buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+EVENTS = metrics.counter("attendance_events_total", "Attendance events by outcome", ["result"])  # applied, failed, rejected, dropped
+
+# One statement per event. It creates the day row if missing and otherwise fills
+# the IN slot if empty, else moves the OUT slot. MySQL evaluates the assignments
+# left to right, so OUT is computed from the old IN value before IN is touched.
+UPSERT_SQL = {
+    "morning": (
+        "INSERT INTO attendance (emp_id, date, in1) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE "
+        "out1 = IF(in1 IS NULL, out1, VALUES(in1)), "
+        "in1 = IFNULL(in1, VALUES(in1))"
+    ),
+    "afternoon": (
+        "INSERT INTO attendance (emp_id, date, in2) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE "
+        "out2 = IF(in2 IS NULL, out2, VALUES(in2)), "
+        "in2 = IFNULL(in2, VALUES(in2))"
+    ),
+}
+
+
+def session_for(t):
+    return "morning" if t < AFTERNOON_FROM else "afternoon"
+
+
+def ensure_unique_day_key(conn):
+    """Bring the schema up to date (migrations add the key the upsert relies on). False if it can't."""
+    try:
+        migrations.migrate(conn)
+    except Exception as e:
+        print(f"[ERROR] Could not apply schema migrations: {e}")
+    return migrations.has_unique_day_key(conn)
+
+
+class AttendanceWriter(threading.Thread):
+    """
+    Applies attendance events off the recognition thread.
+
+        writer = AttendanceWriter(pool, on_applied=notify)
+        writer.start()
+        writer.submit(emp_id, now_dt)     # from the frame loop, never blocks
+        ...
+        writer.close(); writer.join()
+
+    Events are collected into batches of up to `max_batch` (or whatever arrived within
+    `max_wait` seconds). Per batch and day, one SELECT over the affected employees tells
+    which slot each event fills (needed for the notification text), then the upserts
+    run as one executemany per session and one commit. `on_applied(emp_id, label,
+    time_str, dt)` is called after commit with label IN1/OUT1/IN2/OUT2.
+
+    A batch is one transaction. If it fails, nothing of it was written and its events
+    are applied again one per transaction, so a bad event (e.g. an employee deleted
+    before the recognizer's gallery reloaded, which breaks the foreign key) is
+    dropped on its own and the rest of the batch still lands.
+
+    If the attendance table lacks the (emp_id, date) unique key and the migrations
+    cannot add it, events go through `fallback(emp_id, dt)` one by one instead.
+    """
+
+    def __init__(self, pool, on_applied=None, fallback=None, max_batch=64, max_wait=0.2,
+                 queue_depth=1024, queue_policy=DROP_NEWEST):
+        super().__init__(name="attendance-writer", daemon=True)
+        self.pool = pool
+        self.on_applied = on_applied
+        self.fallback = fallback
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.q = StageQueue("attendance", queue_depth, queue_policy)
+        self.applied = 0
+        self.failed = 0
+        self.use_upsert = None  # decided on first batch
+
+    # ---- producer side ----
+    def submit(self, emp_id, dt):
+        ok = self.q.put((emp_id, dt))
+        if not ok:
+            EVENTS.labels(result="dropped").inc()
+            print(f"[WARN] Attendance queue full, dropped event for {emp_id}")
+        return ok
+
+    def close(self):
+        """Stop accepting events; the thread exits once the queue is drained."""
+        self.q.close()
+
+    # ---- consumer side ----
+    def run(self):
+        while True:
+            try:
+                batch = [self.q.get(timeout=0.5)]
+            except queue.Empty:
+                if self.q.closed:
+                    break
+                continue
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._apply_safely(batch)
+
+    def _apply_safely(self, batch):
+        WRITE_BATCH_EVENTS.observe(len(batch))
+        if self.use_upsert is None:
+            try:
+                with self.pool.connection() as conn:
+                    self.use_upsert = ensure_unique_day_key(conn)
+            except Exception as e:
+                print(f"[ERROR] attendance batch of {len(batch)} failed, schema check: {e}")
+                self._count("failed", len(batch))
+                return
+            if not self.use_upsert:
+                print("[WARN] Attendance writer falling back to per-event writes.")
+        if not self.use_upsert:
+            self._apply_fallback(batch)
+            return
+
+        t0 = time.perf_counter()
+        try:
+            applied = self.apply_batch(batch)
+            WRITE_SECONDS.observe(time.perf_counter() - t0)
+            self._count("applied", len(batch))
+        except Exception as e:
+            # rolled back as a whole, so no event of it is applied twice
+            print(f"[WARN] attendance batch of {len(batch)} failed ({e}); applying its events one by one")
+            applied = []
+            for event in batch:
+                applied.extend(self._apply_one(event))
+        if self.on_applied:
+            for emp_id, label, ts, dt in applied:
+                try:
+                    self.on_applied(emp_id, label, ts, dt)
+                except Exception as e:
+                    print(f"[ERROR] on_applied for {emp_id}: {e}")
+
+    def _apply_one(self, event):
+        emp_id = event[0]
+        for attempt in (1, 2):
+            try:
+                applied = self.apply_batch([event])
+                self._count("applied", 1)
+                return applied
+            except mysql.connector.IntegrityError as e:
+                # no such employee (any more); retrying cannot help
+                print(f"[WARN] Dropped attendance event for unknown employee {emp_id}: {e}")
+                self._count("rejected", 1)
+                return []
+            except Exception as e:
+                print(f"[ERROR] attendance event for {emp_id} failed (attempt {attempt}): {e}")
+        self._count("failed", 1)
+        return []
+
+    def _count(self, result, n):
+        if result == "applied":
+            self.applied += n
+        else:
+            self.failed += n
+        EVENTS.labels(result=result).inc(n)
+
+    def apply_batch(self, batch):
+        """Write one batch; returns [(emp_id, label, time_str, dt)] in event order."""
+        with self.pool.connection() as conn:
+            by_date = {}
+            for emp_id, dt in batch:
+                by_date.setdefault(dt.date(), []).append((emp_id, dt))
+
+            cur = conn.cursor()
+            applied = []
+            params = {"morning": [], "afternoon": []}
+            for day, events in by_date.items():
+                emp_ids = sorted({e for e, _ in events})
+                marks = ", ".join(["%s"] * len(emp_ids))
+                cur.execute(f"SELECT emp_id, in1, in2 FROM attendance WHERE date=%s AND emp_id IN ({marks})",
+                            (day, *emp_ids))
+                state = {emp_id: {"morning": in1 is not None, "afternoon": in2 is not None}
+                         for emp_id, in1, in2 in cur.fetchall()}
+
+                for emp_id, dt in events:
+                    sess = session_for(dt.time())
+                    ts = dt.strftime("%H:%M:%S")
+                    filled = state.setdefault(emp_id, {"morning": False, "afternoon": False})
+                    n = "1" if sess == "morning" else "2"
+                    label = f"OUT{n}" if filled[sess] else f"IN{n}"
+                    filled[sess] = True
+                    params[sess].append((emp_id, day, ts))
+                    applied.append((emp_id, label, ts, dt))
+
+            for sess, rows in params.items():
+                if rows:
+                    cur.executemany(UPSERT_SQL[sess], rows)
+            bump_attendance_versions(cur, [emp_id for emp_id, _ in batch])
+            conn.commit()
+            cur.close()
+            return applied
+
+    def _apply_fallback(self, batch):
+        # each fallback call commits on its own: never re-run one that already succeeded
+        for emp_id, dt in batch:
+            if not self.fallback:
+                self._count("failed", 1)
+                continue
+            try:
+                self.fallback(emp_id, dt)
+                self._count("applied", 1)
+            except Exception as e:
+                print(f"[ERROR] attendance event for {emp_id} failed: {e}")
+                self._count("failed", 1)
@@ -0,0 +1,254 @@
+# batch_footage.py
+# Offline mode: turn recorded footage into attendance, e.g. after the recognizer was
+# down or a camera link dropped. Video files are decoded as fast as the CPU allows
+# (no playback pacing, no frame dropping) and spread over a pool of worker processes,
+# each of which loads FaceNet and the gallery once. Every recognition is stamped with
+# the time it happened in the video, not the time it was processed.
+#
+# A file's start time comes from --start, else from a timestamp in its name
+# (gate1_20240115_081500.mp4, 2024-01-15T08-15-00.mkv ...), else from its
+# modification time minus its duration (recorders usually close the file at the end).
+#
+# Events from all files are sorted by time, pass one shared cooldown, and are applied
+# through the same AttendanceWriter as live recognition (IN1/OUT1/IN2/OUT2 slots).
+#
+#   python batch_footage.py footage/2024-01-15/ --dry-run events.jsonl
+#   python batch_footage.py gate1.mp4 --start "2024-01-15 08:00:00" --sample-fps 10
+
+import argparse
+import datetime
+import json
+import multiprocessing as mp
+import os
+import re
+import time
+
+BATCH_SAMPLE_FPS = float(os.environ.get("BATCH_SAMPLE_FPS", "5"))  # frames analysed per video second; 0 = all
+VIDEO_EXTS = (".mp4", ".avi", ".mkv", ".mov", ".m4v", ".ts", ".h264", ".h265", ".webm", ".flv")
+
+# YYYY[-]MM[-]DD[_T ]HH[-:.]MM[-:.]SS anywhere in the file name
+FILENAME_TIME = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})[_T -]?(\d{2})[-:.]?(\d{2})[-:.]?(\d{2})")
+
+
+# ---------------- FILES AND TIMESTAMPS ----------------
+def list_videos(paths):
+    """Video files among `paths`; directories are searched recursively."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, files in os.walk(path):
+                found.extend(os.path.join(dirpath, f) for f in files if f.lower().endswith(VIDEO_EXTS))
+        elif os.path.isfile(path):
+            found.append(path)
+        else:
+            print(f"[WARN] Not found: {path}")
+    return sorted(set(found))
+
+
+def time_from_filename(path):
+    m = FILENAME_TIME.search(os.path.basename(path))
+    if not m:
+        return None
+    try:
+        return datetime.datetime(*map(int, m.groups()))
+    except ValueError:
+        return None
+
+
+def parse_start(text):
+    try:
+        return datetime.datetime.fromisoformat(text.strip().replace("T", " "))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a date/time: {text!r} (use 'YYYY-MM-DD HH:MM:SS')")
+
+
+def video_start(path, duration_s, tz, start=None, source="auto"):
+    """(start datetime, how it was found) for one file; naive times are taken as local time."""
+    if start is not None:
+        dt, how = start, "--start"
+    else:
+        dt, how = None, None
+        if source in ("auto", "filename"):
+            dt, how = time_from_filename(path), "filename"
+        if dt is None and source in ("auto", "mtime"):
+            ended = datetime.datetime.fromtimestamp(os.path.getmtime(path), tz)
+            dt, how = ended - datetime.timedelta(seconds=duration_s), "mtime"
+        if dt is None:
+            return None, None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    return dt, how
+
+
+# ---------------- WORKER PROCESS ----------------
+_worker = {}
+
+
+def init_worker(threads):
+    # an exception here would make the Pool respawn the worker forever while
+    # imap_unordered waits; keep it and fail every file this worker is given instead
+    try:
+        from supervisor import limit_threads
+        limit_threads(threads)
+
+        import recognize
+        known, gallery_sync = recognize.load_gallery()
+        _worker["matcher"] = recognize.build_matcher(known, getattr(gallery_sync, "matrix", None))
+        recognize.get_embedder()
+        print(f"[INFO] worker {os.getpid()}: {len(_worker['matcher'])} faces loaded")
+    except Exception as e:
+        _worker["error"] = f"worker setup failed: {type(e).__name__}: {e}"
+        print(f"[ERROR] worker {os.getpid()}: {_worker['error']}")
+
+
+def process_file(job):
+    """
+    Runs in a worker: recognize every sampled frame of one file. Returns the events
+    that passed this file's cooldown and the attendance window, in video time.
+    """
+    path, opts = job
+    import cv2
+    import recognize
+
+    result = {"path": path, "events": [], "frames": 0, "processed": 0, "video_s": 0.0, "error": None}
+    if _worker.get("error"):
+        result["error"] = _worker["error"]
+        return result
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        result["error"] = "cannot open"
+        return result
+    t0 = time.time()
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        count = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        tz = recognize.now_local().tzinfo
+        start, how = video_start(path, count / fps, tz, opts["start"], opts["time_source"])
+        if start is None:
+            result["error"] = "no timestamp in file name (use --start or --time-source mtime)"
+            return result
+        result["start"], result["time_from"] = start.isoformat(), how
+        step = 1 if opts["sample_fps"] <= 0 else max(1, round(fps / opts["sample_fps"]))
+
+        name = os.path.basename(path)
+        events = result["events"]
+
+        def record(emp_id, now_dt):
+            events.append((now_dt, emp_id, name))
+
+        # captured_at carries the frame's offset into the video in seconds
+        recognizer = recognize.CameraRecognizer(
+            _worker["matcher"], record, name=name, annotate=False,
+            event_time=lambda offset: start + datetime.timedelta(seconds=offset))
+
+        index = 0
+        while cap.grab():
+            if index % step == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+                    offset = pos_ms / 1000.0 if pos_ms > 0 or index == 0 else index / fps
+                    recognizer.process(frame, offset)
+                    result["processed"] += 1
+            index += 1
+        recognizer.flush()
+        result["frames"] = index
+        result["video_s"] = index / fps
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        cap.release()
+        result["seconds"] = time.time() - t0
+    return result
+
+
+# ---------------- PARENT ----------------
+def apply_cooldown(events, cooldown_s):
+    """Events from all files in time order; one person seen on several files is recorded once."""
+    last_seen, kept = {}, []
+    for now_dt, emp_id, name in sorted(events, key=lambda e: e[0]):
+        ts = now_dt.timestamp()
+        if ts - last_seen.get(emp_id, float("-inf")) <= cooldown_s:
+            continue
+        last_seen[emp_id] = ts
+        kept.append((now_dt, emp_id, name))
+    return kept
+
+
+def log_applied(emp_id, label, ts, dt):
+    print(f"[{label}] {emp_id} at {dt.date()} {ts}")
+
+
+def run(paths, workers=None, sample_fps=BATCH_SAMPLE_FPS, start=None, time_source="auto",
+        dry_run=None, notify=False):
+    files = list_videos(paths)
+    if not files:
+        print("[ERROR] No video files to process.")
+        return 1
+    # biggest files first so one long recording does not end up last on an idle pool
+    files.sort(key=os.path.getsize, reverse=True)
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(files)))
+    opts = {"sample_fps": sample_fps, "start": start, "time_source": time_source}
+    print(f"[INFO] Batch: {len(files)} files on {workers} worker processes, "
+          f"{'every frame' if sample_fps <= 0 else f'{sample_fps:g} frames per video second'}")
+
+    t0 = time.time()
+    events, video_s, failed = [], 0.0, 0
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=init_worker, initargs=(max(1, cores // workers),)) as pool:
+        for r in pool.imap_unordered(process_file, [(f, opts) for f in files]):
+            if r["error"]:
+                failed += 1
+                print(f"[ERROR] {r['path']}: {r['error']}")
+                continue
+            events.extend(r["events"])
+            video_s += r["video_s"]
+            print(f"[INFO] {r['path']}: start {r['start']} ({r['time_from']}), {r['frames']} frames, "
+                  f"{r['processed']} analysed, {len(r['events'])} events, "
+                  f"{r['video_s'] / max(r['seconds'], 1e-6):.1f}x realtime")
+
+    import recognize
+    kept = apply_cooldown(events, recognize.COOLDOWN_SEC)
+
+    if dry_run:
+        with open(dry_run, "a", encoding="utf-8") as out:
+            for now_dt, emp_id, name in kept:
+                out.write(json.dumps({"camera": name, "emp_id": emp_id, "time": now_dt.isoformat()}) + "\n")
+    elif kept:
+        writer = recognize.create_attendance_writer(
+            on_applied=recognize.on_attendance_applied if notify else log_applied,
+            queue_depth=len(kept) + 1)
+        writer.start()
+        for now_dt, emp_id, _ in kept:
+            writer.submit(emp_id, now_dt)
+        writer.close()
+        writer.join()
+        if notify:
+            recognize.whatsapp.close(timeout=30)
+
+    wall = time.time() - t0
+    print(f"[STATS] {len(files) - failed}/{len(files)} files, {video_s / 60:.1f} min of video in {wall:.1f}s "
+          f"({video_s / max(wall, 1e-6):.1f}x realtime); {len(kept)} attendance events "
+          f"{'written to ' + dry_run if dry_run else 'applied'}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Recognize attendance from recorded video files")
+    ap.add_argument("paths", nargs="+", help="video files or directories (searched recursively)")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU cores)")
+    ap.add_argument("--sample-fps", type=float, default=BATCH_SAMPLE_FPS,
+                    help="frames analysed per second of video; 0 analyses every frame")
+    ap.add_argument("--start", type=parse_start, default=None,
+                    help="start time of the footage (all files), e.g. '2024-01-15 08:00:00'")
+    ap.add_argument("--time-source", choices=["auto", "filename", "mtime"], default="auto",
+                    help="where a file's start time comes from without --start")
+    ap.add_argument("--dry-run", metavar="FILE", help="append events as JSON lines to FILE instead of the database")
+    ap.add_argument("--notify", action="store_true", help="send WhatsApp notifications for applied events")
+    args = ap.parse_args(argv)
+    return run(args.paths, args.workers, args.sample_fps, args.start, args.time_source, args.dry_run, args.notify)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
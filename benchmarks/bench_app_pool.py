@@ -0,0 +1,134 @@
+# benchmarks/bench_app_pool.py
+# Load test for /api/attendance_range: a fresh mysql.connector.connect per request (the
+# old get_db_conn) against app.py's pooled connections, at shift-start style
+# concurrency. Requests go through Flask's test client from several threads, so the
+# timings are server-side latency without the HTTP layer.
+#
+# Needs a local MySQL. app.py is imported as usual (it connects to its own DB_CONFIG
+# database on import); the load itself runs against a scratch database, face_db_bench
+# by default, recreated with --employees people and --days days of attendance.
+#
+#   python -m benchmarks.bench_app_pool --password ... --requests 4000 --concurrency 16
+
+import argparse
+import datetime
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+import numpy as np
+
+from benchmarks.bench_attendance_writer import setup_schema
+from db import ConnectionPool
+
+
+class Unpooled:
+    """Same interface as db.ConnectionPool, but a new connection every time (old behaviour)."""
+
+    def __init__(self, config):
+        self.config = dict(config)
+        self.in_use = 0
+
+    @contextmanager
+    def connection(self):
+        conn = mysql.connector.connect(**self.config)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+
+
+def seed(base, db_name, employees, days):
+    setup_schema(base, db_name, employees)
+    conn = mysql.connector.connect(**base, database=db_name)
+    cur = conn.cursor()
+    today = datetime.date.today()
+    rows = []
+    for i in range(employees):
+        for d in range(days):
+            rows.append((f"CS{i:05d}", today - datetime.timedelta(days=d), "09:01:00", "13:30:00",
+                         "14:15:00", "18:02:00"))
+    for start in range(0, len(rows), 5000):
+        cur.executemany("INSERT INTO attendance (emp_id, date, in1, out1, in2, out2) "
+                        "VALUES (%s, %s, %s, %s, %s, %s)", rows[start:start + 5000])
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def load(flask_app, n_requests, concurrency, employees, span_days, seed_=0):
+    """Latencies (seconds) of n_requests admin calls to /api/attendance_range."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    per_thread = n_requests // concurrency
+
+    def worker(k):
+        rng = random.Random(seed_ + k)
+        client = flask_app.test_client()
+        with client.session_transaction() as s:
+            s["is_admin"] = True
+        today = datetime.date.today()
+        local = []
+        for _ in range(per_thread):
+            end = today - datetime.timedelta(days=rng.randrange(30))
+            start = end - datetime.timedelta(days=span_days - 1)
+            url = f"/api/attendance_range?emp_id=CS{rng.randrange(employees):05d}&start={start}&end={end}"
+            t0 = time.perf_counter()
+            resp = client.get(url)
+            local.append(time.perf_counter() - t0)
+            if resp.status_code != 200:
+                with lock:
+                    errors.append(resp.status_code)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - t0, errors
+
+
+def main():
+    ap = argparse.ArgumentParser(description="/api/attendance_range latency: connect per request vs pool")
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="face_db_bench")
+    ap.add_argument("--employees", type=int, default=300)
+    ap.add_argument("--days", type=int, default=120)
+    ap.add_argument("--span", type=int, default=7, help="days per request")
+    ap.add_argument("--requests", type=int, default=4000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--pool-size", type=int, default=8)
+    args = ap.parse_args()
+
+    import app
+
+    base = {"host": args.host, "user": args.user, "password": args.password}
+    cfg = dict(base, database=args.database)
+    seed(base, args.database, args.employees, args.days)
+
+    modes = [("connect per request", Unpooled(cfg)),
+             (f"pool size {args.pool_size}", ConnectionPool(cfg, size=args.pool_size, name="bench_app_pool"))]
+    print(f"requests={args.requests} concurrency={args.concurrency} employees={args.employees} "
+          f"span={args.span}d")
+    print(f"{'mode':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'req/s':>8} {'errors':>7}")
+    for name, pool in modes:
+        app.db_pool = pool
+        load(app.app, max(args.concurrency, args.requests // 10), args.concurrency, args.employees, args.span)  # warm-up
+        lat, wall, errors = load(app.app, args.requests, args.concurrency, args.employees, args.span)
+        ms = 1000 * np.asarray(lat)
+        print(f"{name:<22} {np.percentile(ms, 50):>8.2f} {np.percentile(ms, 95):>8.2f} "
+              f"{np.percentile(ms, 99):>8.2f} {ms.max():>8.2f} {len(lat) / wall:>8.0f} {len(errors):>7}")
+
+
+if __name__ == "__main__":
+    main()
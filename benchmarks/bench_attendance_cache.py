@@ -0,0 +1,131 @@
+# benchmarks/bench_attendance_cache.py
+# Shift-change load on the attendance read routes with app.py's read cache off and on.
+# Threads poll /api/attendance_range (the dashboard's default last-7-days view) and
+# /admin/attendance/<emp_id> for a pool of employees while a writer thread records
+# check-ins through AttendanceWriter, so part of the cache is invalidated as it runs.
+# Every cached response is compared against a fresh database read at the end.
+#
+# Needs a local MySQL. app.py is imported as usual; the load runs against a scratch
+# database (face_db_bench by default) that is recreated and migrated.
+#
+#   python -m benchmarks.bench_attendance_cache --password ... --requests 4000 --writes-per-s 20
+
+import argparse
+import datetime
+import random
+import threading
+import time
+
+import mysql.connector
+import numpy as np
+
+import migrations
+from attendance_writer import AttendanceWriter
+from benchmarks.bench_app_pool import seed
+from db import ConnectionPool
+
+
+def load(flask_app, n_requests, concurrency, employees, admin_share, seed_=0):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(k):
+        rng = random.Random(seed_ + k)
+        client = flask_app.test_client()
+        with client.session_transaction() as s:
+            s["is_admin"] = True
+        local = []
+        for _ in range(n_requests // concurrency):
+            emp_id = f"CS{rng.randrange(employees):05d}"
+            url = (f"/admin/attendance/{emp_id}" if rng.random() < admin_share
+                   else f"/api/attendance_range?emp_id={emp_id}")
+            t0 = time.perf_counter()
+            resp = client.get(url)
+            local.append(time.perf_counter() - t0)
+            if resp.status_code != 200:
+                with lock:
+                    errors.append(resp.status_code)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - t0, errors
+
+
+def check_in_loop(writer, employees, per_s, stop, seed_=0):
+    rng = random.Random(seed_)
+    while not stop.wait(1.0 / per_s):
+        writer.submit(f"CS{rng.randrange(employees):05d}", datetime.datetime.now())
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Attendance read routes with and without the read cache")
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="face_db_bench")
+    ap.add_argument("--employees", type=int, default=300)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--requests", type=int, default=4000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--admin-share", type=float, default=0.2, help="share of /admin/attendance requests")
+    ap.add_argument("--writes-per-s", type=float, default=20.0)
+    args = ap.parse_args()
+
+    import app
+
+    base = {"host": args.host, "user": args.user, "password": args.password}
+    cfg = dict(base, database=args.database)
+    seed(base, args.database, args.employees, args.days)
+    conn = mysql.connector.connect(**cfg)
+    migrations.migrate(conn)
+    conn.close()
+
+    app.db_pool = ConnectionPool(cfg, size=8, name="bench_cache_app")
+    writer = AttendanceWriter(ConnectionPool(cfg, size=2, name="bench_cache_writer"))
+    writer.start()
+
+    print(f"requests={args.requests} concurrency={args.concurrency} employees={args.employees} "
+          f"days={args.days} writes/s={args.writes_per_s:g}")
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'hit rate':>9} {'errors':>7}")
+    for name, size in (("no cache", 0), ("cache", 2048)):
+        app.ATTENDANCE_CACHE_SIZE = size
+        app.attendance_cache.clear()
+        app.attendance_cache.hits = app.attendance_cache.misses = 0
+        stop = threading.Event()
+        t = threading.Thread(target=check_in_loop, args=(writer, args.employees, args.writes_per_s, stop),
+                             daemon=True)
+        t.start()
+        lat, wall, errors = load(app.app, args.requests, args.concurrency, args.employees, args.admin_share)
+        stop.set()
+        t.join()
+        ms = 1000 * np.asarray(lat)
+        lookups = app.attendance_cache.hits + app.attendance_cache.misses
+        hit_rate = app.attendance_cache.hits / lookups if lookups else 0.0
+        print(f"{name:<10} {np.percentile(ms, 50):>8.2f} {np.percentile(ms, 95):>8.2f} "
+              f"{np.percentile(ms, 99):>8.2f} {len(lat) / wall:>8.0f} {hit_rate:>8.0%} {len(errors):>7}")
+
+    # every response still served from the cache must match the database
+    writer.close()
+    writer.join()
+    client = app.app.test_client()
+    with client.session_transaction() as s:
+        s["is_admin"] = True
+    stale = 0
+    for emp in range(args.employees):
+        url = f"/api/attendance_range?emp_id=CS{emp:05d}"
+        app.ATTENDANCE_CACHE_SIZE = 2048
+        cached = client.get(url).get_json()
+        app.ATTENDANCE_CACHE_SIZE = 0
+        fresh = client.get(url).get_json()
+        stale += cached != fresh
+    print(f"[INFO] stale cached responses after the run: {stale}" + ("  FAIL" if stale else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# benchmarks/bench_attendance_index.py
+# Attendance queries before and after the schema migrations, on a large synthetic table
+# (default 2000 employees x 500 days = 1M rows, plus some duplicate day rows as two
+# cameras used to create them).
+#
+# The scratch database (face_db_bench by default) is recreated with the original
+# schema, i.e. attendance with only the foreign key's index on emp_id. Each query is
+# EXPLAINed and timed; then migrations.migrate() runs (timing each step, including the
+# duplicate merge and the unique-key build) and the same queries are measured again.
+# After migrating, every query must use the (emp_id, date) key: a plan on any other
+# index, or a full scan, is reported as FAIL and makes the exit status non-zero.
+#
+#   python -m benchmarks.bench_attendance_index --password ...
+#   python -m benchmarks.bench_attendance_index --password ... --employees 200 --days 100   # quick run
+
+import argparse
+import datetime
+import random
+import sys
+import time
+
+import mysql.connector
+import numpy as np
+
+import migrations
+
+DAY0 = datetime.date(2023, 1, 2)
+
+# name -> (sql, params(rng, employees, days)); the first four are the web app's reads,
+# the last two the recognizer's (ensure_attendance_row, AttendanceWriter's slot lookup)
+QUERIES = {
+    "attendance_range 7d": (
+        "SELECT date, in1, out1, in2, out2 FROM attendance WHERE emp_id=%s AND date BETWEEN %s AND %s ORDER BY date",
+        lambda rng, e, d: _range(rng, e, d, 7)),
+    "download 31d": (
+        "SELECT date, in1, out1, in2, out2 FROM attendance WHERE emp_id=%s AND date BETWEEN %s AND %s ORDER BY date",
+        lambda rng, e, d: _range(rng, e, d, 31)),
+    "admin last 365": (
+        "SELECT date, in1, out1, in2, out2 FROM attendance WHERE emp_id=%s ORDER BY date DESC LIMIT 365",
+        lambda rng, e, d: (_emp(rng, e),)),
+    "delete employee (plan)": (
+        "SELECT COUNT(*) FROM attendance WHERE emp_id=%s",
+        lambda rng, e, d: (_emp(rng, e),)),
+    "ensure_attendance_row": (
+        "SELECT id, in1, out1, in2, out2 FROM attendance WHERE emp_id=%s AND date=%s",
+        lambda rng, e, d: (_emp(rng, e), DAY0 + datetime.timedelta(days=rng.randrange(d)))),
+    "writer slot lookup x16": (
+        "SELECT emp_id, in1, in2 FROM attendance WHERE date=%s AND emp_id IN (" + ", ".join(["%s"] * 16) + ")",
+        lambda rng, e, d: (DAY0 + datetime.timedelta(days=rng.randrange(d)),
+                           *sorted({_emp(rng, e) for _ in range(64)})[:16])),
+}
+
+
+def _emp(rng, employees):
+    return f"CS{rng.randrange(employees):05d}"
+
+
+def _range(rng, employees, days, span):
+    start = DAY0 + datetime.timedelta(days=rng.randrange(max(1, days - span)))
+    return _emp(rng, employees), start, start + datetime.timedelta(days=span - 1)
+
+
+# ---------------- SETUP ----------------
+def build(cfg, db_name, employees, days, dup_rate, seed=0):
+    """Scratch database on the pre-migration schema; returns (rows, duplicate rows)."""
+    rng = random.Random(seed)
+    conn = mysql.connector.connect(**cfg)
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+    cur.execute(f"CREATE DATABASE {db_name}")
+    cur.execute(f"USE {db_name}")
+    cur.execute("""
+        CREATE TABLE employees (
+            id VARCHAR(50) PRIMARY KEY, name VARCHAR(100), embedding LONGBLOB,
+            password_hash VARCHAR(255), contact_number VARCHAR(20))
+    """)
+    cur.execute("""
+        CREATE TABLE attendance (
+            id INT AUTO_INCREMENT PRIMARY KEY, emp_id VARCHAR(50), date DATE,
+            in1 TIME, out1 TIME, in2 TIME, out2 TIME,
+            FOREIGN KEY (emp_id) REFERENCES employees(id))
+    """)
+    cur.executemany("INSERT INTO employees (id, name) VALUES (%s, %s)",
+                    [(f"CS{i:05d}", f"Person {i}") for i in range(employees)])
+
+    sql = "INSERT INTO attendance (emp_id, date, in1, out1, in2, out2) VALUES (%s, %s, %s, %s, %s, %s)"
+    batch, total, dups = [], 0, 0
+    for d in range(days):
+        day = DAY0 + datetime.timedelta(days=d)
+        for i in range(employees):
+            emp_id = f"CS{i:05d}"
+            batch.append((emp_id, day, "09:0%d:00" % rng.randrange(10), "13:30:00", "14:15:00", "18:02:00"))
+            if rng.random() < dup_rate:
+                # second camera's row: later IN, no OUT
+                batch.append((emp_id, day, "09:1%d:00" % rng.randrange(10), None, None, None))
+                dups += 1
+            if len(batch) >= 10000:
+                cur.executemany(sql, batch)
+                total += len(batch)
+                batch = []
+    if batch:
+        cur.executemany(sql, batch)
+        total += len(batch)
+    conn.commit()
+    cur.execute("ANALYZE TABLE attendance")
+    cur.fetchall()
+    cur.close()
+    conn.close()
+    return total, dups
+
+
+# ---------------- MEASURE ----------------
+def explain(cur, sql, params):
+    """(access type, key used, rows examined estimate, extra) of the attendance table's plan row."""
+    cur.execute("EXPLAIN " + sql, params)
+    cols = [c[0] for c in cur.description]
+    for row in cur.fetchall():
+        r = dict(zip(cols, row))
+        if r.get("table") == "attendance":
+            return r.get("type"), r.get("key"), r.get("rows"), r.get("Extra") or ""
+    return None, None, None, ""
+
+
+def timed(cur, sql, make_params, employees, days, repeat, seed=1):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(repeat):
+        params = make_params(rng, employees, days)
+        t0 = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        out.append(time.perf_counter() - t0)
+    ms = 1000 * np.asarray(out)
+    return float(np.percentile(ms, 50)), float(np.percentile(ms, 95))
+
+
+def measure(conn, employees, days, repeat):
+    cur = conn.cursor()
+    rng = random.Random(0)
+    results = {}
+    for name, (sql, make_params) in QUERIES.items():
+        plan = explain(cur, sql, make_params(rng, employees, days))
+        results[name] = plan + timed(cur, sql, make_params, employees, days, repeat)
+    cur.close()
+    return results
+
+
+def report(title, results):
+    print(title)
+    print(f"  {'query':<24} {'type':<7} {'key':<24} {'rows est':>9} {'p50 ms':>8} {'p95 ms':>8}  extra")
+    for name, (typ, key, rows, extra, p50, p95) in results.items():
+        print(f"  {name:<24} {str(typ):<7} {str(key):<24} {str(rows):>9} {p50:>8.2f} {p95:>8.2f}  {extra}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Attendance query plans and timings before/after migrations")
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="face_db_bench")
+    ap.add_argument("--employees", type=int, default=2000)
+    ap.add_argument("--days", type=int, default=500)
+    ap.add_argument("--dup-rate", type=float, default=0.002, help="share of day rows with a duplicate")
+    ap.add_argument("--repeat", type=int, default=300)
+    args = ap.parse_args()
+
+    base = {"host": args.host, "user": args.user, "password": args.password}
+    t0 = time.perf_counter()
+    rows, dups = build(base, args.database, args.employees, args.days, args.dup_rate)
+    print(f"[INFO] {rows} attendance rows ({dups} duplicate day rows) built in {time.perf_counter() - t0:.0f}s")
+
+    conn = mysql.connector.connect(**base, database=args.database)
+    before = measure(conn, args.employees, args.days, args.repeat)
+    report("before (foreign key index on emp_id only)", before)
+
+    t0 = time.perf_counter()
+    migrations.migrate(conn)
+    print(f"[INFO] migrations applied in {time.perf_counter() - t0:.1f}s")
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*), COUNT(DISTINCT emp_id, date) FROM attendance")
+    n, distinct = cur.fetchone()
+    cur.execute("ANALYZE TABLE attendance")
+    cur.fetchall()
+    cur.close()
+    print(f"[INFO] {n} rows left, {distinct} distinct (emp_id, date)" + ("" if n == distinct else "  FAIL"))
+
+    after = measure(conn, args.employees, args.days, args.repeat)
+    report(f"after ({migrations.UNIQUE_DAY_KEY})", after)
+    conn.close()
+
+    failed = n != distinct
+    print("plan check")
+    for name, (typ, key, *_rest) in after.items():
+        ok = key == migrations.UNIQUE_DAY_KEY and typ != "ALL"
+        failed |= not ok
+        p_before, p_after = before[name][4], after[name][4]
+        print(f"  {name:<24} {'PASS' if ok else 'FAIL'}  p50 {p_before:.2f} -> {p_after:.2f} ms "
+              f"({p_before / max(p_after, 1e-6):.1f}x)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
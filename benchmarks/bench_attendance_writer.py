@@ -0,0 +1,123 @@
+# benchmarks/bench_attendance_writer.py
+# Attendance write throughput: the old per-event path (fresh connection per query,
+# SELECT/INSERT/SELECT/UPDATE) vs AttendanceWriter (pooled, batched upserts).
+#
+# Needs a local MySQL. Uses (and recreates) a scratch database, face_db_bench by default:
+#   python -m benchmarks.bench_attendance_writer --events 2000 --employees 300 \
+#       --host localhost --user root --password ...
+
+import argparse
+import datetime
+import random
+import time
+
+import mysql.connector
+
+from attendance_writer import AttendanceWriter
+from db import ConnectionPool
+
+
+def setup_schema(cfg, db_name, employees):
+    conn = mysql.connector.connect(**cfg)
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+    cur.execute(f"CREATE DATABASE {db_name}")
+    cur.execute(f"USE {db_name}")
+    cur.execute("""
+        CREATE TABLE employees (
+            id VARCHAR(50) PRIMARY KEY, name VARCHAR(100), embedding LONGBLOB,
+            password_hash VARCHAR(255), contact_number VARCHAR(20))
+    """)
+    cur.execute("""
+        CREATE TABLE attendance (
+            id INT AUTO_INCREMENT PRIMARY KEY, emp_id VARCHAR(50), date DATE,
+            in1 TIME, out1 TIME, in2 TIME, out2 TIME,
+            FOREIGN KEY (emp_id) REFERENCES employees(id))
+    """)
+    cur.executemany("INSERT INTO employees (id, name) VALUES (%s, %s)",
+                    [(f"CS{i:05d}", f"Person {i}") for i in range(employees)])
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def synthetic_events(n, employees, seed=0):
+    rng = random.Random(seed)
+    day = datetime.date(2025, 1, 6)
+    events = []
+    for i in range(n):
+        minute = rng.randrange(8 * 60, 18 * 60)
+        dt = datetime.datetime.combine(day, datetime.time(minute // 60, minute % 60, rng.randrange(60)))
+        events.append((f"CS{rng.randrange(employees):05d}", dt))
+    return events
+
+
+def legacy_write(cfg, emp_id, dt):
+    # mirrors recognize.ensure_attendance_row + update_field, minus the notification
+    def connect():
+        return mysql.connector.connect(**cfg)
+
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute("SELECT id, in1, out1, in2, out2 FROM attendance WHERE emp_id=%s AND date=%s", (emp_id, dt.date()))
+    row = cur.fetchone()
+    if row is None:
+        cur.execute("INSERT INTO attendance (emp_id, date) VALUES (%s, %s)", (emp_id, dt.date()))
+        conn.commit()
+        cur.execute("SELECT id, in1, out1, in2, out2 FROM attendance WHERE emp_id=%s AND date=%s", (emp_id, dt.date()))
+        row = cur.fetchone()
+    cur.close()
+    conn.close()
+
+    att_id, in1, _, in2, _ = row
+    if dt.time() < datetime.time(13, 45):
+        field = "in1" if in1 is None else "out1"
+    else:
+        field = "in2" if in2 is None else "out2"
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute(f"UPDATE attendance SET {field}=%s WHERE id=%s", (dt.strftime("%H:%M:%S"), att_id))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def run(args):
+    base = {"host": args.host, "user": args.user, "password": args.password}
+    cfg = dict(base, database=args.database)
+    events = synthetic_events(args.events, args.employees)
+
+    setup_schema(base, args.database, args.employees)
+    t0 = time.perf_counter()
+    for emp_id, dt in events:
+        legacy_write(cfg, emp_id, dt)
+    legacy = time.perf_counter() - t0
+
+    setup_schema(base, args.database, args.employees)
+    writer = AttendanceWriter(ConnectionPool(cfg, size=args.pool_size, name="bench_pool"),
+                              max_batch=args.batch, queue_depth=len(events) + 1)
+    writer.start()
+    t0 = time.perf_counter()
+    for emp_id, dt in events:
+        writer.submit(emp_id, dt)
+    writer.close()
+    writer.join()
+    batched = time.perf_counter() - t0
+
+    print(f"events={len(events)} employees={args.employees} batch={args.batch}")
+    print(f"legacy per-event : {len(events) / legacy:10.1f} events/s  ({legacy:.2f} s)")
+    print(f"AttendanceWriter : {len(events) / batched:10.1f} events/s  ({batched:.2f} s)"
+          f"  applied={writer.applied} failed={writer.failed}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Attendance write throughput, legacy vs AttendanceWriter")
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="face_db_bench")
+    ap.add_argument("--events", type=int, default=2000)
+    ap.add_argument("--employees", type=int, default=300)
+    ap.add_argument("--batch", type=int, default=64)
+    ap.add_argument("--pool-size", type=int, default=2)
+    run(ap.parse_args())
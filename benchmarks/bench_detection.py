@@ -0,0 +1,92 @@
+# benchmarks/bench_detection.py
+# Detections/sec and recall of the downscaled, size-bounded Haar detector against the
+# previous full-resolution call (haar.detectMultiScale(gray, 1.1, 5)) on a recorded clip.
+# A reference box counts as found when a candidate box overlaps it with IoU >= 0.5.
+#
+#   python -m benchmarks.bench_detection recordings/gate1.mp4 --widths 960 640 480
+
+import argparse
+import time
+
+import cv2
+
+import recognize
+from detection import HaarDetector, CameraGeometry
+from tracking import iou_matrix
+
+
+def load_frames(clip, max_frames=None):
+    cap = cv2.VideoCapture(clip)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open {clip}")
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def to_xyxy(faces):
+    return [(x, y, x + w, y + h) for (x, y, w, h) in faces]
+
+
+def timed(frames, detect):
+    out, t0 = [], time.perf_counter()
+    for frame in frames:
+        out.append(to_xyxy(detect(frame)))
+    return out, time.perf_counter() - t0
+
+
+def recall(reference, candidate):
+    found = total = 0
+    for ref, got in zip(reference, candidate):
+        total += len(ref)
+        if ref and got:
+            found += int((iou_matrix(ref, got).max(axis=1) >= 0.5).sum())
+    return found, total
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Downscaled, size-bounded Haar detection vs full resolution")
+    ap.add_argument("clip")
+    ap.add_argument("--max-frames", type=int, default=None)
+    ap.add_argument("--widths", type=int, nargs="+", default=[960, 640, 480, 320])
+    ap.add_argument("--vfov", type=float, default=recognize.CAMERA_VFOV_DEG)
+    ap.add_argument("--min-distance", type=float, default=recognize.FACE_MIN_DISTANCE_M)
+    ap.add_argument("--max-distance", type=float, default=recognize.FACE_MAX_DISTANCE_M)
+    args = ap.parse_args()
+
+    frames = load_frames(args.clip, args.max_frames)
+    if not frames:
+        raise SystemExit("No frames read")
+    h, w = frames[0].shape[:2]
+    geometry = CameraGeometry(args.vfov, args.min_distance, args.max_distance)
+    lo, hi = geometry.face_bounds(h)
+    print(f"clip={args.clip} frames={len(frames)} size={w}x{h} face bounds={lo}-{hi}px")
+
+    baseline = HaarDetector()  # 1.1 / 5, full resolution, no size limits
+    ref, t_ref = timed(frames, baseline.detect)
+    n_ref = sum(len(b) for b in ref)
+
+    rows = [("full-res (previous)", ref, t_ref)]
+    rows.append(("full-res + size bounds", *timed(frames, HaarDetector(geometry=geometry).detect)))
+    for width in args.widths:
+        if width >= w:
+            continue
+        rows.append((f"width {width}", *timed(frames, HaarDetector(max_width=width).detect)))
+        rows.append((f"width {width} + bounds", *timed(frames, HaarDetector(max_width=width, geometry=geometry).detect)))
+
+    print(f"{'mode':<24} {'ms/frame':>9} {'frames/s':>9} {'det/s':>8} {'dets':>6} {'recall':>8} {'speedup':>8}")
+    for label, boxes, secs in rows:
+        n = sum(len(b) for b in boxes)
+        found, total = recall(ref, boxes)
+        print(f"{label:<24} {1000 * secs / len(frames):>9.2f} {len(frames) / secs:>9.1f} {n / secs:>8.1f} "
+              f"{n:>6} {found / total if total else 1:>8.1%} {t_ref / secs:>7.2f}x")
+    print(f"reference detections: {n_ref}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_detectors.py
+# Per-backend CPU latency, throughput and recall of the face detectors in detection.py
+# on the same frame set, to pick a backend per deployment.
+#
+# Recall is measured against --truth (one JSON list of [x, y, w, h] boxes per line, one
+# line per frame) when given, otherwise against the --reference backend's detections.
+# "extra" counts detections that match nothing in the reference (false positives when
+# the reference is hand-labelled). Backends whose model files are missing are skipped.
+#
+#   python -m benchmarks.bench_detectors recordings/gate1.mp4 --max-frames 300
+#   python -m benchmarks.bench_detectors gate1.mp4 --backends haar yunet --truth gate1_boxes.jsonl
+
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_detection import load_frames, to_xyxy
+from detection import DETECTOR_PRESETS, create_detector
+from tracking import iou_matrix
+
+
+def run_backend(detector, frames):
+    boxes, lat = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        faces = detector.detect(frame)
+        lat.append(time.perf_counter() - t0)
+        boxes.append(to_xyxy(faces))
+    return boxes, np.array(lat)
+
+
+def match_counts(reference, candidate, min_iou=0.5):
+    found = total = extra = 0
+    for ref, got in zip(reference, candidate):
+        total += len(ref)
+        if not got:
+            continue
+        if not ref:
+            extra += len(got)
+            continue
+        ious = iou_matrix(ref, got)
+        found += int((ious.max(axis=1) >= min_iou).sum())
+        extra += int((ious.max(axis=0) < min_iou).sum())
+    return found, total, extra
+
+
+def load_truth(path, n):
+    with open(path) as f:
+        truth = [to_xyxy(json.loads(line)) for line in f if line.strip()]
+    if len(truth) < n:
+        raise SystemExit(f"{path} has {len(truth)} frames of labels, clip has {n}")
+    return truth[:n]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency, throughput and recall per face detector backend")
+    ap.add_argument("clip")
+    ap.add_argument("--max-frames", type=int, default=None)
+    ap.add_argument("--backends", nargs="+", default=list(DETECTOR_PRESETS))
+    ap.add_argument("--reference", default="haar", help="backend used as ground truth when --truth is not given")
+    ap.add_argument("--truth", default=None)
+    ap.add_argument("--max-width", type=int, default=None, help="downscale frames for every backend")
+    ap.add_argument("--threads", type=int, default=None, help="cv2.setNumThreads for the run")
+    args = ap.parse_args()
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    frames = load_frames(args.clip, args.max_frames)
+    if not frames:
+        raise SystemExit("No frames read")
+    h, w = frames[0].shape[:2]
+
+    results = {}
+    for name in args.backends:
+        try:
+            detector = create_detector(name, max_width=args.max_width)
+        except (ValueError, FileNotFoundError) as e:
+            print(f"[WARN] skipping {name}: {e}")
+            continue
+        detector.detect(frames[0])  # warm-up (DNN backends allocate on first call)
+        results[name] = run_backend(detector, frames)
+
+    if args.truth:
+        reference, ref_label = load_truth(args.truth, len(frames)), args.truth
+    elif args.reference in results:
+        reference, ref_label = results[args.reference][0], f"backend '{args.reference}'"
+    else:
+        raise SystemExit(f"Reference backend '{args.reference}' did not run")
+
+    print(f"clip={args.clip} frames={len(frames)} size={w}x{h} max_width={args.max_width} "
+          f"cv2 threads={cv2.getNumThreads()} reference={ref_label}")
+    print(f"{'backend':<12} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'frames/s':>9} "
+          f"{'dets':>6} {'recall':>8} {'extra':>6}")
+    for name, (boxes, lat) in results.items():
+        found, total, extra = match_counts(reference, boxes)
+        print(f"{name:<12} {1000 * lat.mean():>8.2f} {1000 * np.percentile(lat, 50):>8.2f} "
+              f"{1000 * np.percentile(lat, 95):>8.2f} {len(lat) / lat.sum():>9.1f} "
+              f"{sum(len(b) for b in boxes):>6} {found / total if total else 1:>8.1%} {extra:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# benchmarks/bench_duplicate_check.py
+# Registration's duplicate-face check: the old per-row loop (fetch every embedding,
+# decode each blob, one face_distance call per employee) against app.py's
+# DuplicateIndex (one vectorized nearest-neighbour query), at several headcounts.
+#
+# In memory (no database):
+#   legacy      decode + distance loop over N raw float32 blobs
+#   index       DuplicateIndex.nearest(), plus the one-off build and an upsert/remove
+#
+# With --db, against a scratch MySQL database (face_db_bench, recreated per size):
+#   legacy      SELECT id, name, embedding FROM employees + the loop, as register() did
+#   index warm  GallerySync marker query (nothing changed) + nearest()
+#   index +1    one new employee since the last check: marker, stamps, one row fetch
+#
+#   python -m benchmarks.bench_duplicate_check --sizes 1000 20000
+#   python -m benchmarks.bench_duplicate_check --db --password ...
+
+import argparse
+import time
+
+import numpy as np
+
+from embedding_codec import decode_embedding, encode_embedding
+from gallery import DuplicateIndex
+from gallery_sync import GallerySync, bump_gallery_version
+
+EMB_DIM = 512
+THRESHOLD = 0.9  # app.DUPLICATE_DISTANCE
+
+
+def face_distance(a, b):
+    # the removed app.face_distance the old loop called
+    a = a.astype("float32")
+    b = b.astype("float32")
+    return float(np.linalg.norm(a - b))
+
+
+def legacy_check(rows, new_emb):
+    for other_id, other_name, emb_blob in rows:
+        try:
+            existing_emb = decode_embedding(emb_blob)
+            if existing_emb is None:
+                continue
+            if face_distance(new_emb, existing_emb) <= THRESHOLD:
+                return other_id, other_name
+        except Exception:
+            continue
+    return None
+
+
+def index_check(index, new_emb):
+    hit = index.nearest(new_emb)
+    return (hit[0], hit[1]) if hit is not None and hit[2] <= THRESHOLD else None
+
+
+def timings(fn, repeat):
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return 1000 * float(np.median(out)), 1000 * float(np.percentile(out, 95))
+
+
+def synthetic(n, rng):
+    # unit-length like FaceNet output; a fresh random vector is ~1.41 from all of them
+    embs = rng.standard_normal((n, EMB_DIM)).astype(np.float32)
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    return [f"CS{i:06d}" for i in range(n)], embs
+
+
+def queries(embs, rng):
+    """A new face (no duplicate: the loop scans every row) and a re-enrollment of the last employee."""
+    fresh = rng.standard_normal(EMB_DIM).astype(np.float32)
+    fresh /= np.linalg.norm(fresh)
+    again = embs[-1] + 0.02 * rng.standard_normal(EMB_DIM).astype(np.float32)
+    return fresh, again
+
+
+def run_memory(sizes, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    print(f"{'employees':>9} {'legacy p50 ms':>13} {'index p50 ms':>12} {'index p95 ms':>12} {'speedup':>8} "
+          f"{'build ms':>9} {'upsert us':>9} {'remove us':>9}")
+    for n in sizes:
+        ids, embs = synthetic(n, rng)
+        rows = [(i, f"Person {i}", encode_embedding(e)) for i, e in zip(ids, embs)]
+        fresh, again = queries(embs, rng)
+
+        t0 = time.perf_counter()
+        index = DuplicateIndex()
+        for i, e in zip(ids, embs):
+            index.upsert(i, f"Person {i}", e)
+        build_ms = 1000 * (time.perf_counter() - t0)
+
+        assert legacy_check(rows, fresh) is None and index_check(index, fresh) is None
+        assert legacy_check(rows, again) == index_check(index, again) == (ids[-1], f"Person {ids[-1]}")
+
+        legacy_p50, _ = timings(lambda: legacy_check(rows, fresh), max(3, repeat // 20))
+        index_p50, index_p95 = timings(lambda: index_check(index, fresh), repeat)
+
+        extra = np.ones(EMB_DIM, dtype=np.float32) / np.sqrt(EMB_DIM)
+        t0 = time.perf_counter()
+        index.upsert("NEW", "New", extra)
+        upsert_us = 1e6 * (time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        index.remove(ids[0])
+        remove_us = 1e6 * (time.perf_counter() - t0)
+
+        print(f"{n:>9} {legacy_p50:>13.2f} {index_p50:>12.3f} {index_p95:>12.3f} "
+              f"{legacy_p50 / index_p50:>7.0f}x {build_ms:>9.1f} {upsert_us:>9.1f} {remove_us:>9.1f}")
+
+
+# ---------------- DATABASE ----------------
+def setup_db(cfg, db_name, ids, embs):
+    import mysql.connector
+
+    conn = mysql.connector.connect(**cfg)
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+    cur.execute(f"CREATE DATABASE {db_name}")
+    cur.execute(f"USE {db_name}")
+    cur.execute("""
+        CREATE TABLE employees (
+            id VARCHAR(50) PRIMARY KEY, name VARCHAR(100), embedding LONGBLOB,
+            password_hash VARCHAR(255), contact_number VARCHAR(20),
+            updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6))
+    """)
+    cur.execute("CREATE TABLE sync_versions (name VARCHAR(50) PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0)")
+    rows = [(i, f"Person {i}", encode_embedding(e)) for i, e in zip(ids, embs)]
+    for start in range(0, len(rows), 1000):
+        cur.executemany("INSERT INTO employees (id, name, embedding) VALUES (%s, %s, %s)", rows[start:start + 1000])
+    bump_gallery_version(cur)
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def run_db(sizes, repeat, cfg, db_name, seed=0):
+    import mysql.connector
+
+    rng = np.random.default_rng(seed)
+    db_cfg = dict(cfg, database=db_name)
+
+    def connect():
+        return mysql.connector.connect(**db_cfg)
+
+    def legacy(new_emb):
+        conn = connect()
+        cur = conn.cursor()
+        cur.execute("SELECT id, name, embedding FROM employees WHERE embedding IS NOT NULL")
+        hit = legacy_check(cur.fetchall(), new_emb)
+        cur.close()
+        conn.close()
+        return hit
+
+    print(f"{'employees':>9} {'legacy p50 ms':>13} {'index warm ms':>13} {'index +1 ms':>11} {'load ms':>8}")
+    for n in sizes:
+        ids, embs = synthetic(n, rng)
+        setup_db(cfg, db_name, ids, embs)
+        fresh, _ = queries(embs, rng)
+
+        sync, index = GallerySync(connect, decode_embedding), DuplicateIndex()
+        t0 = time.perf_counter()
+        for rec in sync.load():
+            index.upsert(rec["id"], rec["name"], rec["embedding"])
+        load_ms = 1000 * (time.perf_counter() - t0)
+
+        def indexed():
+            changes = sync.check()
+            if changes:
+                upserted, deleted = changes
+                for emp_id in deleted:
+                    index.remove(emp_id)
+                for emp_id in upserted:
+                    rec = sync.records[emp_id]
+                    index.upsert(emp_id, rec["name"], rec["embedding"])
+            return index_check(index, fresh)
+
+        legacy_p50, _ = timings(lambda: legacy(fresh), max(3, repeat // 20))
+        warm_p50, _ = timings(indexed, repeat)
+
+        plus_one = []
+        for k in range(max(3, repeat // 20)):
+            conn = connect()
+            cur = conn.cursor()
+            cur.execute("INSERT INTO employees (id, name, embedding) VALUES (%s, %s, %s)",
+                        (f"NEW{k:04d}", "New", encode_embedding(fresh)))
+            bump_gallery_version(cur)
+            conn.commit()
+            cur.close()
+            conn.close()
+            t0 = time.perf_counter()
+            indexed()
+            plus_one.append(time.perf_counter() - t0)
+
+        print(f"{n:>9} {legacy_p50:>13.1f} {warm_p50:>13.2f} {1000 * float(np.median(plus_one)):>11.2f} "
+              f"{load_ms:>8.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Registration duplicate check: row loop vs vectorized index")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000])
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--db", action="store_true", help="also run against a scratch MySQL database")
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="face_db_bench")
+    args = ap.parse_args()
+
+    run_memory(args.sizes, args.repeat)
+    if args.db:
+        print()
+        run_db(args.sizes, args.repeat, {"host": args.host, "user": args.user, "password": args.password},
+               args.database)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# benchmarks/bench_enrollment.py
+# Registration capture: the old fixed 50-frame loop (every detected face embedded one
+# at a time, plain mean) against enrollment.EnrollmentCapture (quality gate, batched
+# inference, early stop), replayed on recorded enrollment sessions.
+#
+#   --sessions  one sub-folder per person holding a webcam recording of a registration
+#               (a video file, or numbered frames), replayed as if it were the camera
+#   --probes    optional face crops, one sub-folder per person (e.g. cut from CCTV),
+#               to score the templates against; without it the last third of each
+#               session, which neither method gets to see, is cropped and used
+#
+# Reported per method:
+#   frames      camera frames consumed until the template was ready
+#   capture s   estimated wall time at --fps: each frame costs max(1/fps, processing)
+#   genuine     cosine of the template to the person's own probes (mean and p10)
+#   impostor    highest cosine of the template to anyone else's probes (mean)
+#   rank-1      probes whose best template is their own person's
+#
+#   python -m benchmarks.bench_enrollment --sessions enroll_clips/ --probes cctv_crops/
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from batch_footage import VIDEO_EXTS
+from convert_tflite import IMAGE_EXTS, list_images
+from detection import largest_face
+from enrollment import EnrollmentCapture, QualityGate
+
+
+def load_session(folder, max_frames):
+    """Frames of one recorded session, in order."""
+    videos = sorted(f for f in os.listdir(folder) if f.lower().endswith(VIDEO_EXTS))
+    if videos:
+        cap = cv2.VideoCapture(os.path.join(folder, videos[0]))
+        frames = []
+        while len(frames) < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+        return frames
+    names = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTS))
+    frames = [cv2.imread(os.path.join(folder, f)) for f in names[:max_frames]]
+    return [f for f in frames if f is not None]
+
+
+def legacy_capture(facenet, detector, frames, num_images=50):
+    """The previous capture_face_embedding loop, frame by frame."""
+    collected, per_frame, used = [], [], 0
+    for frame in frames:
+        if len(collected) >= num_images:
+            break
+        used += 1
+        t0 = time.perf_counter()
+        face = largest_face(detector.detect(frame))
+        if face is not None:
+            x, y, w, h = face
+            pad = 10
+            face_img = frame[max(y - pad, 0):min(y + h + pad, frame.shape[0]),
+                             max(x - pad, 0):min(x + w + pad, frame.shape[1])]
+            face_rgb = cv2.resize(cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB), (160, 160))
+            collected.append(facenet.embeddings([face_rgb])[0])
+        per_frame.append(time.perf_counter() - t0)
+    template = np.mean(collected, axis=0) if len(collected) >= num_images else None
+    return template, used, per_frame
+
+
+def early_stop_capture(embedder, detector, frames, num_images=50):
+    capture = EnrollmentCapture(embedder, detector, max_samples=num_images, timeout_s=0)
+    per_frame = []
+    for frame in frames:
+        if capture.done:
+            break
+        t0 = time.perf_counter()
+        capture.add_frame(frame)
+        per_frame.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    template = capture.result()
+    if per_frame:
+        per_frame[-1] += time.perf_counter() - t0
+    if capture.stats()["embedded"] < capture.min_samples:
+        template = None
+    return template, len(per_frame), per_frame, capture.stats()
+
+
+def session_probes(embedder, detector, frames):
+    """Held-out probes from a session: usable faces in its last third."""
+    gate = QualityGate()
+    crops = []
+    for frame in frames[2 * len(frames) // 3::3]:
+        box = largest_face(detector.detect(frame))
+        if box is not None:
+            reason, crop = gate.check(frame, box)
+            if reason is None:
+                crops.append(crop)
+    return [e for e in embedder.embed_crops(crops) if e is not None] if crops else []
+
+
+def unit(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-10)
+
+
+def score(templates, probes):
+    """Genuine / impostor cosines and rank-1 accuracy of {person: template} against {person: [emb]}."""
+    people = [p for p in templates if templates[p] is not None]
+    if not people:
+        return None
+    gallery = unit(np.stack([templates[p] for p in people]))
+    genuine, impostor, hits, total = [], [], 0, 0
+    for person, embs in probes.items():
+        if not len(embs):
+            continue
+        sims = unit(np.stack(embs)) @ gallery.T
+        if person in people:
+            col = people.index(person)
+            genuine.extend(sims[:, col])
+            others = np.delete(sims, col, axis=1)
+            if others.shape[1]:
+                impostor.extend(others.max(axis=1))
+            hits += int(np.sum(sims.argmax(axis=1) == col))
+        total += len(embs)
+    return {
+        "genuine_mean": float(np.mean(genuine)) if genuine else float("nan"),
+        "genuine_p10": float(np.percentile(genuine, 10)) if genuine else float("nan"),
+        "impostor_mean": float(np.mean(impostor)) if impostor else float("nan"),
+        "rank1": hits / total if total else float("nan"),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fixed 50-frame enrollment vs batched early-stopping capture")
+    ap.add_argument("--sessions", required=True, help="one sub-folder per person with a recorded registration")
+    ap.add_argument("--probes", help="face crops, one sub-folder per person (default: end of each session)")
+    ap.add_argument("--num-images", type=int, default=50)
+    ap.add_argument("--fps", type=float, default=30.0, help="camera frame rate the sessions are replayed at")
+    ap.add_argument("--max-frames", type=int, default=900)
+    args = ap.parse_args()
+
+    import app  # connects to the database on import
+
+    facenet = app.get_facenet()
+    embedder = app.get_enroll_embedder()
+    detector = app.get_face_detector()
+    embedder.embed_crops([np.zeros((160, 160, 3), np.uint8)])  # warm-up
+
+    people = sorted(d for d in os.listdir(args.sessions) if os.path.isdir(os.path.join(args.sessions, d)))
+    frame_s = 1.0 / args.fps
+    rows, templates, probes = [], {"legacy": {}, "early-stop": {}}, {}
+    for person in people:
+        frames = load_session(os.path.join(args.sessions, person), args.max_frames)
+        if not frames:
+            print(f"[WARN] {person}: no frames")
+            continue
+        legacy, legacy_frames, legacy_t = legacy_capture(facenet, detector, frames, args.num_images)
+        new, new_frames, new_t, stats = early_stop_capture(embedder, detector, frames, args.num_images)
+        templates["legacy"][person], templates["early-stop"][person] = legacy, new
+        if not args.probes:
+            probes[person] = session_probes(embedder, detector, frames)
+        cos = float(unit(legacy) @ unit(new)) if legacy is not None and new is not None else float("nan")
+        rows.append((person, legacy_frames, sum(max(frame_s, t) for t in legacy_t),
+                     new_frames, sum(max(frame_s, t) for t in new_t), stats, cos))
+
+    if args.probes:
+        for path in list_images(args.probes):
+            crop = cv2.imread(path)
+            if crop is not None:
+                probes.setdefault(os.path.basename(os.path.dirname(path)), []).append(crop)
+        probes = {p: [e for e in embedder.embed_crops(c) if e is not None] for p, c in probes.items()}
+
+    print(f"sessions={len(rows)} num_images={args.num_images} fps={args.fps:g} "
+          f"probes={sum(len(v) for v in probes.values())} ({'--probes' if args.probes else 'session tails'})")
+    print(f"{'person':<20} {'legacy frames':>13} {'legacy s':>9} {'new frames':>10} {'new s':>7} "
+          f"{'embedded':>8} {'rejected':>8} {'stop':>12} {'cos(old,new)':>12}")
+    for person, lf, ls, nf, ns, st, cos in rows:
+        print(f"{person:<20} {lf:>13} {ls:>9.2f} {nf:>10} {ns:>7.2f} {st['embedded']:>8} "
+              f"{sum(st['rejected'].values()):>8} {st['stop']:>12} {cos:>12.4f}")
+    if rows:
+        print(f"{'mean':<20} {np.mean([r[1] for r in rows]):>13.1f} {np.mean([r[2] for r in rows]):>9.2f} "
+              f"{np.mean([r[3] for r in rows]):>10.1f} {np.mean([r[4] for r in rows]):>7.2f}")
+
+    print(f"\n{'method':<12} {'genuine mean':>12} {'genuine p10':>11} {'impostor mean':>13} {'rank-1':>7}")
+    for method, tpl in templates.items():
+        s = score(tpl, probes)
+        if s is None:
+            print(f"{method:<12} (no templates)")
+            continue
+        print(f"{method:<12} {s['genuine_mean']:>12.4f} {s['genuine_p10']:>11.4f} "
+              f"{s['impostor_mean']:>13.4f} {s['rank1']:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
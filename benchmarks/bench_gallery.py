@@ -0,0 +1,80 @@
+# benchmarks/bench_gallery.py
+# Compare the old per-record cosine_similarity loop with GalleryMatcher.
+#
+# Run from the repository root:
+#   python -m benchmarks.bench_gallery
+#   python -m benchmarks.bench_gallery --sizes 100 1000 10000 --faces 4 --repeat 20
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from gallery import GalleryMatcher
+
+EMB_DIM = 512
+
+
+def legacy_find_best_match(embedding, known_list):
+    # verbatim copy of the loop recognize.find_best_match used before GalleryMatcher
+    best = None
+    best_score = 0
+    for rec in known_list:
+        try:
+            score = float(cosine_similarity([embedding], [rec["embedding"]])[0][0])
+        except:
+            continue
+
+        if score > best_score:
+            best_score = score
+            best = rec
+    return best, best_score
+
+
+def synthetic_gallery(n, rng):
+    embs = rng.standard_normal((n, EMB_DIM)).astype(np.float32)
+    return [{"id": f"CS{i:05d}", "name": f"Person {i}", "embedding": embs[i], "contact": None}
+            for i in range(n)]
+
+
+def time_call(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(sizes, faces, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    print(f"{'identities':>10} {'faces':>5} {'legacy ms':>11} {'matcher ms':>11} {'speedup':>8} {'agree':>6}")
+    for n in sizes:
+        known = synthetic_gallery(n, rng)
+        matcher = GalleryMatcher.from_records(known)
+        # queries are noisy copies of enrolled faces so there is a real best match
+        picks = rng.integers(0, n, size=faces)
+        queries = np.stack([known[i]["embedding"] for i in picks])
+        queries += 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+
+        # the legacy loop is slow at 10k; fewer repeats keep the run short
+        legacy_repeat = max(1, repeat // 10) if n >= 5000 else repeat
+        t_legacy = time_call(lambda: [legacy_find_best_match(q, known) for q in queries], legacy_repeat)
+        t_matcher = time_call(lambda: matcher.match_batch(queries, k=1), repeat)
+
+        legacy_ids = [legacy_find_best_match(q, known)[0]["id"] for q in queries]
+        new_ids = [row[0][0]["id"] for row in matcher.match_batch(queries, k=1)]
+        agree = sum(a == b for a, b in zip(legacy_ids, new_ids)) / len(queries)
+
+        print(f"{n:>10} {faces:>5} {t_legacy * 1e3:>11.2f} {t_matcher * 1e3:>11.3f} "
+              f"{t_legacy / t_matcher:>7.0f}x {agree:>6.0%}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Per-record loop vs GalleryMatcher")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    ap.add_argument("--faces", type=int, default=4, help="faces per frame (query batch size)")
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+    run(args.sizes, args.faces, args.repeat)
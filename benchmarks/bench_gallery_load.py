@@ -0,0 +1,64 @@
+# benchmarks/bench_gallery_load.py
+# Gallery startup cost without the database round-trip: decoding N legacy pickled
+# blobs, decoding N raw float32 blobs (embedding_codec), and opening a memory-mapped
+# gallery snapshot and building the matcher from it.
+#
+#   python -m benchmarks.bench_gallery_load --sizes 1000 10000 50000
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+
+from embedding_codec import decode_embedding, encode_embedding
+from gallery import GalleryMatcher
+from gallery_snapshot import read_snapshot, write_snapshot
+
+EMB_DIM = 512
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def run(sizes, seed=0):
+    rng = np.random.default_rng(seed)
+    print(f"{'identities':>10} {'pickle ms':>10} {'raw ms':>9} {'snapshot ms':>12} {'file MB':>8}")
+    for n in sizes:
+        embs = rng.standard_normal((n, EMB_DIM)).astype(np.float32)
+        ids = [f"CS{i:06d}" for i in range(n)]
+        legacy = [pickle.dumps(e) for e in embs]
+        raw = [encode_embedding(e) for e in embs]
+
+        def build(blobs):
+            recs = [{"id": i, "name": i, "embedding": decode_embedding(b), "contact": None}
+                    for i, b in zip(ids, blobs)]
+            return GalleryMatcher.from_records(recs)
+
+        _, t_pickle = timed(lambda: build(legacy))
+        _, t_raw = timed(lambda: build(raw))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "gallery.snapshot")
+            write_snapshot(path, ids, ids, [None] * n, ["0"] * n, None, embs)
+
+            def open_snapshot():
+                snap = read_snapshot(path)
+                return GalleryMatcher.from_normalized(snap["ids"], snap["names"], snap["contacts"], snap["matrix"])
+            matcher, t_snap = timed(open_snapshot)
+            size_mb = os.path.getsize(path) / 1e6
+            del matcher
+
+        print(f"{n:>10} {1000 * t_pickle:>10.1f} {1000 * t_raw:>9.1f} {1000 * t_snap:>12.1f} {size_mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Gallery startup: pickle vs raw float32 vs memory-mapped snapshot")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = ap.parse_args()
+    run(args.sizes)
@@ -0,0 +1,77 @@
+# benchmarks/bench_motion.py
+# Detection-stage cost per frame with and without the motion gate on a recorded clip,
+# plus how many of the ungated detections the gated path still finds.
+#
+#   python -m benchmarks.bench_motion recordings/corridor.mp4
+
+import argparse
+import time
+
+import cv2
+
+import recognize
+from tracking import iou_matrix
+
+
+def run(clip, max_frames=None):
+    cap = cv2.VideoCapture(clip)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open {clip}")
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+
+    # ungated: what recognize.main did before the gate
+    full_boxes, t_full = [], 0.0
+    for frame in frames:
+        t0 = time.perf_counter()
+        boxes, _ = recognize.face_boxes_and_crops(frame, recognize.detect_faces(frame))
+        t_full += time.perf_counter() - t0
+        full_boxes.append(boxes)
+
+    # gated: same decisions as CameraRecognizer.process (tracker kept for the keepalive rule)
+    rec = recognize.CameraRecognizer(None, None, cross_frame=False, annotate=False, motion_gate=True)
+    gated_boxes, t_gated, t_static, n_static, n_roi = [], 0.0, 0.0, 0, 0
+    for frame in frames:
+        t0 = time.perf_counter()
+        regions = rec.detection_regions(frame)
+        if regions is False:
+            boxes = []
+        else:
+            boxes, _ = recognize.face_boxes_and_crops(frame, recognize.detect_faces(frame, regions))
+            rec.tracker.update(boxes)
+        dt = time.perf_counter() - t0
+        t_gated += dt
+        if regions is False:
+            t_static += dt
+            n_static += 1
+        elif regions is not None:
+            n_roi += 1
+        gated_boxes.append(boxes)
+
+    found = total = 0
+    for ref, got in zip(full_boxes, gated_boxes):
+        total += len(ref)
+        if ref and got:
+            found += int((iou_matrix(ref, got).max(axis=1) >= 0.5).sum())
+
+    n = len(frames)
+    print(f"clip={clip} frames={n}")
+    print(f"ungated : {1000 * t_full / n:7.2f} ms/frame  detections={total}")
+    print(f"gated   : {1000 * t_gated / n:7.2f} ms/frame  static={n_static} ({n_static / n:.0%})"
+          f"  roi-only={n_roi}  full={n - n_static - n_roi}")
+    if n_static:
+        print(f"static frames cost {1000 * t_static / n_static:.2f} ms each")
+    print(f"recall vs ungated: {found}/{total} = {found / total if total else 1:.1%}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Detection cost with and without the motion gate")
+    ap.add_argument("clip")
+    ap.add_argument("--max-frames", type=int, default=None)
+    args = ap.parse_args()
+    run(args.clip, args.max_frames)
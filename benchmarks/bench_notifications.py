@@ -0,0 +1,53 @@
+# benchmarks/bench_notifications.py
+# Load test of NotificationDispatcher against the local FakeTransport (no network).
+#
+#   python -m benchmarks.bench_notifications --messages 2000 --recipients 500 \
+#       --latency 0.2 --failure-rate 0.05 --workers 1 4 8
+
+import argparse
+import time
+
+from notifications import NotificationDispatcher, FakeTransport, RecipientRateLimiter
+
+
+def run_once(args, workers):
+    transport = FakeTransport(latency=args.latency, failure_rate=args.failure_rate, seed=1)
+    limiter = RecipientRateLimiter(per_minute=args.per_minute, burst=args.burst) if args.per_minute else None
+    disp = NotificationDispatcher(transport, name="bench", workers=workers, queue_depth=args.queue_depth,
+                                  max_retries=args.retries, backoff=args.backoff, rate_limiter=limiter)
+
+    enqueue_times = []
+    t0 = time.perf_counter()
+    for i in range(args.messages):
+        s = time.perf_counter()
+        disp.send(f"+91{9000000000 + i % args.recipients}", f"message {i}")
+        enqueue_times.append(time.perf_counter() - s)
+    enqueued = time.perf_counter() - t0
+    disp.close()
+    total = time.perf_counter() - t0
+
+    enqueue_times.sort()
+    p99 = enqueue_times[int(0.99 * (len(enqueue_times) - 1))]
+    st = disp.stats
+    print(f"{workers:>7} {st['sent'] / total:>9.1f} {enqueued * 1e3:>10.1f} {p99 * 1e6:>11.1f} "
+          f"{st['sent']:>6} {st['failed']:>6} {st['retried']:>7} {st['dropped']:>7} {st['rate_limited']:>7}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="NotificationDispatcher load test with a fake transport")
+    ap.add_argument("--messages", type=int, default=1000)
+    ap.add_argument("--recipients", type=int, default=500)
+    ap.add_argument("--latency", type=float, default=0.05, help="simulated send latency (s)")
+    ap.add_argument("--failure-rate", type=float, default=0.05)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--queue-depth", type=int, default=10000)
+    ap.add_argument("--retries", type=int, default=3)
+    ap.add_argument("--backoff", type=float, default=0.01)
+    ap.add_argument("--per-minute", type=float, default=6, help="per-recipient limit, 0 to disable")
+    ap.add_argument("--burst", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'workers':>7} {'sent/s':>9} {'enqueue ms':>10} {'p99 send us':>11} "
+          f"{'sent':>6} {'failed':>6} {'retried':>7} {'dropped':>7} {'limited':>7}")
+    for w in args.workers:
+        run_once(args, w)
@@ -0,0 +1,307 @@
+# benchmarks/bench_stages.py
+# Per-stage timings of the recognition hot path, written as JSON so runs can be
+# compared across commits and machines. Each stage is timed on its own:
+#
+#   gray                 cv2.cvtColor(frame, COLOR_BGR2GRAY) on a full frame
+#   haar_fullres         haar.detectMultiScale(gray, 1.1, 5), the original full-frame call
+#   detect               recognize.detect_faces(frame) with the configured detector
+#   preprocess_single    compute_embedding_from_crop's BGR->RGB + resize, per crop
+#   preprocess_batch     CropPreprocessor fill + standardization, per batch
+#   facenet              FaceNet inference only, per batch size
+#   match_single         recognize.find_best_match, per gallery size (synthetic gallery)
+#   match_batch          recognize.find_best_matches for one frame's faces, per gallery size
+#   mark_attendance      recognize.mark_attendance against a scratch MySQL database
+#
+# Frames and crops come from local directories; without --crops, faces are cropped
+# from the frames with the configured detector. Notifications use the fake transport.
+#
+#   python -m benchmarks.bench_stages --frames samples/frames --crops samples/crops --out run.json
+#   python -m benchmarks.bench_stages --frames samples/frames --skip facenet mark_attendance
+#   python -m benchmarks.bench_stages --frames samples/frames --out new.json --compare run.json
+#   python -m benchmarks.bench_stages --frames samples/frames --db --password ...   (mark_attendance)
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+
+os.environ.setdefault("NOTIFY_TRANSPORT", "fake")  # before recognize creates its dispatcher
+
+import cv2
+import numpy as np
+
+import recognize
+from convert_tflite import list_images
+from embedding import CropPreprocessor
+
+EMB_DIM = 512
+STAGES = ("gray", "haar_fullres", "detect", "preprocess_single", "preprocess_batch",
+          "facenet", "match_single", "match_batch", "mark_attendance")
+
+
+# ---------------- TIMING ----------------
+def time_calls(fn, args_list, repeat=1, warmup=1):
+    """Per-call seconds of fn(*args) over args_list, `repeat` passes after `warmup` calls."""
+    for args in args_list[:warmup]:
+        fn(*args)
+    out = []
+    for _ in range(repeat):
+        for args in args_list:
+            t0 = time.perf_counter()
+            fn(*args)
+            out.append(time.perf_counter() - t0)
+    return out
+
+
+def summary(stage, durations, items_per_call=1, **params):
+    ms = 1000 * np.asarray(durations)
+    return {
+        "stage": stage,
+        "params": params,
+        "calls": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "min_ms": float(ms.min()),
+        "items_per_s": float(items_per_call * 1000 / ms.mean()) if ms.mean() > 0 else None,
+    }
+
+
+def key(result):
+    return result["stage"] + "".join(f" {k}={v}" for k, v in sorted(result["params"].items()))
+
+
+# ---------------- INPUTS ----------------
+def load_images(root, limit):
+    images = []
+    for path in list_images(root) if root else []:
+        img = cv2.imread(path)
+        if img is not None:
+            images.append(img)
+        if len(images) >= limit:
+            break
+    return images
+
+
+def crops_from_frames(frames, limit):
+    crops = []
+    for frame in frames:
+        _, found = recognize.face_boxes_and_crops(frame, recognize.detect_faces(frame))
+        crops.extend(c for c in found if c is not None and c.size)
+        if len(crops) >= limit:
+            break
+    return crops[:limit]
+
+
+def synthetic_gallery(n, seed=0):
+    """Matcher over n random identities, built like the recognizer's (honours GALLERY_INDEX)."""
+    rng = np.random.default_rng(seed)
+    embs = rng.standard_normal((n, EMB_DIM)).astype(np.float32)
+    records = [{"id": f"CS{i:06d}", "name": f"CS{i:06d}", "contact": None, "embedding": e}
+               for i, e in enumerate(embs)]
+    return recognize.build_matcher(records), rng
+
+
+# ---------------- STAGES ----------------
+def bench_detection(frames, repeat, results):
+    grays = [(cv2.cvtColor(f, cv2.COLOR_BGR2GRAY),) for f in frames]
+    shape = "x".join(map(str, frames[0].shape[1::-1]))
+    results.append(summary("gray", time_calls(lambda f: cv2.cvtColor(f, cv2.COLOR_BGR2GRAY),
+                                              [(f,) for f in frames], repeat), size=shape))
+    haar = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    results.append(summary("haar_fullres", time_calls(lambda g: haar.detectMultiScale(g, 1.1, 5), grays, repeat),
+                           size=shape))
+    results.append(summary("detect", time_calls(recognize.detect_faces, [(f,) for f in frames], repeat),
+                           size=shape, backend=recognize.DETECTOR_BACKEND, max_width=recognize.DETECT_MAX_WIDTH))
+
+
+def bench_preprocess(crops, batch_sizes, repeat, results):
+    def single(crop):
+        # compute_embedding_from_crop minus the FaceNet call
+        return cv2.resize(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB), recognize.IMG_SIZE)
+
+    results.append(summary("preprocess_single", time_calls(single, [(c,) for c in crops], repeat)))
+    pre = CropPreprocessor(max(batch_sizes), recognize.IMG_SIZE)
+
+    def batch(chunk):
+        pre.standardized(len(pre.fill(chunk)))
+
+    for b in batch_sizes:
+        chunks = [(crops[i:i + b],) for i in range(0, len(crops) - b + 1, b)] or [(crops[:b],)]
+        results.append(summary("preprocess_batch", time_calls(batch, chunks, repeat), b, batch=b))
+
+
+def bench_facenet(crops, batch_sizes, repeat, results):
+    embedder = recognize.get_batch_embedder()
+    backend = getattr(embedder.facenet, "metadata", {}).get("backend", recognize.EMBED_BACKEND)
+    for b in batch_sizes:
+        batch = (crops * (b // len(crops) + 1))[:b]
+        n = len(embedder.pre.fill(batch))
+        calls = max(3, 2 * repeat)
+        results.append(summary("facenet", time_calls(embedder.embed_prepared, [(n,)] * calls, 1, warmup=2),
+                               n, batch=b, backend=backend))
+
+
+def bench_matching(gallery_sizes, faces_per_frame, queries, results):
+    for size in gallery_sizes:
+        matcher, rng = synthetic_gallery(size)
+        embs = rng.standard_normal((queries, EMB_DIM)).astype(np.float32)
+        index = type(matcher).__name__
+        results.append(summary("match_single", time_calls(recognize.find_best_match,
+                                                          [(e, matcher) for e in embs]),
+                               gallery=size, index=index))
+        frames = [(list(embs[i:i + faces_per_frame]), matcher)
+                  for i in range(0, queries - faces_per_frame + 1, faces_per_frame)]
+        results.append(summary("match_batch", time_calls(recognize.find_best_matches, frames),
+                               faces_per_frame, gallery=size, faces=faces_per_frame, index=index))
+
+
+def bench_mark_attendance(args, results):
+    from benchmarks.bench_attendance_writer import setup_schema, synthetic_events
+
+    base = {"host": args.host, "user": args.user, "password": args.password}
+    setup_schema(base, args.database, args.employees)
+    recognize.MYSQL_HOST, recognize.MYSQL_USER = args.host, args.user
+    recognize.MYSQL_PASSWORD, recognize.MYSQL_DB = args.password, args.database
+    events = synthetic_events(args.events, args.employees)
+    results.append(summary("mark_attendance", time_calls(recognize.mark_attendance, events, warmup=0),
+                           events=len(events), employees=args.employees))
+    recognize.whatsapp.close(timeout=5)
+
+
+# ---------------- REPORT ----------------
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or None
+
+
+def environment():
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "cpu": cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+        "config": {
+            "detector": recognize.DETECTOR_BACKEND,
+            "detect_max_width": recognize.DETECT_MAX_WIDTH,
+            "embed_backend": recognize.EMBED_BACKEND,
+            "gallery_index": recognize.GALLERY_INDEX,
+        },
+    }
+
+
+def print_table(results, baseline=None):
+    base = {key(r): r for r in (baseline or {}).get("results", [])}
+    print(f"{'stage':<52} {'calls':>6} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'items/s':>10}"
+          + (f" {'vs base':>8}" if base else ""))
+    for r in results:
+        line = (f"{key(r):<52} {r['calls']:>6} {r['mean_ms']:>9.3f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} "
+                f"{r['items_per_s'] or 0:>10.1f}")
+        if base:
+            old = base.get(key(r))
+            line += f" {old['p50_ms'] / r['p50_ms']:>7.2f}x" if old and r["p50_ms"] > 0 else f" {'-':>8}"
+        print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-stage timings of the recognition hot path (JSON output)")
+    ap.add_argument("--frames", help="directory of sample frames (searched recursively)")
+    ap.add_argument("--crops", help="directory of face crops; default: detect faces in --frames")
+    ap.add_argument("--max-frames", type=int, default=50)
+    ap.add_argument("--max-crops", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3, help="passes over the frames/crops per stage")
+    ap.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    ap.add_argument("--gallery-sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    ap.add_argument("--faces-per-frame", type=int, default=4)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--skip", nargs="+", default=[], choices=STAGES, metavar="STAGE", help="stages to leave out")
+    ap.add_argument("--out", help="write results to this JSON file")
+    ap.add_argument("--compare", help="earlier JSON result to compare p50s against")
+    db = ap.add_argument_group("mark_attendance (needs a local MySQL; the scratch database is recreated)")
+    db.add_argument("--db", action="store_true", help="run the mark_attendance stage")
+    db.add_argument("--host", default="localhost")
+    db.add_argument("--user", default="root")
+    db.add_argument("--password", default="")
+    db.add_argument("--database", default="face_db_bench")
+    db.add_argument("--events", type=int, default=200)
+    db.add_argument("--employees", type=int, default=100)
+    args = ap.parse_args()
+
+    skip = set(args.skip)
+    frames = load_images(args.frames, args.max_frames)
+    crops = load_images(args.crops, args.max_crops) if args.crops else crops_from_frames(frames, args.max_crops)
+    results, notes = [], []
+
+    if frames and not skip >= {"gray", "haar_fullres", "detect"}:
+        bench_detection(frames, args.repeat, results)
+        results[:] = [r for r in results if r["stage"] not in skip]
+    elif not frames:
+        notes.append("no frames: detection stages skipped")
+
+    if crops:
+        if not skip >= {"preprocess_single", "preprocess_batch"}:
+            bench_preprocess(crops, args.batch_sizes, args.repeat, results)
+            results[:] = [r for r in results if r["stage"] not in skip]
+        if "facenet" not in skip:
+            try:
+                bench_facenet(crops, args.batch_sizes, args.repeat, results)
+            except (ImportError, OSError) as e:
+                notes.append(f"facenet skipped: {e}")
+    else:
+        notes.append("no face crops: preprocessing and facenet stages skipped")
+
+    if not skip >= {"match_single", "match_batch"}:
+        bench_matching(args.gallery_sizes, args.faces_per_frame, args.queries, results)
+        results[:] = [r for r in results if r["stage"] not in skip]
+
+    if args.db and "mark_attendance" not in skip:
+        bench_mark_attendance(args, results)
+    elif "mark_attendance" not in skip:
+        notes.append("mark_attendance skipped: pass --db")
+
+    report = {
+        "environment": environment(),
+        "inputs": {"frames": len(frames), "crops": len(crops), "crops_from": "dir" if args.crops else "detection"},
+        "notes": notes,
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    for note in notes:
+        print(f"[INFO] {note}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/bench_tflite.py
+# Accuracy, latency and memory of TFLite FaceNet models (convert_tflite.py) against
+# the Keras model, on a local set of face crops.
+#
+#   accuracy  cosine between each crop's Keras and TFLite embedding; if the crops are
+#             in one folder per person, also whether the match decision (identity or
+#             "unknown" at recognize.EMBED_THRESHOLD) is the same as with Keras
+#   latency   per-face ms at batch 1 (p50/p95) and faces/s at batch 8, through the
+#             same BatchEmbedder path the recognizer uses
+#   memory    RSS after loading the model and peak RSS, each backend in its own process
+#
+#   python -m benchmarks.bench_tflite --crops face_crops/ --models models/facenet_fp16.tflite models/facenet_int8.tflite
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import time
+
+import cv2
+import numpy as np
+
+from convert_tflite import list_images
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def profile_backend(backend, model_path, paths, threads, latency_samples=100):
+    """Runs in a fresh process: load one backend, embed every crop, report timings and memory."""
+    from embedding import BatchEmbedder
+    from tflite_embedder import load_facenet
+
+    crops = [cv2.imread(p) for p in paths]
+    rss_base = rss_mb()
+    t0 = time.perf_counter()
+    facenet = load_facenet(backend, model_path, threads)
+    embedder = BatchEmbedder(facenet, capacity=8)
+    embedder.embed_crops(crops[:1])  # warm-up (graph tracing / tensor allocation)
+    load_s = time.perf_counter() - t0
+    rss_loaded = rss_mb()
+
+    lat = []
+    for crop in crops[:latency_samples]:
+        t0 = time.perf_counter()
+        embedder.embed_crops([crop])
+        lat.append(time.perf_counter() - t0)
+
+    embs = []
+    t0 = time.perf_counter()
+    for i in range(0, len(crops), 8):
+        embs.extend(embedder.embed_crops(crops[i:i + 8]))
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "embeddings": np.stack(embs),
+        "load_s": load_s,
+        "lat_p50": float(np.percentile(lat, 50)),
+        "lat_p95": float(np.percentile(lat, 95)),
+        "faces_per_s": len(crops) / batch_s,
+        "rss_model": rss_loaded - rss_base,
+        "rss_loaded": rss_loaded,
+        "rss_peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def decisions(embs, labels, threshold):
+    """Enroll the first half of each person's crops (mean), match the rest."""
+    from gallery import GalleryMatcher
+
+    people = sorted(set(labels))
+    enroll, queries = {}, []
+    for person in people:
+        idx = [i for i, l in enumerate(labels) if l == person]
+        half = max(1, len(idx) // 2)
+        enroll[person] = embs[idx[:half]].mean(axis=0)
+        queries.extend(idx[half:])
+    matcher = GalleryMatcher(people, people, [None] * len(people), [enroll[p] for p in people])
+    out = []
+    for i, row in zip(queries, matcher.match_batch(embs[queries], k=1)):
+        rec, score = row[0]
+        out.append((i, rec["id"] if score >= threshold else None))
+    return out
+
+
+def unit(x):
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-10)
+
+
+def main():
+    import recognize
+
+    ap = argparse.ArgumentParser(description="TFLite FaceNet vs Keras: accuracy, latency, RSS")
+    ap.add_argument("--crops", required=True, help="face crops; one sub-folder per person enables decision checks")
+    ap.add_argument("--models", nargs="+", required=True, help=".tflite files to compare")
+    ap.add_argument("--max-crops", type=int, default=500)
+    ap.add_argument("--threads", type=int, default=None, help="TFLite interpreter threads")
+    ap.add_argument("--threshold", type=float, default=recognize.EMBED_THRESHOLD)
+    args = ap.parse_args()
+
+    paths = [p for p in list_images(args.crops)[:args.max_crops] if cv2.imread(p) is not None]
+    if not paths:
+        raise SystemExit(f"No images under {args.crops}")
+    labels = [os.path.basename(os.path.dirname(p)) for p in paths]
+    by_folder = len(set(labels)) > 1
+
+    backends = [("keras", None)] + [("tflite", m) for m in args.models]
+    results = {}
+    ctx = mp.get_context("spawn")
+    for backend, model in backends:
+        name = "keras" if model is None else os.path.basename(model)
+        with ctx.Pool(1) as pool:
+            results[name] = pool.apply(profile_backend, (backend, model, paths, args.threads))
+        print(f"[INFO] {name}: done")
+
+    ref = unit(results["keras"]["embeddings"])
+    ref_dec = dict(decisions(results["keras"]["embeddings"], labels, args.threshold)) if by_folder else None
+
+    print(f"crops={len(paths)} people={len(set(labels)) if by_folder else '-'} threshold={args.threshold} "
+          f"threads={args.threads}")
+    print(f"{'model':<26} {'size MB':>8} {'cos mean':>9} {'cos p1':>7} {'same decision':>14} {'correct':>8} "
+          f"{'b1 p50 ms':>10} {'b1 p95 ms':>10} {'faces/s':>8} {'model MB':>9} {'peak MB':>8}")
+    for (backend, model), (name, r) in zip(backends, results.items()):
+        cos = np.sum(unit(r["embeddings"]) * ref, axis=1)
+        size = os.path.getsize(model) / 1e6 if model else float("nan")
+        same = correct = "-"
+        if by_folder:
+            dec = decisions(r["embeddings"], labels, args.threshold)
+            same = f"{np.mean([ref_dec[i] == d for i, d in dec]):.1%}"
+            correct = f"{np.mean([d == labels[i] for i, d in dec]):.1%}"
+        print(f"{name:<26} {size:>8.1f} {cos.mean():>9.4f} {np.percentile(cos, 1):>7.4f} {same:>14} {correct:>8} "
+              f"{1000 * r['lat_p50']:>10.1f} {1000 * r['lat_p95']:>10.1f} {r['faces_per_s']:>8.1f} "
+              f"{r['rss_model']:>9.0f} {r['rss_peak']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_tracking.py
+# Inference calls per minute on a recorded clip, with and without the IoU tracker.
+# Detection uses the recognizer's detector settings; FaceNet itself is not run, only the
+# decisions about which crops would be sent to it are counted.
+#
+#   python -m benchmarks.bench_tracking recordings/gate1.mp4
+
+import argparse
+
+import cv2
+
+import recognize
+from tracking import IoUTracker
+
+
+def detect_clip(clip, max_frames=None):
+    """Haar boxes for every frame of the clip (detection runs once, shared by all modes)."""
+    cap = cv2.VideoCapture(clip)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open {clip}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    per_frame = []
+    while max_frames is None or len(per_frame) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        boxes, _ = recognize.face_boxes_and_crops(frame, recognize.detect_faces(frame))
+        per_frame.append(boxes)
+    cap.release()
+    return per_frame, fps
+
+
+def count(per_frame, fps, tracker=None, known=True):
+    crops_embedded = calls = 0
+    for boxes in per_frame:
+        if tracker is None:
+            todo = len(boxes)
+        else:
+            todo = 0
+            for t in tracker.update(boxes):
+                if tracker.needs_embedding(t):
+                    tracker.mark_embedding(t)
+                    # stand-in for the match result: enrolled person or stranger
+                    tracker.set_identity(t, {"id": t.id} if known else None, 1.0 if known else 0.0)
+                    todo += 1
+        crops_embedded += todo
+        calls += 1 if todo else 0
+
+    minutes = len(per_frame) / fps / 60 or 1
+    return {"crops_per_min": crops_embedded / minutes, "calls_per_min": calls / minutes}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="FaceNet inference calls per minute with/without tracking")
+    ap.add_argument("clip")
+    ap.add_argument("--max-frames", type=int, default=None)
+    args = ap.parse_args()
+
+    def make_tracker():
+        return IoUTracker(recognize.TRACK_MATCH_IOU, recognize.TRACK_REEMBED_IOU, recognize.TRACK_REEMBED_EVERY,
+                          recognize.TRACK_UNKNOWN_REEMBED_EVERY, recognize.TRACK_MAX_MISSES)
+
+    per_frame, fps = detect_clip(args.clip, args.max_frames)
+    base = count(per_frame, fps)
+    known = count(per_frame, fps, make_tracker(), known=True)
+    unknown = count(per_frame, fps, make_tracker(), known=False)
+
+    print(f"clip={args.clip} frames={len(per_frame)} minutes={len(per_frame) / fps / 60:.2f} "
+          f"detections={sum(len(b) for b in per_frame)}")
+    print(f"{'mode':<26} {'crops/min':>10} {'calls/min':>10} {'crop reduction':>15}")
+    for label, r in (("no tracking", base), ("tracking, known faces", known), ("tracking, unknown faces", unknown)):
+        red = 1 - r["crops_per_min"] / base["crops_per_min"] if base["crops_per_min"] else 0
+        print(f"{label:<26} {r['crops_per_min']:>10.0f} {r['calls_per_min']:>10.0f} {red:>14.0%}")
+
+
+if __name__ == "__main__":
+    main()
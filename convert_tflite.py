@@ -0,0 +1,114 @@
+# convert_tflite.py
+# Offline conversion of the keras_facenet model to TensorFlow Lite for CPU-only
+# recognition nodes (run once on a machine with TensorFlow; copy the .tflite file over).
+#
+#   float32  plain conversion (baseline)
+#   float16  weights stored as float16 (half the size, float compute)
+#   dynamic  int8 weights, float activations; no calibration data needed
+#   int8     full integer quantization, calibrated on a local set of face crops
+#
+#   python convert_tflite.py --quant float16 --out models/facenet_fp16.tflite
+#   python convert_tflite.py --quant int8 --calib-dir face_crops/ --out models/facenet_int8.tflite
+#   python convert_tflite.py --quant int8 --calib-dir snapshots/ --detect   (full frames: crop faces first)
+
+import argparse
+import os
+import random
+
+import cv2
+import numpy as np
+
+from embedding import IMG_SIZE
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def list_images(root):
+    paths = []
+    for dirpath, _, files in os.walk(root):
+        paths.extend(os.path.join(dirpath, f) for f in files if f.lower().endswith(IMAGE_EXTS))
+    return sorted(paths)
+
+
+def load_calibration(root, count=200, detect=False, seed=0):
+    """Standardized (n, 160, 160, 3) float32 face crops for int8 calibration."""
+    paths = list_images(root)
+    random.Random(seed).shuffle(paths)
+    detector = None
+    if detect:
+        from detection import create_detector, largest_face
+        detector = create_detector("haar-enroll")
+    crops = []
+    for path in paths:
+        if len(crops) >= count:
+            break
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        if detector is not None:
+            face = largest_face(detector.detect(img))
+            if face is None:
+                continue
+            x, y, w, h = face
+            pad = 10  # same padding as registration capture
+            img = img[max(y - pad, 0):y + h + pad, max(x - pad, 0):x + w + pad]
+        rgb = cv2.cvtColor(cv2.resize(img, IMG_SIZE), cv2.COLOR_BGR2RGB)
+        crops.append((rgb.astype(np.float32) - 127.5) / 127.5)
+    if not crops:
+        raise SystemExit(f"No usable calibration images under {root}")
+    print(f"[INFO] calibration set: {len(crops)} face crops from {root}")
+    return np.stack(crops)
+
+
+def convert(quant, calib=None, int8_io=False):
+    import tensorflow as tf
+    from keras_facenet import FaceNet
+
+    model = FaceNet().model
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quant == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quant == "int8":
+        def representative_dataset():
+            for crop in calib:
+                yield [crop[None, ...]]
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        if int8_io:
+            # int8 tensors at the boundary too; TFLiteFaceNet (de)quantizes them
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert keras_facenet FaceNet to a (quantized) TFLite model")
+    ap.add_argument("--quant", choices=["float32", "float16", "dynamic", "int8"], default="int8")
+    ap.add_argument("--out", default=None, help="default: models/facenet_<quant>.tflite")
+    ap.add_argument("--calib-dir", default=None, help="face crops for int8 calibration (searched recursively)")
+    ap.add_argument("--calib-count", type=int, default=200)
+    ap.add_argument("--detect", action="store_true", help="calibration images are full frames; crop the largest face")
+    ap.add_argument("--int8-io", action="store_true", help="int8 model inputs/outputs as well (int8 only)")
+    args = ap.parse_args()
+
+    calib = None
+    if args.quant == "int8":
+        if not args.calib_dir:
+            raise SystemExit("--quant int8 needs --calib-dir with face crops")
+        calib = load_calibration(args.calib_dir, args.calib_count, args.detect)
+
+    out = args.out or os.path.join("models", f"facenet_{args.quant}.tflite")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    blob = convert(args.quant, calib, args.int8_io)
+    with open(out, "wb") as f:
+        f.write(blob)
+    print(f"[INFO] wrote {out} ({len(blob) / 1e6:.1f} MB)")
+    print(f"[INFO] check it against Keras: python -m benchmarks.bench_tflite --crops <dir> --models {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# db.py
+# Pooled MySQL connections shared by the recognizer's background workers and the
+# Flask app's request threads.
+
+import threading
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import pooling
+
+
+class PoolTimeout(mysql.connector.errors.PoolError):
+    """No pooled connection became free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Thin wrapper around mysql.connector's MySQLConnectionPool.
+
+        pool = ConnectionPool({"host": ..., "user": ..., "password": ..., "database": ...}, size=4)
+        with pool.connection() as conn:
+            cur = conn.cursor()
+            ...
+
+    A checked-out connection is pinged (reconnecting if the server dropped it) and is
+    returned to the pool when the block exits, rolling back anything left uncommitted.
+    When all `size` connections are out, a checkout waits up to `timeout` seconds for
+    one to come back (mysql.connector alone fails at once) and then raises PoolTimeout.
+
+    connect() is the same checkout without the block, for code that closes its
+    connections itself (e.g. GallerySync); close() then returns it.
+    """
+
+    def __init__(self, config, size=4, name="face_db_pool", timeout=10.0):
+        self.config = dict(config)
+        self.size = size
+        self.timeout = timeout
+        self.in_use = 0
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._pool = pooling.MySQLConnectionPool(pool_name=name, pool_size=size,
+                                                 pool_reset_session=True, **self.config)
+
+    def _checkout(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"no database connection free after {self.timeout:g}s (pool size {self.size})")
+        try:
+            conn = self._pool.get_connection()
+            try:
+                conn.ping(reconnect=True, attempts=2, delay=0)
+            except mysql.connector.Error:
+                conn.reconnect(attempts=2, delay=0)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def _return(self, conn):
+        try:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except mysql.connector.Error:
+                pass
+            conn.close()  # returns it to the pool
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._return(conn)
+
+    def connect(self):
+        return _Checkout(self, self._checkout())
+
+
+class _Checkout:
+    """A pooled connection whose close() hands it back (once) through the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._return(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __getattr__(self, attr):
+        if self._conn is None:
+            raise mysql.connector.errors.OperationalError("connection already returned to the pool")
+        return getattr(self._conn, attr)
@@ -0,0 +1,276 @@
+# detection.py
+# Face detectors behind one interface, used by the recognition loop (recognize.py) and
+# by registration capture (app.py). Every backend can run on a downscaled copy of the
+# frame, limited to the face sizes the camera can actually see, with boxes mapped back
+# to full resolution so crops for embedding keep full detail.
+#
+# Backends:
+#   haar  OpenCV Haar cascades (bundled with opencv-python, no extra files)
+#   yunet cv2.FaceDetectorYN with a locally supplied ONNX model
+#   ssd   OpenCV DNN ResNet-10 SSD with a locally supplied Caffe model
+#
+# create_detector(name) builds one of the DETECTOR_PRESETS below.
+
+import math
+import os
+
+import cv2
+import cv2.data
+
+HAAR_FRONTAL_DEFAULT = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+HAAR_FRONTAL_ALT2 = cv2.data.haarcascades + "haarcascade_frontalface_alt2.xml"
+HAAR_MIN_WINDOW = 24  # the frontal cascades are trained on 24x24 windows
+
+# DNN model files are not shipped with the repo; put them in MODEL_DIR (or point the
+# env vars at them). See README "Face detector backends".
+MODEL_DIR = os.environ.get("FACE_MODEL_DIR", "models")
+YUNET_MODEL = os.environ.get("YUNET_MODEL", os.path.join(MODEL_DIR, "face_detection_yunet_2023mar.onnx"))
+SSD_PROTOTXT = os.environ.get("SSD_PROTOTXT", os.path.join(MODEL_DIR, "deploy.prototxt"))
+SSD_MODEL = os.environ.get("SSD_MODEL", os.path.join(MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel"))
+
+
+# ---------------- CAMERA GEOMETRY ----------------
+class CameraGeometry:
+    """
+    Expected face size in pixels from the camera's vertical field of view and the
+    nearest / farthest distance at which people should be recognized.
+
+    face_bounds(frame_height) -> (min_px, max_px) for the detector's minSize/maxSize,
+    widened by `slack` on both ends to absorb head size and pose differences.
+    """
+
+    def __init__(self, vfov_deg=55.0, min_distance_m=0.8, max_distance_m=4.0,
+                 face_height_m=0.22, slack=1.25):
+        self.vfov_deg = vfov_deg
+        self.min_distance_m = min_distance_m
+        self.max_distance_m = max_distance_m
+        self.face_height_m = face_height_m
+        self.slack = slack
+
+    def focal_px(self, frame_height):
+        return (frame_height / 2.0) / math.tan(math.radians(self.vfov_deg) / 2.0)
+
+    def face_bounds(self, frame_height):
+        f = self.focal_px(frame_height)
+        smallest = f * self.face_height_m / self.max_distance_m / self.slack
+        largest = f * self.face_height_m / self.min_distance_m * self.slack
+        return int(smallest), int(math.ceil(largest))
+
+
+# ---------------- DETECTOR INTERFACE ----------------
+class FaceDetector:
+    """
+    detect(frame_bgr, regions=None) returns boxes (x, y, w, h) in full-resolution
+    coordinates. `regions` (x1, y1, x2, y2) restricts the scan to parts of the frame.
+
+    The frame (or each region) is shrunk to at most `max_width` pixels wide before the
+    backend sees it, but never so far that the smallest wanted face falls below the
+    backend's `min_window` (the smallest face it can find at all). Face size limits come from `min_size`/`max_size` (full-resolution
+    pixels) or, when `geometry` is given, from CameraGeometry.face_bounds for the
+    frame's height. Backends implement _detect(image, min_px, max_px) on the scaled
+    image, with the limits already scaled (None means no limit).
+    """
+
+    name = "detector"
+    min_window = None  # smallest detectable face in the scaled image (px), if the backend has one
+
+    def __init__(self, max_width=None, min_size=None, max_size=None, geometry=None):
+        self.max_width = max_width
+        self.min_size = min_size
+        self.max_size = max_size
+        self.geometry = geometry
+        self._bounds_for = {}
+        self._scale_for = {}
+
+    def empty(self):
+        return False
+
+    def scale_for(self, width, min_px=None):
+        """Downscale factor for a frame `width` wide that keeps `min_px` faces detectable."""
+        scale = 1.0
+        if self.max_width and width > self.max_width:
+            scale = self.max_width / float(width)
+        if min_px and self.min_window and min_px * scale < self.min_window:
+            scale = min(1.0, self.min_window / float(min_px))
+        return scale
+
+    def frame_scale(self, width, height):
+        if (width, height) not in self._scale_for:
+            lo, _ = self.size_bounds(height)
+            scale, wanted = self.scale_for(width, lo), self.scale_for(width)
+            if scale > wanted:
+                print(f"[INFO] {self.name}: detecting {width}x{height} frames at {scale:.2f}x instead of "
+                      f"{wanted:.2f}x so {lo}px faces stay above the {self.min_window}px detector window")
+            if lo and self.min_window and lo * scale < self.min_window:
+                print(f"[WARN] {self.name}: faces under {self.min_window}px cannot be detected, but the camera "
+                      f"settings expect faces from {lo}px in {width}x{height} frames")
+            self._scale_for[(width, height)] = scale
+        return self._scale_for[(width, height)]
+
+    def size_bounds(self, frame_height):
+        """(min_px, max_px) at full resolution; either may be None (no limit)."""
+        if frame_height not in self._bounds_for:
+            lo, hi = self.min_size, self.max_size
+            if self.geometry is not None:
+                g_lo, g_hi = self.geometry.face_bounds(frame_height)
+                lo = g_lo if lo is None else lo
+                hi = g_hi if hi is None else hi
+            self._bounds_for[frame_height] = (lo, hi)
+        return self._bounds_for[frame_height]
+
+    def detect(self, frame_bgr, regions=None):
+        h, w = frame_bgr.shape[:2]
+        scale = self.frame_scale(w, h)
+        lo, hi = self.size_bounds(h)
+        lo = int(lo * scale) if lo else None
+        hi = int(math.ceil(hi * scale)) if hi else None
+
+        if regions is None:
+            regions = [(0, 0, w, h)]
+        faces = []
+        for x1, y1, x2, y2 in regions:
+            roi = frame_bgr[y1:y2, x1:x2]
+            if roi.size == 0:
+                continue
+            if scale != 1.0:
+                rw = max(1, int(round((x2 - x1) * scale)))
+                rh = max(1, int(round((y2 - y1) * scale)))
+                roi = cv2.resize(roi, (rw, rh), interpolation=cv2.INTER_AREA)
+            for (x, y, bw, bh) in self._detect(roi, lo, hi):
+                faces.append((int(x / scale) + x1, int(y / scale) + y1,
+                              int(math.ceil(bw / scale)), int(math.ceil(bh / scale))))
+        return faces
+
+    def _detect(self, image, min_px, max_px):
+        raise NotImplementedError
+
+
+def _within(boxes, min_px, max_px):
+    """Size filter for backends that cannot restrict the search itself."""
+    return [b for b in boxes
+            if (not min_px or max(b[2], b[3]) >= min_px) and (not max_px or max(b[2], b[3]) <= max_px)]
+
+
+def _clip_box(x, y, w, h, width, height):
+    x1, y1 = max(0, int(x)), max(0, int(y))
+    x2, y2 = min(width, int(math.ceil(x + w))), min(height, int(math.ceil(y + h)))
+    return (x1, y1, x2 - x1, y2 - y1) if x2 > x1 and y2 > y1 else None
+
+
+# ---------------- HAAR ----------------
+class HaarDetector(FaceDetector):
+    """Haar cascade; size limits go straight into detectMultiScale's minSize/maxSize."""
+
+    name = "haar"
+    min_window = HAAR_MIN_WINDOW
+
+    def __init__(self, cascade_path=HAAR_FRONTAL_DEFAULT, scale_factor=1.1, min_neighbors=5, **kwargs):
+        super().__init__(**kwargs)
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise ValueError(f"Could not load Haar cascade: {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def empty(self):
+        return self.cascade.empty()
+
+    def _detect(self, image, min_px, max_px):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        kwargs = {}
+        if min_px:
+            m = max(HAAR_MIN_WINDOW, min_px)
+            kwargs["minSize"] = (m, m)
+        if max_px:
+            m = max(HAAR_MIN_WINDOW + 1, max_px)
+            kwargs["maxSize"] = (m, m)
+        return [tuple(int(v) for v in f)
+                for f in self.cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors, **kwargs)]
+
+
+# ---------------- YUNET (cv2.FaceDetectorYN) ----------------
+class YuNetDetector(FaceDetector):
+    """
+    OpenCV's YuNet CNN detector (opencv >= 4.8). Far better than Haar on turned or
+    partly lit faces; the model is ~230 KB of ONNX and runs on CPU.
+    """
+
+    name = "yunet"
+
+    def __init__(self, model_path=YUNET_MODEL, score_threshold=0.7, nms_threshold=0.3, top_k=50, **kwargs):
+        super().__init__(**kwargs)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found: {model_path}")
+        self.net = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold, nms_threshold, top_k)
+        self._input_size = (320, 320)
+
+    def _detect(self, image, min_px, max_px):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        h, w = image.shape[:2]
+        if self._input_size != (w, h):
+            self.net.setInputSize((w, h))
+            self._input_size = (w, h)
+        _, faces = self.net.detect(image)
+        if faces is None:
+            return []
+        boxes = [_clip_box(f[0], f[1], f[2], f[3], w, h) for f in faces]
+        return _within([b for b in boxes if b], min_px, max_px)
+
+
+# ---------------- SSD (OpenCV DNN) ----------------
+class SsdDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD face detector (Caffe), fixed 300x300 network input."""
+
+    name = "ssd"
+
+    def __init__(self, prototxt=SSD_PROTOTXT, model_path=SSD_MODEL, confidence=0.6, input_size=300, **kwargs):
+        super().__init__(**kwargs)
+        for path in (prototxt, model_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"SSD model file not found: {path}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, model_path)
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def _detect(self, image, min_px, max_px):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        h, w = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        out = self.net.forward()[0, 0]
+        out = out[out[:, 2] >= self.confidence]
+        boxes = []
+        for _, _, _, x1, y1, x2, y2 in out:
+            b = _clip_box(x1 * w, y1 * h, (x2 - x1) * w, (y2 - y1) * h, w, h)
+            if b:
+                boxes.append(b)
+        return _within(boxes, min_px, max_px)
+
+
+# ---------------- PRESETS ----------------
+# name -> (backend class, backend options). "haar" is what recognize.py has always
+# used, "haar-enroll" what registration capture used (coarser scale steps: faster,
+# fine for one large face close to the camera).
+DETECTOR_PRESETS = {
+    "haar": (HaarDetector, {"scale_factor": 1.1, "min_neighbors": 5}),
+    "haar-enroll": (HaarDetector, {"scale_factor": 1.3, "min_neighbors": 5}),
+    "haar-fast": (HaarDetector, {"scale_factor": 1.2, "min_neighbors": 4}),
+    "haar-alt2": (HaarDetector, {"cascade_path": HAAR_FRONTAL_ALT2, "scale_factor": 1.1, "min_neighbors": 3}),
+    "yunet": (YuNetDetector, {}),
+    "ssd": (SsdDetector, {}),
+}
+
+
+def create_detector(name="haar", **kwargs):
+    """Build a preset; kwargs override its options (max_width, geometry, model paths ...)."""
+    try:
+        cls, options = DETECTOR_PRESETS[name]
+    except KeyError:
+        raise ValueError(f"Unknown face detector '{name}' (choose from {', '.join(DETECTOR_PRESETS)})")
+    return cls(**{**options, **kwargs})
+
+
+def largest_face(faces):
+    return max(faces, key=lambda f: f[2] * f[3]) if len(faces) else None
@@ -0,0 +1,168 @@
+# embedding.py
+# Batched FaceNet embedding: every face crop of a frame (or of several frames)
+# goes through one preallocated array and one inference call.
+
+import time
+
+import cv2
+import numpy as np
+
+import metrics
+
+IMG_SIZE = (160, 160)
+
+EMBED_SECONDS = metrics.histogram("embed_inference_seconds", "FaceNet inference time per batch")
+EMBED_BATCH_FACES = metrics.histogram("embed_batch_faces", "Faces per FaceNet inference batch",
+                                      buckets=(1, 2, 4, 8, 16, 32, 64))
+
+
+# ---------------- PREPROCESSING ----------------
+class CropPreprocessor:
+    """
+    Converts BGR face crops to RGB IMG_SIZE images inside one reusable uint8 array
+    (plus a float32 array for the standardized model input). Buffers grow on demand
+    and are never reallocated for batches that fit.
+    """
+
+    def __init__(self, capacity=16, size=IMG_SIZE):
+        self.size = tuple(size)
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        w, h = self.size
+        self.capacity = capacity
+        self.rgb = np.empty((capacity, h, w, 3), dtype=np.uint8)
+        self.std = np.empty((capacity, h, w, 3), dtype=np.float32)
+        self._scratch = np.empty((h, w, 3), dtype=np.uint8)
+
+    def fill(self, crops_bgr):
+        """
+        Preprocess crops into self.rgb. Returns the indices (into crops_bgr) of the
+        crops that were usable; row i of the batch belongs to crops_bgr[valid[i]].
+        """
+        if len(crops_bgr) > self.capacity:
+            self._alloc(max(len(crops_bgr), 2 * self.capacity))
+        valid = []
+        for i, crop in enumerate(crops_bgr):
+            if crop is None or crop.size == 0:
+                continue
+            n = len(valid)
+            cv2.resize(crop, self.size, dst=self._scratch)
+            cv2.cvtColor(self._scratch, cv2.COLOR_BGR2RGB, dst=self.rgb[n])
+            valid.append(i)
+        return valid
+
+    def standardized(self, n):
+        """Fixed image standardization ((x - 127.5) / 127.5) of the first n rows, in place."""
+        out = self.std[:n]
+        np.subtract(self.rgb[:n], 127.5, out=out, casting="unsafe")
+        out *= 1.0 / 127.5
+        return out
+
+
+# ---------------- EMBEDDER ----------------
+class BatchEmbedder:
+    """
+    Wraps a keras_facenet.FaceNet so a whole list of crops is embedded with one call.
+
+    When the wrapped FaceNet uses fixed image standardization (the default model does),
+    the preprocessed batch is fed straight to the Keras model with predict_on_batch,
+    which skips FaceNet.embeddings()'s per-image resize/normalize copies and the
+    predict() setup cost. Any other embedder falls back to .embeddings().
+    """
+
+    def __init__(self, facenet, capacity=16, size=IMG_SIZE):
+        self.facenet = facenet
+        self.pre = CropPreprocessor(capacity, size)
+        meta = getattr(facenet, "metadata", None) or {}
+        model = getattr(facenet, "model", None)
+        self._model = model if model is not None and meta.get("fixed_image_standardization") else None
+
+    def embed_prepared(self, n):
+        """Embed the first n rows already filled into self.pre."""
+        if n == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+        t0 = time.perf_counter()
+        if self._model is not None:
+            out = self._model.predict_on_batch(self.pre.standardized(n))
+        else:
+            out = self.facenet.embeddings(self.pre.rgb[:n])
+        out = np.asarray(out, dtype=np.float32)
+        EMBED_SECONDS.observe(time.perf_counter() - t0)
+        EMBED_BATCH_FACES.observe(n)
+        return out
+
+    def embed_crops(self, crops_bgr):
+        """One embedding (float32 array) per crop, or None where the crop was empty."""
+        valid = self.pre.fill(crops_bgr)
+        results = [None] * len(crops_bgr)
+        if not valid:
+            return results
+        embs = self.embed_prepared(len(valid))
+        for row, i in enumerate(valid):
+            results[i] = embs[row]
+        return results
+
+
+# ---------------- CROSS-FRAME BATCHING ----------------
+class BatchEmbedError(Exception):
+    """A flush failed to embed; `contexts` are the frames it dropped, oldest first."""
+
+    def __init__(self, contexts, cause):
+        super().__init__(f"embedding {len(contexts)} frames failed: {cause}")
+        self.contexts = contexts
+        self.cause = cause
+
+
+class CrossFrameBatcher:
+    """
+    Collects crops from consecutive frames and embeds them together once max_faces
+    crops are pending or the oldest pending frame has waited max_wait seconds.
+
+    add() takes an opaque context (e.g. the frame and its boxes) with that frame's
+    crops and returns the list of (context, embeddings) pairs that became ready,
+    oldest first. Frames with no crops pass straight through. If the embedder fails,
+    add/poll/flush raise BatchEmbedError naming the contexts of the dropped batch.
+    """
+
+    def __init__(self, embedder, max_faces=32, max_wait=0.15):
+        self.embedder = embedder
+        self.max_faces = max_faces
+        self.max_wait = max_wait
+        self._pending = []      # [(context, crops)]
+        self._count = 0
+        self._since = None
+
+    def add(self, context, crops):
+        if not crops and not self._pending:
+            return [(context, [])]
+        self._pending.append((context, crops))
+        self._count += len(crops)
+        if self._since is None:
+            self._since = time.monotonic()
+        if self._count >= self.max_faces or time.monotonic() - self._since >= self.max_wait:
+            return self.flush()
+        return []
+
+    def poll(self):
+        """Flush if the time limit expired; call when no new frame arrived."""
+        if self._pending and time.monotonic() - self._since >= self.max_wait:
+            return self.flush()
+        return []
+
+    def flush(self):
+        if not self._pending:
+            return []
+        pending = self._pending
+        self._pending, self._count, self._since = [], 0, None
+
+        all_crops = [c for _, crops in pending for c in crops]
+        try:
+            embs = self.embedder.embed_crops(all_crops)
+        except Exception as e:
+            raise BatchEmbedError([context for context, _ in pending], e) from e
+        ready, pos = [], 0
+        for context, crops in pending:
+            ready.append((context, embs[pos:pos + len(crops)]))
+            pos += len(crops)
+        return ready
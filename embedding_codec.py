@@ -0,0 +1,77 @@
+# embedding_codec.py
+# Storage format for `employees.embedding`.
+#
+# New rows are written as raw little-endian float32 behind an 8-byte header:
+#   b"FEMB" | format version (u8) | dtype code (u8) | dim (u16 LE) | dim * 4 bytes
+# so reading a row is one np.frombuffer instead of pickle.loads. Rows written before
+# this format are pickled NumPy arrays; they are still read, but only through an
+# unpickler that refuses anything except plain NumPy arrays and lists of floats.
+# migrate_embeddings.py rewrites them in the new format.
+
+import io
+import pickle
+import struct
+
+import numpy as np
+
+MAGIC = b"FEMB"
+FORMAT_VERSION = 1
+DTYPE_FLOAT32 = 1
+HEADER = struct.Struct("<4sBBH")
+
+
+def encode_embedding(vec):
+    vec = np.asarray(vec, dtype="<f4").ravel()
+    if vec.size > 0xFFFF:
+        raise ValueError(f"embedding too long: {vec.size}")
+    return HEADER.pack(MAGIC, FORMAT_VERSION, DTYPE_FLOAT32, vec.size) + vec.tobytes()
+
+
+def is_encoded(blob):
+    return blob is not None and bytes(blob[:4]) == MAGIC
+
+
+# ---------------- LEGACY (PICKLE) ----------------
+# What pickle.dumps(np.ndarray) references, for NumPy 1.x and 2.x module layouts
+# (protocols 0-2 also wrap the raw bytes in _codecs.encode(str, "latin1")).
+_ALLOWED_GLOBALS = {
+    ("_codecs", "encode"),
+    ("numpy", "ndarray"),
+    ("numpy", "dtype"),
+    ("numpy.core.multiarray", "_reconstruct"),
+    ("numpy._core.multiarray", "_reconstruct"),
+    ("numpy.core.multiarray", "scalar"),
+    ("numpy._core.multiarray", "scalar"),
+    ("numpy.core.numeric", "_frombuffer"),
+    ("numpy._core.numeric", "_frombuffer"),
+}
+
+
+class RestrictedUnpickler(pickle.Unpickler):
+    """Unpickler for legacy embedding blobs: NumPy arrays only, no arbitrary callables."""
+
+    def find_class(self, module, name):
+        if (module, name) in _ALLOWED_GLOBALS:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"global '{module}.{name}' is not allowed in an embedding")
+
+
+def restricted_loads(blob):
+    return RestrictedUnpickler(io.BytesIO(blob)).load()
+
+
+def decode_embedding(blob):
+    """`employees.embedding` blob (either format) -> float32 vector, or None if empty/unreadable."""
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    try:
+        if blob[:4] == MAGIC:
+            _, version, dtype, dim = HEADER.unpack_from(blob)
+            if version != FORMAT_VERSION or dtype != DTYPE_FLOAT32 or len(blob) != HEADER.size + 4 * dim:
+                return None
+            return np.frombuffer(blob, dtype="<f4", count=dim, offset=HEADER.size).astype(np.float32)
+        vec = np.asarray(restricted_loads(blob), dtype=np.float32).ravel()
+        return vec if vec.size else None
+    except Exception:
+        return None
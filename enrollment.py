@@ -0,0 +1,212 @@
+# enrollment.py
+# Registration capture: turns webcam frames into one enrollment embedding with as
+# few frames as the face needs.
+#
+#   quality gate  crops that are too small, cut off by the frame edge, blurry or
+#                 turned away are dropped before they reach FaceNet
+#   batching      accepted crops are embedded BATCH at a time through BatchEmbedder
+#                 (the same preprocessing and model path recognize.py uses)
+#   early stop    after every batch the direction of the running mean is compared
+#                 with the previous one; once it moves less than `tolerance` (cosine
+#                 distance) for `patience` batches in a row, and at least
+#                 `min_samples` crops are in, more frames would not change it
+#
+# The result is the plain mean of the accepted embeddings, the same kind of vector
+# the old fixed 50-frame capture stored, so duplicate checks and matching thresholds
+# keep their meaning.
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detection import largest_face
+
+ENROLL_MIN_FACE_PX = int(os.environ.get("ENROLL_MIN_FACE_PX", "80"))      # face box height
+ENROLL_EDGE_MARGIN_PX = 4                                                 # box this close to the border is cut off
+ENROLL_BLUR_MIN = float(os.environ.get("ENROLL_BLUR_MIN", "40"))          # variance of Laplacian at 160x160
+ENROLL_FRONTAL_MIN = float(os.environ.get("ENROLL_FRONTAL_MIN", "0.3"))   # left/right mirror correlation
+ENROLL_BATCH = int(os.environ.get("ENROLL_BATCH", "8"))
+ENROLL_MIN_SAMPLES = int(os.environ.get("ENROLL_MIN_SAMPLES", "16"))
+ENROLL_TOLERANCE = float(os.environ.get("ENROLL_TOLERANCE", "0.002"))
+ENROLL_PATIENCE = int(os.environ.get("ENROLL_PATIENCE", "2"))
+ENROLL_TIMEOUT_SEC = float(os.environ.get("ENROLL_TIMEOUT_SEC", "30"))
+
+CROP_PAD = 10  # same padding the registration crop always had
+QUALITY_SIZE = 64  # side of the grayscale copy the frontality check runs on
+
+
+# ---------------- QUALITY GATE ----------------
+class QualityGate:
+    """
+    Cheap checks on a detected face before it is embedded. check() returns
+    (reason, crop): reason is None for a usable crop, else "small", "edge", "blurry"
+    or "off-angle".
+
+    Frontality is the correlation between the left half of the (equalized) face and
+    the mirrored right half: near 1 for a face looking at the camera, dropping as the
+    head turns. The Haar frontal cascade already misses strongly turned faces; this
+    catches the half-turned ones it still finds.
+    """
+
+    def __init__(self, min_face_px=ENROLL_MIN_FACE_PX, blur_min=ENROLL_BLUR_MIN,
+                 frontal_min=ENROLL_FRONTAL_MIN, edge_margin=ENROLL_EDGE_MARGIN_PX, pad=CROP_PAD):
+        self.min_face_px = min_face_px
+        self.blur_min = blur_min
+        self.frontal_min = frontal_min
+        self.edge_margin = edge_margin
+        self.pad = pad
+
+    def check(self, frame, box):
+        x, y, w, h = box
+        H, W = frame.shape[:2]
+        if min(w, h) < self.min_face_px:
+            return "small", None
+        m = self.edge_margin
+        if x < m or y < m or x + w > W - m or y + h > H - m:
+            return "edge", None
+
+        gray = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+        if self.blur_min > 0 and sharpness(gray) < self.blur_min:
+            return "blurry", None
+        if self.frontal_min > -1 and frontality(gray) < self.frontal_min:
+            return "off-angle", None
+
+        p = self.pad
+        crop = frame[max(y - p, 0):min(y + h + p, H), max(x - p, 0):min(x + w + p, W)]
+        return None, crop
+
+
+def sharpness(gray):
+    """Variance of the Laplacian on the face resized to the FaceNet input size."""
+    face = cv2.resize(gray, (160, 160), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(face, cv2.CV_64F).var())
+
+
+def frontality(gray):
+    """Correlation of the left half with the mirrored right half, in [-1, 1]."""
+    face = cv2.equalizeHist(cv2.resize(gray, (QUALITY_SIZE, QUALITY_SIZE), interpolation=cv2.INTER_AREA))
+    half = QUALITY_SIZE // 2
+    left = face[:, :half].astype(np.float32).ravel()
+    right = face[:, half:][:, ::-1].astype(np.float32).ravel()
+    left -= left.mean()
+    right -= right.mean()
+    denom = float(np.sqrt(left.dot(left) * right.dot(right)))
+    return float(left.dot(right) / denom) if denom > 0 else 0.0
+
+
+# ---------------- CAPTURE ----------------
+class EnrollmentCapture:
+    """
+    Feed camera frames to add_frame() until `done`, then call result().
+
+    add_frame() returns (box, reason) for drawing: the largest face (or None) and why
+    it was rejected (None when it was kept). Embedding happens inside add_frame()
+    whenever `batch_size` crops are waiting.
+    """
+
+    def __init__(self, embedder, detector, max_samples=50, min_samples=ENROLL_MIN_SAMPLES,
+                 batch_size=ENROLL_BATCH, tolerance=ENROLL_TOLERANCE, patience=ENROLL_PATIENCE,
+                 timeout_s=ENROLL_TIMEOUT_SEC, gate=None):
+        self.embedder = embedder
+        self.detector = detector
+        self.max_samples = max(1, max_samples)
+        self.min_samples = min(max(1, min_samples), self.max_samples)
+        self.batch_size = max(1, batch_size)
+        self.tolerance = tolerance
+        self.patience = max(1, patience)
+        self.timeout_s = timeout_s
+        self.gate = gate or QualityGate()
+
+        self.frames = 0
+        self.no_face = 0
+        self.rejected = {}
+        self.batches = 0
+        self.embed_s = 0.0
+        self.stop_reason = None
+        self.started = time.monotonic()
+        self._pending = []
+        self._sum = None
+        self._count = 0
+        self._direction = None
+        self._steady = 0
+        self.last_change = None   # cosine distance the last batch moved the mean
+
+    # ---- state ----
+    @property
+    def accepted(self):
+        return self._count + len(self._pending)
+
+    @property
+    def done(self):
+        return self.stop_reason is not None
+
+    # ---- frames ----
+    def add_frame(self, frame):
+        if self.done:
+            return None, None
+        self.frames += 1
+        box = largest_face(self.detector.detect(frame))
+        reason = None
+        if box is None:
+            self.no_face += 1
+        else:
+            reason, crop = self.gate.check(frame, box)
+            if reason is None:
+                self._pending.append(crop)
+                if len(self._pending) >= self.batch_size or self.accepted >= self.max_samples:
+                    self._embed_pending()
+            else:
+                self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+        if not self.done:
+            if self._count >= self.max_samples:
+                self.stop_reason = "max-samples"
+            elif self.timeout_s and time.monotonic() - self.started >= self.timeout_s:
+                self.stop_reason = "timeout"
+        return box, reason
+
+    def _embed_pending(self):
+        crops = self._pending[:self.max_samples - self._count]
+        self._pending = []
+        t0 = time.perf_counter()
+        embs = [e for e in self.embedder.embed_crops(crops) if e is not None]
+        self.embed_s += time.perf_counter() - t0
+        self.batches += 1
+        if not embs:
+            return
+        batch_sum = np.sum(embs, axis=0, dtype=np.float64)
+        self._sum = batch_sum if self._sum is None else self._sum + batch_sum
+        self._count += len(embs)
+
+        norm = np.linalg.norm(self._sum)
+        direction = self._sum / norm if norm > 0 else self._sum
+        if self._direction is not None:
+            self.last_change = 1.0 - float(direction.dot(self._direction))
+            self._steady = self._steady + 1 if self.last_change < self.tolerance else 0
+        self._direction = direction
+        if self._count >= self.min_samples and self._steady >= self.patience:
+            self.stop_reason = "converged"
+
+    # ---- result ----
+    def result(self):
+        """Mean embedding (float32) of everything accepted, or None if nothing was usable."""
+        if self._pending and self._count < self.max_samples:
+            self._embed_pending()
+        if not self._count:
+            return None
+        return (self._sum / self._count).astype(np.float32)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "embedded": self._count,
+            "no_face": self.no_face,
+            "rejected": dict(self.rejected),
+            "batches": self.batches,
+            "embed_s": self.embed_s,
+            "seconds": time.monotonic() - self.started,
+            "stop": self.stop_reason,
+            "last_change": self.last_change,
+        }
@@ -0,0 +1,169 @@
+# enrollment_jobs.py
+# Background runner for registration captures, so the web request that starts one
+# returns at once and the page polls for progress.
+#
+# Jobs wait in one FIFO queue and run on a small pool of worker threads. Every job
+# names the camera it needs; a worker only picks a job whose camera is free, so two
+# registrations never open the same camera at once while jobs for other cameras can
+# still run. Finished jobs are kept for `keep_s` seconds for status polling.
+#
+#   runner = JobRunner(workers=1)
+#   job = runner.submit(fn, camera="0", meta={"emp_id": "CS001"})   # fn(job) -> result
+#   runner.get(job.id).status()
+#
+# fn reports progress with job.update(**fields) and should poll job.cancelled.
+
+import secrets
+import threading
+import time
+import traceback
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobError(Exception):
+    """Raised by a job function to fail the job with a message meant for the user."""
+
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.details = details
+
+
+class Job:
+    def __init__(self, fn, camera, meta=None):
+        self.id = secrets.token_urlsafe(12)
+        self.fn = fn
+        self.camera = camera
+        self.meta = dict(meta or {})
+        self.state = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.details = {}
+        self.created = time.time()
+        self.started = self.finished = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def update(self, **fields):
+        """Merge fields into the job's progress (replaces the dict, so readers never see it half-updated)."""
+        self.progress = {**self.progress, **fields}
+
+    def status(self, position=None):
+        out = {
+            "id": self.id,
+            "state": self.state,
+            "camera": self.camera,
+            "progress": self.progress,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if position is not None:
+            out["queue_position"] = position
+        if self.state == DONE:
+            out["result"] = self.result
+        if self.error:
+            out["error"] = self.error
+            out.update(self.details)
+        return out
+
+
+class JobRunner:
+    def __init__(self, workers=1, keep_s=600.0, name="enroll-job"):
+        self.keep_s = keep_s
+        self._jobs = {}          # id -> Job, including finished ones until they expire
+        self._pending = []       # queued jobs, oldest first
+        self._busy = set()       # cameras in use
+        self._cond = threading.Condition()
+        self._threads = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+
+    # ---- web side ----
+    def submit(self, fn, camera, meta=None):
+        job = Job(fn, str(camera), meta)
+        with self._cond:
+            self._expire()
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def find(self, **meta):
+        """Unfinished jobs whose meta matches every given key (e.g. emp_id=...)."""
+        with self._cond:
+            return [j for j in self._jobs.values()
+                    if j.state not in FINISHED and all(j.meta.get(k) == v for k, v in meta.items())]
+
+    def position(self, job):
+        """Jobs ahead of `job` for the same camera (running one included); None once it started."""
+        with self._cond:
+            if job.state != QUEUED:
+                return None
+            ahead = [j for j in self._pending if j.camera == job.camera]
+            return ahead.index(job) + (1 if job.camera in self._busy else 0)
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or ask a running one to stop; False if unknown or finished."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED:
+                return False
+            job._cancel.set()
+            if job.state == QUEUED:
+                self._pending.remove(job)
+                self._finish(job, CANCELLED, error="Cancelled.")
+            return True
+
+    # ---- workers ----
+    def _next(self):
+        for job in self._pending:
+            if job.camera not in self._busy:
+                self._pending.remove(job)
+                self._busy.add(job.camera)
+                job.state, job.started = RUNNING, time.time()
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next()
+            state, result, error, details = DONE, None, None, {}
+            try:
+                result = job.fn(job)
+            except JobError as e:
+                state, error, details = FAILED, str(e), e.details
+            except Exception:
+                print(f"[ERROR] Job {job.id} ({job.meta.get('emp_id', '-')}) failed:")
+                traceback.print_exc()
+                state, error = FAILED, "Registration failed. Please try again."
+            if state == FAILED and job.cancelled:
+                # a job that completed anyway stays done; one that stopped early was cancelled
+                state, details = CANCELLED, {}
+            with self._cond:
+                self._busy.discard(job.camera)
+                job.result = result
+                self._finish(job, state, error, details)
+                self._cond.notify_all()
+
+    def _finish(self, job, state, error=None, details=None):
+        job.state, job.error, job.details = state, error, details or {}
+        job.finished = time.time()
+
+    def _expire(self):
+        cutoff = time.time() - self.keep_s
+        for job_id in [i for i, j in self._jobs.items() if j.state in FINISHED and j.finished < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,199 @@
+# gallery.py
+# In-memory face gallery used by the recognizer for matching embeddings.
+
+from collections import Counter
+
+import numpy as np
+
+
+# ---------------- HELPERS ----------------
+def l2_normalize(mat, eps=1e-10):
+    """Return a contiguous float32 copy of `mat` with every row scaled to unit length."""
+    mat = np.asarray(mat, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat[None, :]
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    np.maximum(norms, eps, out=norms)
+    return np.ascontiguousarray(mat / norms, dtype=np.float32)
+
+
+def drop_mismatched(ids, names, contacts, embeddings):
+    """
+    (ids, names, contacts, vectors) with every embedding flattened to float32 and the
+    rows whose size differs from the most common one left out (with a warning), so
+    one employee enrolled by another model does not stop the whole gallery.
+    """
+    vecs = [np.asarray(e, dtype=np.float32).ravel() for e in embeddings]
+    if not vecs:
+        return [], [], [], []
+    dim = Counter(v.size for v in vecs).most_common(1)[0][0]
+    keep = []
+    for i, v in enumerate(vecs):
+        if v.size == dim:
+            keep.append(i)
+        else:
+            print(f"[WARN] Skipping employee {ids[i]}: embedding has {v.size} values, expected {dim}")
+    return ([ids[i] for i in keep], [names[i] for i in keep], [contacts[i] for i in keep],
+            [vecs[i] for i in keep])
+
+
+# ---------------- GALLERY MATCHER ----------------
+class GalleryMatcher:
+    """
+    Exact cosine-similarity matcher over the enrolled gallery.
+
+    All embeddings live in one pre-normalized contiguous float32 matrix, with ids,
+    names and contacts kept in parallel arrays, so a batch of query embeddings is
+    scored with a single matrix multiply.
+    """
+
+    def __init__(self, ids, names, contacts, embeddings):
+        if not (len(ids) == len(names) == len(contacts) == len(embeddings)):
+            raise ValueError("ids, names, contacts and embeddings must have the same length")
+        ids, names, contacts, vecs = drop_mismatched(list(ids), list(names), list(contacts), embeddings)
+        self.ids, self.names, self.contacts = ids, names, contacts
+        if vecs:
+            self.matrix = l2_normalize(np.stack(vecs))
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from the list of dicts returned by load_known_faces()."""
+        return cls(
+            [r["id"] for r in records],
+            [r["name"] for r in records],
+            [r.get("contact") for r in records],
+            [r["embedding"] for r in records],
+        )
+
+    @classmethod
+    def from_normalized(cls, ids, names, contacts, matrix):
+        """
+        Wrap an (n, dim) matrix whose rows are already unit length without copying it,
+        e.g. the memory-mapped matrix of a gallery snapshot shared between processes.
+        """
+        self = cls.__new__(cls)
+        self.ids, self.names, self.contacts = list(ids), list(names), list(contacts)
+        self.matrix = matrix if len(self.ids) else np.zeros((0, 0), dtype=np.float32)
+        if not (len(self.ids) == len(self.names) == len(self.contacts) == self.matrix.shape[0]):
+            raise ValueError("ids, names, contacts and matrix rows must have the same length")
+        return self
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1] if len(self.ids) else 0
+
+    def record(self, idx):
+        return {"id": self.ids[idx], "name": self.names[idx], "contact": self.contacts[idx]}
+
+    def search(self, queries, k=1):
+        """
+        Score a batch of query embeddings against the whole gallery.
+        Returns (indices, scores), both shaped (n_queries, k) and sorted best first.
+        """
+        q = l2_normalize(queries)
+        n = len(self.ids)
+        k = max(1, min(k, n))
+        if n == 0:
+            return np.zeros((q.shape[0], 0), dtype=np.int64), np.zeros((q.shape[0], 0), dtype=np.float32)
+
+        sims = q @ self.matrix.T
+        if k == 1:
+            idx = np.argmax(sims, axis=1)[:, None]
+        else:
+            idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(sims, idx, axis=1), axis=1)
+            idx = np.take_along_axis(idx, order, axis=1)
+        return idx, np.take_along_axis(sims, idx, axis=1)
+
+    def match_batch(self, queries, k=1):
+        """Top-k matches per query as lists of (record, score)."""
+        idx, scores = self.search(queries, k)
+        return [[(self.record(int(i)), float(s)) for i, s in zip(row_i, row_s)]
+                for row_i, row_s in zip(idx, scores)]
+
+    def best_match(self, embedding):
+        """Single-query convenience wrapper; same contract as the old per-record loop."""
+        idx, scores = self.search(embedding, 1)
+        if idx.shape[1] == 0:
+            return None, 0
+        score = float(scores[0, 0])
+        if score <= 0:
+            return None, 0
+        return self.record(int(idx[0, 0])), score
+
+
+# ---------------- DUPLICATE INDEX ----------------
+class DuplicateIndex:
+    """
+    Enrolled embeddings as stored (not normalized) for registration's duplicate check,
+    which compares Euclidean distances. Rows sit in one growable float32 matrix with
+    their squared norms alongside, so nearest() is a single matrix-vector product;
+    upsert() and remove() touch one row (removal moves the last row into the gap).
+    """
+
+    def __init__(self, capacity=256):
+        self.ids = []
+        self.names = []
+        self._slot = {}     # id -> row
+        self._capacity = capacity
+        self.matrix = None  # allocated on the first upsert, when the dimension is known
+        self._sq = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _grow(self, need, dim):
+        cap = max(need, 2 * self._capacity if self.matrix is not None else self._capacity)
+        matrix = np.zeros((cap, dim), dtype=np.float32)
+        sq = np.zeros(cap, dtype=np.float32)
+        if self.matrix is not None:
+            n = len(self.ids)
+            matrix[:n] = self.matrix[:n]
+            sq[:n] = self._sq[:n]
+        self.matrix, self._sq, self._capacity = matrix, sq, cap
+
+    def upsert(self, emp_id, name, embedding):
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        if self.matrix is None or len(self.ids) >= self._capacity:
+            self._grow(len(self.ids) + 1, vec.size)
+        if vec.size != self.matrix.shape[1]:
+            raise ValueError(f"embedding for {emp_id} has dimension {vec.size}, index has {self.matrix.shape[1]}")
+        row = self._slot.get(emp_id)
+        if row is None:
+            row = self._slot[emp_id] = len(self.ids)
+            self.ids.append(emp_id)
+            self.names.append(name)
+        else:
+            self.names[row] = name
+        self.matrix[row] = vec
+        self._sq[row] = vec.dot(vec)
+
+    def remove(self, emp_id):
+        row = self._slot.pop(emp_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row], self.names[row] = moved, self.names[last]
+            self.matrix[row], self._sq[row] = self.matrix[last], self._sq[last]
+            self._slot[moved] = row
+        self.ids.pop()
+        self.names.pop()
+
+    def nearest(self, embedding):
+        """(id, name, distance) of the closest enrolled embedding, or None if the index is empty."""
+        n = len(self.ids)
+        if n == 0:
+            return None
+        q = np.asarray(embedding, dtype=np.float32).ravel()
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b
+        d2 = self._sq[:n] - 2.0 * (self.matrix[:n] @ q)
+        i = int(np.argmin(d2))
+        dist = float(np.sqrt(max(float(d2[i]) + float(q.dot(q)), 0.0)))
+        return self.ids[i], self.names[i], dist
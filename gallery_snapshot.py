@@ -0,0 +1,178 @@
+# gallery_snapshot.py
+# Local gallery snapshot for fast recognizer startup. One file holds the unit-length
+# float32 embedding matrix plus the ids, names, contacts and `updated_at` stamps it was
+# built from. It is opened with np.memmap, so opening is instant whatever the gallery
+# size, and every recognizer process on the machine shares the same page-cache copy.
+#
+# Layout: b"FGSNAP01" | header length (u32 LE) | JSON header | zero padding to a
+# 64-byte boundary | count x dim float32 (LE) rows, in header order.
+#
+# Files are replaced atomically (write to a temp file, then os.replace), so readers
+# never see a half-written snapshot.
+#
+# Changes after that go to a journal next to it (<path>.journal): one JSON line per
+# gallery change with the changed rows and deleted ids, appended instead of rewriting
+# the whole matrix. Every snapshot has a random `generation` and journal lines carry
+# the generation they extend, so lines left over from before a rewrite are ignored.
+# Only the process holding <path>.lock (acquire_writer_lock) writes either file.
+
+import base64
+import json
+import os
+import secrets
+import struct
+
+import numpy as np
+
+from gallery import l2_normalize
+
+SNAPSHOT_MAGIC = b"FGSNAP01"
+SNAPSHOT_FORMAT = 1
+ALIGN = 64
+
+
+def journal_path(path):
+    return path + ".journal"
+
+
+def write_snapshot(path, ids, names, contacts, stamps, marker, embeddings, generation=None):
+    """Replace the snapshot file; returns its generation."""
+    generation = generation or secrets.token_hex(8)
+    n = len(ids)
+    matrix = l2_normalize(embeddings) if n else np.zeros((0, 0), dtype=np.float32)
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "count": n,
+        "dim": int(matrix.shape[1]) if n else 0,
+        "marker": list(marker) if marker is not None else None,
+        "ids": list(ids),
+        "names": list(names),
+        "contacts": list(contacts),
+        "stamps": list(stamps),
+        "generation": generation,
+    }
+    blob = json.dumps(header).encode("utf-8")
+    prefix = len(SNAPSHOT_MAGIC) + 4 + len(blob)
+    pad = (-prefix) % ALIGN
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<I", len(blob)))
+        f.write(blob)
+        f.write(b"\0" * pad)
+        f.write(matrix.astype("<f4", copy=False).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return generation
+
+
+def read_snapshot(path):
+    """
+    dict with ids, names, contacts, stamps, marker, generation and `matrix` (read-only
+    memmap of unit-length rows), or None if the file is missing or unreadable.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError("not a gallery snapshot")
+            (length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(length).decode("utf-8"))
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"unsupported snapshot format {header.get('format')}")
+        n, dim = header["count"], header["dim"]
+        offset = len(SNAPSHOT_MAGIC) + 4 + length
+        offset += (-offset) % ALIGN
+        if n:
+            matrix = np.memmap(path, dtype="<f4", mode="r", offset=offset, shape=(n, dim))
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[WARN] ignoring gallery snapshot {path}: {e}")
+        return None
+
+    marker = header["marker"]
+    return {
+        "ids": header["ids"],
+        "names": header["names"],
+        "contacts": header["contacts"],
+        "stamps": header["stamps"],
+        "marker": tuple(marker) if marker is not None else None,
+        "generation": header.get("generation"),
+        "matrix": matrix,
+    }
+
+
+# ---------------- JOURNAL ----------------
+def append_journal(path, generation, marker, upserts, deleted):
+    """
+    Append one change to the snapshot's journal. `upserts` is [(id, name, contact,
+    stamp, embedding)]; embeddings are stored unit-length like the snapshot rows.
+    """
+    rows = []
+    if upserts:
+        matrix = l2_normalize([u[4] for u in upserts]).astype("<f4", copy=False)
+        rows = [[emp_id, name, contact, stamp, base64.b64encode(vec.tobytes()).decode("ascii")]
+                for (emp_id, name, contact, stamp, _), vec in zip(upserts, matrix)]
+    line = json.dumps({"generation": generation, "marker": list(marker) if marker is not None else None,
+                       "upserts": rows, "deleted": sorted(deleted)})
+    with open(journal_path(path), "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_journal(path, generation):
+    """
+    Journal entries for snapshot `generation`, oldest first: dicts with marker,
+    upserts [(id, name, contact, stamp, embedding)] and deleted ids. Reading stops at
+    a torn last line.
+    """
+    entries = []
+    try:
+        with open(journal_path(path), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if generation is None or entry.get("generation") != generation:
+                    continue
+                upserts = [(emp_id, name, contact, stamp, np.frombuffer(base64.b64decode(b64), dtype="<f4"))
+                           for emp_id, name, contact, stamp, b64 in entry["upserts"]]
+                marker = entry["marker"]
+                entries.append({"marker": tuple(marker) if marker is not None else None,
+                                "upserts": upserts, "deleted": entry["deleted"]})
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def remove_journal(path):
+    try:
+        os.remove(journal_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def acquire_writer_lock(path):
+    """
+    Non-blocking exclusive lock on <path>.lock, held until the returned file is closed
+    (or the process exits); None if another process holds it.
+    """
+    f = open(path + ".lock", "a+b")
+    try:
+        try:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:  # Windows
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
@@ -0,0 +1,236 @@
+# gallery_sync.py
+# Live gallery reload for the recognizer. app.py bumps a counter in `sync_versions`
+# whenever it inserts, updates or deletes an employee, and `employees.updated_at`
+# records when each row last changed. The recognizer polls a one-row marker; only when
+# it moves does it list (id, updated_at) and fetch the embeddings of the rows that were
+# added or changed. The new matcher is handed over between frames.
+#
+# With a snapshot path the synced gallery is also kept in a memory-mapped file
+# (gallery_snapshot.py): startup opens the file, replays its journal and only fetches
+# what changed since. One process per snapshot file (the first to take its lock)
+# appends each change to the journal, and rewrites the file only once the journal
+# holds more than `compact_fraction` of the gallery; the others just read it.
+
+import threading
+
+from gallery_snapshot import (acquire_writer_lock, append_journal, read_journal, read_snapshot,
+                              remove_journal, write_snapshot)
+
+GALLERY_VERSION_KEY = "gallery"
+
+MARKER_SQL = (
+    "SELECT (SELECT version FROM sync_versions WHERE name = %s), COUNT(*), MAX(updated_at) FROM employees"
+)
+STAMPS_SQL = "SELECT id, updated_at FROM employees WHERE embedding IS NOT NULL"
+FETCH_SQL = "SELECT id, name, embedding, contact_number, updated_at FROM employees WHERE embedding IS NOT NULL"
+FETCH_CHUNK = 500
+
+
+def bump_gallery_version(cur, key=GALLERY_VERSION_KEY):
+    """Call in the same transaction as any change to `employees` (app.py)."""
+    cur.execute(
+        "INSERT INTO sync_versions (name, version) VALUES (%s, 1) "
+        "ON DUPLICATE KEY UPDATE version = version + 1",
+        (key,),
+    )
+
+
+class GallerySync:
+    """
+    In-memory copy of the enrolled employees that can be brought up to date cheaply.
+
+    connect()      returns a DB-API connection (closed after each use)
+    decode(b)      turns an `employees.embedding` blob into a float32 vector, or None
+    snapshot_path  optional gallery snapshot file to start from and keep up to date
+
+    load() reads everything once; check() returns None when nothing changed, otherwise
+    (upserted_ids, deleted_ids) after applying the changes to `records`. `matrix` is
+    the snapshot's memory-mapped unit-length matrix in snapshot() order while the
+    records match the file exactly (None without a snapshot file or once changes
+    were applied on top of it).
+    """
+
+    def __init__(self, connect, decode, snapshot_path=None, compact_fraction=0.25):
+        self.connect = connect
+        self.decode = decode
+        self.snapshot_path = snapshot_path
+        self.compact_fraction = compact_fraction
+        self.records = {}   # id -> {"id", "name", "embedding", "contact"}
+        self.stamps = {}    # id -> str(updated_at)
+        self.marker = None
+        self.matrix = None
+        self.generation = None   # of the snapshot file the records started from
+        self.journal_rows = 0    # rows journaled on top of it
+        self._writer_lock = None
+        self._owner = None       # decided on first write
+        self.stats = {"checks": 0, "reloads": 0, "fetched": 0, "snapshot_rows": 0,
+                      "journaled": 0, "compactions": 0}
+
+    def _read_marker(self, cur):
+        cur.execute(MARKER_SQL, (GALLERY_VERSION_KEY,))
+        # strings, so markers and stamps compare equal to the ones stored in a snapshot
+        return tuple(None if v is None else str(v) for v in cur.fetchone())
+
+    def _apply_rows(self, rows):
+        upserted = set()
+        for emp_id, name, blob, contact, updated_at in rows:
+            self.stamps[emp_id] = str(updated_at)
+            emb = self.decode(blob)
+            if emb is None:
+                self.records.pop(emp_id, None)
+                continue
+            self.records[emp_id] = {"id": emp_id, "name": name, "embedding": emb, "contact": contact}
+            upserted.add(emp_id)
+        self.stats["fetched"] += len(rows)
+        return upserted
+
+    def load(self):
+        snap = read_snapshot(self.snapshot_path) if self.snapshot_path else None
+        if snap is not None:
+            self._adopt(snap)
+            self.stats["snapshot_rows"] = len(self.records)
+            for entry in read_journal(self.snapshot_path, self.generation):
+                self._replay(entry)
+            self.check()  # catch up with whatever changed since the file was written
+            return self.snapshot()
+
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            self.marker = self._read_marker(cur)
+            cur.execute(FETCH_SQL)
+            self.records, self.stamps = {}, {}
+            self._apply_rows(cur.fetchall())
+            cur.close()
+        finally:
+            conn.close()
+        self.matrix = None
+        if self._is_owner():
+            self._compact()
+        return self.snapshot()
+
+    def _adopt(self, snap):
+        matrix = snap["matrix"]
+        self.records, self.stamps = {}, {}
+        for i, (emp_id, name, contact, stamp) in enumerate(zip(snap["ids"], snap["names"],
+                                                                 snap["contacts"], snap["stamps"])):
+            self.records[emp_id] = {"id": emp_id, "name": name, "embedding": matrix[i], "contact": contact}
+            self.stamps[emp_id] = stamp
+        self.marker = snap["marker"]
+        self.generation = snap["generation"]
+        self.journal_rows = 0
+        self.matrix = matrix
+
+    def _replay(self, entry):
+        for emp_id in entry["deleted"]:
+            self.records.pop(emp_id, None)
+            self.stamps.pop(emp_id, None)
+        for emp_id, name, contact, stamp, emb in entry["upserts"]:
+            self.records[emp_id] = {"id": emp_id, "name": name, "embedding": emb, "contact": contact}
+            self.stamps[emp_id] = stamp
+        self.marker = entry["marker"]
+        self.journal_rows += len(entry["upserts"]) + len(entry["deleted"])
+        self.matrix = None
+
+    def _is_owner(self):
+        if self._owner is None:
+            self._writer_lock = acquire_writer_lock(self.snapshot_path) if self.snapshot_path else None
+            self._owner = self._writer_lock is not None
+            if self.snapshot_path and not self._owner:
+                print(f"[INFO] gallery snapshot {self.snapshot_path} is kept up to date by another process")
+        return self._owner
+
+    def _persist(self, upserted, deleted):
+        """Record a change: a journal line, or a full rewrite once the journal has grown."""
+        self.matrix = None
+        if not self.snapshot_path or not self._is_owner():
+            return
+        self.journal_rows += len(upserted) + len(deleted)
+        if self.generation is None or self.journal_rows > self.compact_fraction * max(len(self.records), 1):
+            self._compact()
+            return
+        upserts = [(i, self.records[i]["name"], self.records[i]["contact"], self.stamps[i],
+                    self.records[i]["embedding"]) for i in sorted(upserted)]
+        try:
+            append_journal(self.snapshot_path, self.generation, self.marker, upserts, deleted)
+            self.stats["journaled"] += len(upserts) + len(deleted)
+        except OSError as e:
+            print(f"[WARN] could not append to gallery snapshot journal: {e}")
+
+    def _compact(self):
+        """Rewrite the snapshot file and re-open it, so records point into the shared mapping."""
+        recs = self.snapshot()
+        try:
+            write_snapshot(self.snapshot_path, [r["id"] for r in recs], [r["name"] for r in recs],
+                           [r["contact"] for r in recs], [self.stamps[r["id"]] for r in recs],
+                           self.marker, [r["embedding"] for r in recs])
+            remove_journal(self.snapshot_path)
+        except OSError as e:
+            print(f"[WARN] could not write gallery snapshot {self.snapshot_path}: {e}")
+            return
+        self.stats["compactions"] += 1
+        snap = read_snapshot(self.snapshot_path)
+        if snap is not None:
+            self._adopt(snap)
+
+    def check(self):
+        self.stats["checks"] += 1
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            marker = self._read_marker(cur)
+            if marker == self.marker:
+                cur.close()
+                return None
+            cur.execute(STAMPS_SQL)
+            stamps = {i: str(ts) for i, ts in cur.fetchall()}
+            changed = [i for i, ts in stamps.items() if self.stamps.get(i) != ts]
+            deleted = set(self.stamps) - set(stamps)
+            rows = []
+            for start in range(0, len(changed), FETCH_CHUNK):
+                chunk = changed[start:start + FETCH_CHUNK]
+                cur.execute(FETCH_SQL + " AND id IN (" + ", ".join(["%s"] * len(chunk)) + ")", tuple(chunk))
+                rows.extend(cur.fetchall())
+            cur.close()
+        finally:
+            conn.close()
+
+        for emp_id in deleted:
+            self.stamps.pop(emp_id, None)
+            self.records.pop(emp_id, None)
+        upserted = self._apply_rows(rows)
+        # rows that lost their embedding (or no longer decode) count as deleted
+        deleted |= set(changed) - upserted
+        self.marker = marker
+        if upserted or deleted:
+            self.stats["reloads"] += 1
+            self._persist(upserted, deleted)
+            return upserted, deleted
+        return None
+
+    def snapshot(self):
+        """Records sorted by id (stable matcher order)."""
+        return [self.records[i] for i in sorted(self.records)]
+
+
+class GalleryReloader(threading.Thread):
+    """
+    Polls `sync.check()` every `interval` seconds and calls on_change(upserted_ids,
+    deleted_ids) on this thread, so the new matcher is built off the camera thread.
+    """
+
+    def __init__(self, sync, on_change, stop_event, interval=5.0, name="gallery-reload"):
+        super().__init__(name=name, daemon=True)
+        self.sync = sync
+        self.on_change = on_change
+        self.stop_event = stop_event
+        self.interval = interval
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                changes = self.sync.check()
+                if changes:
+                    self.on_change(*changes)
+            except Exception as e:
+                print(f"[WARN] gallery reload: {e}")
@@ -0,0 +1,346 @@
+# metrics.py
+# Counters, gauges and latency histograms in the Prometheus text format, with no
+# dependencies. Metrics live in a Registry (REGISTRY by default); render() produces
+# the exposition text, value() reads a single sample back (handy in checks and
+# benchmarks), and start_http_server() serves GET /metrics on a local port.
+#
+#   FRAMES = metrics.counter("recognizer_frames_processed_total", "Frames recognized", ["camera"])
+#   DETECT = metrics.histogram("recognizer_detect_seconds", "Face detection time", ["camera"])
+#   frames = FRAMES.labels(camera="gate1")        # bind once, outside the frame loop
+#   frames.inc()
+#   with DETECT.labels(camera="gate1").time():
+#       ...
+#
+# Updating a bound child is one lock and a few additions, cheap enough for per-frame use.
+
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; spans a fast numpy call up to a slow DB round trip or WhatsApp send
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _fmt(v):
+    if isinstance(v, int):
+        return str(v)
+    if v == math.inf:
+        return "+Inf"
+    if v == -math.inf:
+        return "-Inf"
+    if isinstance(v, float) and v.is_integer() and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+# ---------------- CHILDREN (one per label set) ----------------
+class _Value:
+    def __init__(self):
+        self._value = 0.0
+        self._fn = None
+        self._lock = threading.Lock()
+
+    def inc(self, n=1.0):
+        with self._lock:
+            self._value += n
+
+    def set_function(self, fn):
+        """Read the value from fn() at render time instead (e.g. an existing counter attribute)."""
+        self._fn = fn
+
+    def get(self):
+        if self._fn is not None:
+            try:
+                return float(self._fn())
+            except Exception:
+                return math.nan
+        return self._value
+
+
+class _GaugeValue(_Value):
+    def set(self, v):
+        with self._lock:
+            self._value = float(v)
+
+    def dec(self, n=1.0):
+        self.inc(-n)
+
+
+class _Timer:
+    __slots__ = ("child", "t0")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.t0)
+        return False
+
+
+class _HistogramValue:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v):
+        i = bisect.bisect_left(self.bounds, v)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the elapsed seconds of its block."""
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+# ---------------- METRICS ----------------
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        self._default = None
+        if not self.labelnames:
+            # unlabelled metrics act as their own child: COUNTER.inc(), HIST.observe(x)
+            self._default = self._new_child()
+            for attr in ("inc", "dec", "set", "observe", "time", "set_function", "get"):
+                if hasattr(self._default, attr):
+                    setattr(self, attr, getattr(self._default, attr))
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """Child for one label set; keep it around in hot paths."""
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        if self._default is not None:
+            return [((), self._default)]
+        with self._lock:
+            items = list(self._children.items())
+        return [(tuple(zip(self.labelnames, key)), child) for key, child in sorted(items)]
+
+    def samples(self):
+        """[(sample name, ((label, value), ...), value)]"""
+        return [(self.name, labels, child.get()) for labels, child in self._items()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, doc, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def samples(self):
+        out = []
+        for labels, child in self._items():
+            counts, total, count = child.snapshot()
+            running = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                running += n
+                out.append((self.name + "_bucket", labels + (("le", _fmt(bound)),), running))
+            out.append((self.name + "_sum", labels, total))
+            out.append((self.name + "_count", labels, count))
+        return out
+
+
+# ---------------- REGISTRY ----------------
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, doc, labelnames, **kw):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, doc, labelnames, **kw)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered as a different type or label set")
+            return metric
+
+    def counter(self, name, doc, labelnames=()):
+        return self._get_or_create(Counter, name, doc, labelnames)
+
+    def gauge(self, name, doc, labelnames=()):
+        return self._get_or_create(Gauge, name, doc, labelnames)
+
+    def histogram(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, doc, labelnames, buckets=buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.doc}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for sample, labels, value in m.samples():
+                lines.append(f"{sample}{_label_text(labels)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+    def value(self, sample, **labels):
+        """Current value of one sample (e.g. "x_count", or "x_bucket" with le="0.1"); None if absent."""
+        want = {k: str(v) for k, v in labels.items()}
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            if not sample.startswith(m.name):
+                continue
+            for name, lbls, value in m.samples():
+                if name == sample and dict(lbls) == want:
+                    return value
+        return None
+
+
+REGISTRY = Registry()
+
+
+def counter(name, doc, labelnames=()):
+    return REGISTRY.counter(name, doc, labelnames)
+
+
+def gauge(name, doc, labelnames=()):
+    return REGISTRY.gauge(name, doc, labelnames)
+
+
+def histogram(name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.histogram(name, doc, labelnames, buckets)
+
+
+# ---------------- DB QUERY TIMING ----------------
+class TimedCursor:
+    """Cursor wrapper observing execute/executemany time per statement verb (SELECT, INSERT ...)."""
+
+    def __init__(self, cursor, histogram):
+        self._cursor = cursor
+        self._histogram = histogram
+
+    def _timed(self, fn, operation, *args, **kw):
+        op = operation.lstrip().split(None, 1)[0].upper() if operation.strip() else "OTHER"
+        t0 = time.perf_counter()
+        try:
+            return fn(operation, *args, **kw)
+        finally:
+            self._histogram.labels(op=op).observe(time.perf_counter() - t0)
+
+    def execute(self, operation, *args, **kw):
+        return self._timed(self._cursor.execute, operation, *args, **kw)
+
+    def executemany(self, operation, *args, **kw):
+        return self._timed(self._cursor.executemany, operation, *args, **kw)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+
+class TimedConnection:
+    """DB-API connection wrapper whose cursors are TimedCursors; `histogram` has an "op" label."""
+
+    def __init__(self, conn, histogram):
+        self._conn = conn
+        self._histogram = histogram
+
+    def cursor(self, *args, **kw):
+        return TimedCursor(self._conn.cursor(*args, **kw), self._histogram)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.close()
+        return False
+
+    def __getattr__(self, attr):
+        return getattr(self._conn, attr)
+
+
+# ---------------- HTTP ENDPOINT ----------------
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve GET /metrics from a daemon thread; returns the server (server_address has the port)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"[INFO] Metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,79 @@
+# migrate_embeddings.py
+# Rewrite legacy pickled `employees.embedding` rows in the raw float32 format of
+# embedding_codec.py. Safe to re-run: rows already in the new format are skipped, and
+# each batch is committed on its own. Legacy rows are read with the restricted
+# unpickler; rows that still cannot be read are reported and left untouched.
+#
+#   python migrate_embeddings.py --password ... --dry-run
+#   python migrate_embeddings.py --password ... --batch 500
+
+import argparse
+import time
+
+import mysql.connector
+
+from embedding_codec import MAGIC, decode_embedding, encode_embedding
+from gallery_sync import bump_gallery_version
+
+SELECT_LEGACY = (
+    "SELECT id, embedding FROM employees "
+    "WHERE embedding IS NOT NULL AND SUBSTRING(embedding, 1, 4) <> %s AND id > %s "
+    "ORDER BY id LIMIT %s"
+)
+
+
+def migrate(conn, batch=500, dry_run=False):
+    stats = {"converted": 0, "unreadable": [], "batches": 0}
+    cur = conn.cursor()
+    last_id = ""
+    while True:
+        cur.execute(SELECT_LEGACY, (MAGIC, last_id, batch))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for emp_id, blob in rows:
+            emb = decode_embedding(blob)
+            if emb is None:
+                stats["unreadable"].append(emp_id)
+                continue
+            updates.append((encode_embedding(emb), emp_id))
+        if updates and not dry_run:
+            cur.executemany("UPDATE employees SET embedding=%s WHERE id=%s", updates)
+            bump_gallery_version(cur)
+            conn.commit()
+        stats["converted"] += len(updates)
+        stats["batches"] += 1
+        print(f"[INFO] batch {stats['batches']}: {len(updates)} rows {'would be ' if dry_run else ''}converted "
+              f"(up to id {last_id})")
+    cur.close()
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert pickled employee embeddings to the raw float32 format")
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="face_db")
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--dry-run", action="store_true", help="count and validate rows without writing")
+    args = ap.parse_args()
+
+    conn = mysql.connector.connect(host=args.host, user=args.user, password=args.password, database=args.database)
+    t0 = time.time()
+    try:
+        stats = migrate(conn, args.batch, args.dry_run)
+    finally:
+        conn.close()
+
+    print(f"[INFO] {stats['converted']} rows {'to convert' if args.dry_run else 'converted'} "
+          f"in {time.time() - t0:.1f}s")
+    if stats["unreadable"]:
+        print(f"[WARN] {len(stats['unreadable'])} rows could not be read and were left as they are: "
+              f"{', '.join(map(str, stats['unreadable'][:20]))}{' ...' if len(stats['unreadable']) > 20 else ''}")
+
+
+if __name__ == "__main__":
+    main()
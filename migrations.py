@@ -0,0 +1,249 @@
+# migrations.py
+# Versioned schema changes for face_db. Each migration has a number and a name, runs
+# once, and is recorded in `schema_migrations`; migrate() applies whatever is pending
+# in order. app.py runs it at startup and the recognizer's AttendanceWriter before
+# its first write, so whichever starts first brings the schema up to date. A MySQL
+# named lock keeps two processes from migrating at the same time.
+#
+# MySQL commits DDL implicitly, so a migration cannot be rolled back halfway. Every
+# step therefore checks the current schema before changing it and can be re-run
+# after a failure; databases created before this module (by the old ensure_tables()
+# or the README's SQL) simply run all steps and skip what already exists.
+#
+#   python migrations.py --password ...            apply pending migrations
+#   python migrations.py --password ... --status   list applied / pending
+
+import argparse
+import time
+
+import mysql.connector
+
+LOCK_NAME = "face_db_schema_migrations"
+LOCK_TIMEOUT_SEC = 60
+UNIQUE_DAY_KEY = "uq_attendance_emp_date"
+
+
+# ---------------- SCHEMA HELPERS ----------------
+def has_column(cur, table, column):
+    cur.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cur.fetchone()[0] > 0
+
+
+def table_indexes(cur, table):
+    """{index name: (unique, "col1,col2")} for one table."""
+    cur.execute("""
+        SELECT index_name, MIN(non_unique), GROUP_CONCAT(column_name ORDER BY seq_in_index)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name
+    """, (table,))
+    return {name: (not non_unique, cols) for name, non_unique, cols in cur.fetchall()}
+
+
+def has_unique_day_key(conn):
+    """True if attendance has a unique index on exactly (emp_id, date)."""
+    cur = conn.cursor()
+    try:
+        return any(unique and cols == "emp_id,date" for unique, cols in table_indexes(cur, "attendance").values())
+    finally:
+        cur.close()
+
+
+# ---------------- MIGRATIONS ----------------
+def m001_base_tables(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS employees (
+        id VARCHAR(50) PRIMARY KEY,
+        name VARCHAR(100),
+        embedding LONGBLOB,
+        password_hash VARCHAR(255),
+        contact_number VARCHAR(20)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS attendance (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        emp_id VARCHAR(50),
+        date DATE,
+        in1 TIME,
+        out1 TIME,
+        in2 TIME,
+        out2 TIME,
+        FOREIGN KEY (emp_id) REFERENCES employees(id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS admins (
+        admin_id VARCHAR(50) PRIMARY KEY,
+        name VARCHAR(100),
+        password_hash VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def m002_gallery_change_tracking(cur):
+    # employees.updated_at + sync_versions drive the recognizer's gallery hot-reload
+    if not has_column(cur, "employees", "updated_at"):
+        cur.execute("""
+            ALTER TABLE employees ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+            DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+        """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_versions (
+        name VARCHAR(50) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    )
+    """)
+
+
+def m003_merge_duplicate_day_rows(cur):
+    """
+    One row per (emp_id, date): duplicates (two cameras inserting the same day) are
+    merged into the oldest row, keeping the earliest IN and the latest OUT per session.
+    """
+    # a failed earlier run on this connection may have left the table behind
+    cur.execute("DROP TEMPORARY TABLE IF EXISTS attendance_merge")
+    cur.execute("""
+        CREATE TEMPORARY TABLE attendance_merge AS
+        SELECT emp_id, date, MIN(id) AS keep_id,
+               MIN(in1) AS in1, MAX(out1) AS out1, MIN(in2) AS in2, MAX(out2) AS out2, COUNT(*) AS n
+        FROM attendance
+        WHERE emp_id IS NOT NULL AND date IS NOT NULL
+        GROUP BY emp_id, date
+        HAVING COUNT(*) > 1
+    """)
+    try:
+        cur.execute("SELECT COUNT(*), COALESCE(SUM(n), 0) FROM attendance_merge")
+        groups, rows = cur.fetchone()
+        if groups:
+            cur.execute("""
+                UPDATE attendance a JOIN attendance_merge m ON a.id = m.keep_id
+                SET a.in1 = m.in1, a.out1 = m.out1, a.in2 = m.in2, a.out2 = m.out2
+            """)
+            cur.execute("""
+                DELETE a FROM attendance a
+                JOIN attendance_merge m ON a.emp_id = m.emp_id AND a.date = m.date
+                WHERE a.id <> m.keep_id
+            """)
+    finally:
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS attendance_merge")
+    return f"merged {int(rows)} rows into {groups} day rows" if groups else "no duplicate day rows"
+
+
+def m004_attendance_unique_day_key(cur):
+    # serves the per-employee date-range reads and makes day-row writes upserts
+    indexes = table_indexes(cur, "attendance")
+    if not any(unique and cols == "emp_id,date" for unique, cols in indexes.values()):
+        cur.execute(f"ALTER TABLE attendance ADD UNIQUE KEY {UNIQUE_DAY_KEY} (emp_id, date)")
+    # the foreign key's own single-column index on emp_id is now a prefix of the new key
+    for name, (unique, cols) in table_indexes(cur, "attendance").items():
+        if not unique and cols == "emp_id":
+            cur.execute(f"ALTER TABLE attendance DROP INDEX `{name}`")
+
+
+def m005_attendance_versions(cur):
+    # per-employee change counter behind app.py's attendance read cache (attendance_cache.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS attendance_versions (
+        emp_id VARCHAR(50) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    )
+    """)
+
+
+MIGRATIONS = [
+    (1, "base tables", m001_base_tables),
+    (2, "gallery change tracking", m002_gallery_change_tracking),
+    (3, "merge duplicate attendance day rows", m003_merge_duplicate_day_rows),
+    (4, "attendance unique (emp_id, date) key", m004_attendance_unique_day_key),
+    (5, "attendance versions", m005_attendance_versions),
+]
+
+
+# ---------------- RUNNER ----------------
+def _ensure_version_table(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        duration_ms INT
+    )
+    """)
+
+
+def applied_versions(conn):
+    cur = conn.cursor()
+    try:
+        _ensure_version_table(cur)
+        cur.execute("SELECT version FROM schema_migrations")
+        return {v for (v,) in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def pending(conn):
+    done = applied_versions(conn)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations up to `target` (all by default); returns the versions applied."""
+    cur = conn.cursor()
+    cur.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT_SEC))
+    if cur.fetchone()[0] != 1:
+        cur.close()
+        raise RuntimeError(f"could not get the migration lock within {LOCK_TIMEOUT_SEC}s")
+    applied = []
+    try:
+        for version, name, fn in pending(conn):  # re-read under the lock
+            if target is not None and version > target:
+                break
+            t0 = time.perf_counter()
+            note = fn(cur)
+            ms = int(1000 * (time.perf_counter() - t0))
+            cur.execute("INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+                        (version, name, ms))
+            conn.commit()
+            applied.append(version)
+            print(f"[INFO] Migration {version:03d} {name}: done in {ms} ms" + (f" ({note})" if note else ""))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cur.fetchall()
+        cur.close()
+    return applied
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Apply or list face_db schema migrations")
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="face_db")
+    ap.add_argument("--status", action="store_true", help="list migrations without applying any")
+    ap.add_argument("--to", type=int, default=None, help="stop after this version")
+    args = ap.parse_args(argv)
+
+    conn = mysql.connector.connect(host=args.host, user=args.user, password=args.password, database=args.database)
+    try:
+        if args.status:
+            done = applied_versions(conn)
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:03d}  {'applied' if version in done else 'pending':<8} {name}")
+        else:
+            applied = migrate(conn, args.to)
+            print(f"[INFO] {len(applied)} migrations applied" if applied else "[INFO] Schema is up to date")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+# motion.py
+# Cheap motion gate in front of face detection: frame differencing against a running
+# background on a small grayscale copy of the frame. Static scenes (an empty corridor)
+# skip Haar and FaceNet entirely; moving scenes only scan the regions that moved.
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    update(frame_bgr) returns the regions (x1, y1, x2, y2 in full-resolution pixels)
+    that moved since the background model, or [] for a static scene.
+
+    width            downscaled width used for the comparison (height keeps the aspect)
+    pixel_threshold  grey-level difference (0-255) that counts as a changed pixel
+    min_area_frac    ignore blobs smaller than this fraction of the frame (noise, flicker)
+    learning_rate    how fast the background absorbs changes (0-1, per frame)
+    pad_frac         grow each region by this fraction of its size on every side, so a
+                     region triggered by a body still contains the head
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, min_area_frac=0.002,
+                 learning_rate=0.05, pad_frac=0.25):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area_frac = min_area_frac
+        self.learning_rate = learning_rate
+        self.pad_frac = pad_frac
+        self.background = None
+        self._kernel = np.ones((3, 3), np.uint8)
+        self.stats = {"frames": 0, "static": 0}
+
+    def _small_gray(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        height = max(1, round(h * self.width / w))
+        small = cv2.resize(frame_bgr, (self.width, height), interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def update(self, frame_bgr):
+        self.stats["frames"] += 1
+        small = self._small_gray(frame_bgr)
+        h, w = frame_bgr.shape[:2]
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small.astype(np.float32)
+            return [(0, 0, w, h)]  # no model yet: treat everything as moving
+
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(small, self.background, self.learning_rate)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, self._kernel, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        sh, sw = small.shape
+        min_area = self.min_area_frac * sh * sw
+        sx, sy = w / sw, h / sh
+        regions = []
+        for c in contours:
+            if cv2.contourArea(c) < min_area:
+                continue
+            x, y, bw, bh = cv2.boundingRect(c)
+            px, py = bw * self.pad_frac, bh * self.pad_frac
+            regions.append((
+                max(0, int((x - px) * sx)), max(0, int((y - py) * sy)),
+                min(w, int((x + bw + px) * sx)), min(h, int((y + bh + py) * sy)),
+            ))
+        if not regions:
+            self.stats["static"] += 1
+        return merge_regions(regions)
+
+
+def merge_regions(regions):
+    """Merge overlapping rectangles so no area is scanned twice."""
+    regions = list(regions)
+    merged = True
+    while merged and len(regions) > 1:
+        merged = False
+        out = []
+        while regions:
+            a = regions.pop()
+            for i, b in enumerate(out):
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    out[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    merged = True
+                    break
+            else:
+                out.append(a)
+        regions = out
+    return regions
+
+
+def region_area_frac(regions, shape):
+    h, w = shape[:2]
+    return sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions) / float(w * h)
@@ -0,0 +1,268 @@
+# notifications.py
+# Non-blocking outbound messages (WhatsApp attendance notices, OTP SMS) shared by
+# recognize.py and app.py: one reusable transport client, a bounded queue drained by
+# a small worker pool, retry with backoff and per-recipient rate limiting.
+
+import queue
+import random
+import threading
+import time
+
+import metrics
+from pipeline import StageQueue, DROP_NEWEST
+
+SEND_SECONDS = metrics.histogram("notification_send_seconds", "Transport call time per delivery attempt",
+                                 ["channel", "result"])
+DELIVERY_SECONDS = metrics.histogram("notification_delivery_seconds",
+                                     "Time from queueing a message to its delivery (queue wait and retries)",
+                                     ["channel"])
+MESSAGES = metrics.counter("notifications_total", "Outbound messages by outcome", ["channel", "result"])
+
+
+# ---------------- TRANSPORTS ----------------
+class TwilioTransport:
+    """Sends through one lazily created, reused twilio Client."""
+
+    def __init__(self, account_sid, auth_token, from_):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_ = from_
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from twilio.rest import Client
+                self._client = Client(self.account_sid, self.auth_token)
+            return self._client
+
+    def send(self, to, body):
+        msg = self.client().messages.create(body=body, from_=self.from_, to=to)
+        return getattr(msg, "sid", None)
+
+    @staticmethod
+    def is_retryable(exc):
+        # 429 and 5xx are worth retrying; other API errors (bad number, auth) are not
+        status = getattr(exc, "status", None)
+        return status is None or status == 429 or status >= 500
+
+
+class FakeTransport:
+    """
+    Local stand-in for load tests and development: records every message instead of
+    sending it. `latency` (seconds) simulates the HTTP round trip and `failure_rate`
+    makes that fraction of sends raise a retryable error.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, to, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.failure_rate and self._rng.random() < self.failure_rate:
+                raise ConnectionError("fake transport failure")
+            self.sent.append((to, body, time.time()))
+            return f"FAKE{len(self.sent):08d}"
+
+    @staticmethod
+    def is_retryable(exc):
+        return True
+
+
+# ---------------- RATE LIMITING ----------------
+class RecipientRateLimiter:
+    """Token bucket per recipient: `burst` messages, refilled at `per_minute`."""
+
+    def __init__(self, per_minute=6, burst=3):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, recipient):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(recipient, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[recipient] = (tokens, now)
+                return False
+            self._buckets[recipient] = (tokens - 1, now)
+            return True
+
+
+# ---------------- DISPATCHER ----------------
+QUEUED, SENT, FAILED = "queued", "sent", "failed"
+RATE_LIMITED, QUEUE_FULL = "rate_limited", "queue_full"  # never queued
+
+
+class Delivery:
+    """
+    What became of one send(). `status` stays QUEUED until a worker delivers the
+    message (SENT) or gives up on it (FAILED); RATE_LIMITED and QUEUE_FULL are final
+    at once. True while the message is queued or sent, so `if not send(...)` still
+    reads as "could not be queued".
+    """
+
+    def __init__(self, to, status=QUEUED):
+        self.to = to
+        self.status = status
+        self._done = threading.Event()
+        if status != QUEUED:
+            self._done.set()
+
+    def __bool__(self):
+        return self.status in (QUEUED, SENT)
+
+    def __str__(self):
+        return self.status
+
+    __repr__ = __str__
+
+    def _finish(self, status):
+        self.status = status
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until delivered or failed (or `timeout`); returns the status."""
+        self._done.wait(timeout)
+        return self.status
+
+
+class NotificationDispatcher:
+    """
+    send() only enqueues and returns at once; `workers` threads (started on first use)
+    deliver through the transport. Failed deliveries are retried up to `max_retries`
+    times with exponential backoff from `backoff` seconds when the transport says the
+    error is retryable. A full queue or an exhausted recipient bucket drops the
+    message with a warning. send() returns a Delivery to check or wait on.
+    """
+
+    def __init__(self, transport, name="notify", workers=2, queue_depth=256,
+                 max_retries=3, backoff=1.0, rate_limiter=None):
+        self.transport = transport
+        self.name = name
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter
+        self.q = StageQueue(name, queue_depth, DROP_NEWEST)
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "retried": 0, "dropped": 0, "rate_limited": 0}
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def send(self, to, body):
+        """Queue a message. Returns its Delivery (false if rate limited or the queue is full)."""
+        if self.rate_limiter and not self.rate_limiter.allow(to):
+            self._count("rate_limited")
+            print(f"[WARN] {self.name}: rate limit hit for {to}, message dropped")
+            return Delivery(to, RATE_LIMITED)
+        self.start()
+        delivery = Delivery(to)
+        if not self.q.put((to, body, time.monotonic(), delivery)):
+            self._count("dropped")
+            print(f"[WARN] {self.name}: queue full, message to {to} dropped")
+            return Delivery(to, QUEUE_FULL)
+        self._count("queued")
+        return delivery
+
+    def close(self, timeout=None):
+        """Stop accepting messages and wait for the queued ones to be delivered."""
+        self.q.close()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+        MESSAGES.labels(channel=self.name, result=key).inc(n)
+
+    def _worker(self):
+        while True:
+            try:
+                to, body, queued_at, delivery = self.q.get(timeout=0.5)
+            except queue.Empty:
+                if self.q.closed:
+                    return
+                continue
+            ok = False
+            try:
+                ok = self._deliver(to, body)
+            finally:
+                delivery._finish(SENT if ok else FAILED)
+            if ok:
+                DELIVERY_SECONDS.labels(channel=self.name).observe(time.monotonic() - queued_at)
+
+    def _deliver(self, to, body):
+        for attempt in range(self.max_retries + 1):
+            t0 = time.perf_counter()
+            try:
+                sid = self.transport.send(to, body)
+                SEND_SECONDS.labels(channel=self.name, result="ok").observe(time.perf_counter() - t0)
+                self._count("sent")
+                print(f"[INFO] {self.name} sent to {to}: {sid or '<no-sid>'}")
+                return True
+            except Exception as e:
+                SEND_SECONDS.labels(channel=self.name, result="error").observe(time.perf_counter() - t0)
+                if attempt >= self.max_retries or not self.transport.is_retryable(e):
+                    self._count("failed")
+                    print(f"[ERROR] {self.name} sending to {to} failed:", e)
+                    return False
+                self._count("retried")
+                time.sleep(self.backoff * (2 ** attempt))
+
+
+# ---------------- CONTACT CACHE ----------------
+class ContactCache:
+    """
+    emp_id -> (name, contact) with a TTL, so notifications don't query `employees`
+    per event. `loader(emp_id)` returns (name, contact) or None on a miss; prime()
+    fills the cache from gallery records ({"id", "name", "contact"}).
+    """
+
+    def __init__(self, loader, ttl=600):
+        self.loader = loader
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def prime(self, records):
+        now = time.monotonic()
+        with self._lock:
+            for r in records:
+                self._entries[r["id"]] = ((r.get("name"), r.get("contact")), now)
+
+    def get(self, emp_id):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(emp_id)
+        if hit and now - hit[1] < self.ttl:
+            return hit[0]
+        value = self.loader(emp_id)
+        if value is not None:
+            with self._lock:
+                self._entries[emp_id] = (value, now)
+        return value
+
+    def invalidate(self, emp_id=None):
+        with self._lock:
+            if emp_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(emp_id, None)
@@ -0,0 +1,175 @@
+# pipeline.py
+# Small threading toolkit for the recognizer: bounded queues with a drop policy,
+# a capture thread that only ever keeps the newest frames, and worker stages.
+
+import collections
+import queue
+import threading
+import time
+
+import cv2
+
+# ---------------- DROP POLICIES ----------------
+DROP_OLDEST = "drop_oldest"   # evict the oldest queued item to make room (fresh data wins)
+DROP_NEWEST = "drop_newest"   # refuse the incoming item (queued data wins)
+BLOCK = "block"               # wait for room (back-pressure onto the producer)
+
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+# ---------------- BOUNDED QUEUE ----------------
+class StageQueue:
+    """Bounded FIFO between two pipeline stages. Counts what it had to drop."""
+
+    def __init__(self, name, maxsize=1, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item, timeout=None):
+        """Returns False if the item (or, for DROP_OLDEST, nothing) was dropped."""
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                elif self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                else:
+                    ok = self._cond.wait_for(
+                        lambda: self._closed or len(self._items) < self.maxsize, timeout)
+                    if not ok or self._closed:
+                        self.dropped += 1
+                        return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Next item; raises queue.Empty on timeout or once closed and drained."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise queue.Empty
+            if not self._items:
+                raise queue.Empty
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+# ---------------- STAGES ----------------
+class CaptureThread(threading.Thread):
+    """
+    Reads a cv2.VideoCapture as fast as it delivers and pushes (frame, capture_time)
+    into `out_q`. With a DROP_OLDEST queue of depth 1 the consumer always sees the
+    newest frame and the camera/RTSP buffer never backs up behind slow stages.
+
+    For video files standing in for cameras: finite=True ends the thread at end of
+    file (or rewinds when loop=True), and pace_fps throttles reading to that rate so
+    the file behaves like a live stream.
+    """
+
+    def __init__(self, cap, out_q, stop_event, name="capture", finite=False, loop=False, pace_fps=None):
+        super().__init__(name=name, daemon=True)
+        self.cap = cap
+        self.out_q = out_q
+        self.stop_event = stop_event
+        self.finite = finite
+        self.loop = loop
+        self.period = 1.0 / pace_fps if pace_fps else 0.0
+        self.frames = 0
+        self.eof = False
+
+    def run(self):
+        next_at = time.monotonic()
+        since_rewind = 0
+        while not self.stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.finite:
+                    if self.loop and since_rewind:
+                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        since_rewind = 0
+                        continue
+                    self.eof = True
+                    break
+                # Live cameras hiccup; keep retrying.
+                self.eof = True
+                time.sleep(0.01)
+                continue
+            self.eof = False
+            self.frames += 1
+            since_rewind += 1
+            self.out_q.put((frame, time.time()))
+            if self.period:
+                next_at += self.period
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_at = time.monotonic()
+        self.out_q.close()
+
+
+class WorkerThread(threading.Thread):
+    """
+    Pulls items from `in_q` and hands each to `handler`. `on_idle` (optional) is
+    called whenever no item arrived within `idle_timeout`, e.g. to flush batches.
+    Exceptions from the handler are logged and do not kill the stage.
+
+    With drain=True the stage ignores `stop_event` and keeps going until `in_q` is
+    closed and empty, so queued work (e.g. attendance writes) is not lost on shutdown.
+    """
+
+    def __init__(self, name, in_q, handler, stop_event, on_idle=None, idle_timeout=0.05, drain=False):
+        super().__init__(name=name, daemon=True)
+        self.drain = drain
+        self.in_q = in_q
+        self.handler = handler
+        self.stop_event = stop_event
+        self.on_idle = on_idle
+        self.idle_timeout = idle_timeout
+        self.processed = 0
+
+    def run(self):
+        while self.drain or not self.stop_event.is_set():
+            try:
+                item = self.in_q.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                if self.in_q.closed:
+                    break
+                if self.on_idle:
+                    self._call(self.on_idle)
+                continue
+            self._call(self.handler, item)
+            self.processed += 1
+
+    def _call(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"[ERROR] {self.name} stage:", e)
@@ -0,0 +1,167 @@
+# preview.py
+# Optional local HTTP preview of the annotated camera feed for headless recognizers.
+#
+#   GET /             small page showing the stream
+#   GET /stream       multipart/x-mixed-replace MJPEG stream
+#   GET /snapshot.jpg latest frame as one JPEG
+#
+# The recognizer hands over frames with publish(); that only keeps a reference. Frames
+# are downscaled and JPEG-encoded on the HTTP side, at most `fps` times per second,
+# once per frame however many viewers are connected, and not at all while nobody is
+# watching. wants_frame() lets the producer skip drawing when there is no viewer.
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = "frame"
+
+INDEX_HTML = b"""<!doctype html>
+<html><head><title>Attendance preview</title></head>
+<body style="margin:0;background:#111"><img src="/stream" style="max-width:100%"></body></html>
+"""
+
+
+class MjpegPreview:
+    """Latest annotated frame, served as MJPEG to any number of local viewers."""
+
+    def __init__(self, host="127.0.0.1", port=8090, fps=5.0, max_width=640, quality=70):
+        self.host = host
+        self.port = port
+        self.interval = 1.0 / fps if fps and fps > 0 else 0.0
+        self.max_width = max_width
+        self.quality = int(quality)
+        self.viewers = 0
+        self.encoded = 0
+        self._frame = None
+        self._seq = 0
+        self._jpeg = None
+        self._jpeg_seq = -1
+        self._cond = threading.Condition()
+        self._encode_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._running = False
+
+    # ---- producer side ----
+    def wants_frame(self):
+        """True while at least one viewer is connected."""
+        return self.viewers > 0
+
+    def publish(self, frame):
+        """Offer the newest annotated frame; cheap, nothing is copied or encoded here."""
+        if not self.viewers:
+            return
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+
+    # ---- encoding ----
+    def _latest_jpeg(self, after_seq, timeout):
+        """(seq, jpeg bytes) of a frame newer than `after_seq`, or None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                return None
+            frame, seq = self._frame, self._seq
+        with self._encode_lock:
+            if self._jpeg_seq != seq:
+                h, w = frame.shape[:2]
+                if self.max_width and w > self.max_width:
+                    frame = cv2.resize(frame, (self.max_width, round(h * self.max_width / w)),
+                                       interpolation=cv2.INTER_AREA)
+                ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    return None
+                self._jpeg, self._jpeg_seq = buf.tobytes(), seq
+                self.encoded += 1
+            return self._jpeg_seq, self._jpeg
+
+    # ---- server ----
+    def start(self):
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/":
+                    self._send(200, "text/html; charset=utf-8", INDEX_HTML)
+                elif path == "/snapshot.jpg":
+                    preview._serve_snapshot(self)
+                elif path == "/stream":
+                    preview._serve_stream(self)
+                else:
+                    self._send(404, "text/plain", b"not found\n")
+
+            def _send(self, code, ctype, body):
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._running = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mjpeg-preview", daemon=True)
+        self._thread.start()
+        print(f"[INFO] Preview on http://{self.host}:{self.port}/ "
+              f"({self.interval and 1 / self.interval:g} fps max, width {self.max_width})")
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _serve_snapshot(self, handler):
+        self._add_viewer(1)
+        try:
+            got = self._latest_jpeg(self._seq, timeout=5.0)  # next published frame
+        finally:
+            self._add_viewer(-1)
+        if got is None:
+            handler._send(503, "text/plain", b"no frame yet\n")
+            return
+        handler._send(200, "image/jpeg", got[1])
+
+    def _serve_stream(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        handler.send_header("Cache-Control", "no-cache, private")
+        handler.send_header("Pragma", "no-cache")
+        handler.end_headers()
+        self._add_viewer(1)
+        seq = self._seq  # start with the next published frame
+        try:
+            while self._running:
+                started = time.monotonic()
+                got = self._latest_jpeg(seq, timeout=1.0)
+                if got is None:
+                    continue
+                seq, jpeg = got
+                handler.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+                handler.wfile.flush()
+                wait = self.interval - (time.monotonic() - started)
+                if wait > 0:
+                    time.sleep(wait)
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass  # viewer went away
+        finally:
+            self._add_viewer(-1)
+
+    def _add_viewer(self, n):
+        with self._cond:
+            self.viewers += n
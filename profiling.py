@@ -0,0 +1,290 @@
+# profiling.py
+# On-demand profiling of the next N units of work: frames of the recognizer loop or
+# requests to one Flask route. Nothing is profiled until a Profiler is armed (by a
+# signal, an env var or the admin endpoint); while disarmed the hooks are a single
+# attribute check.
+#
+#   cprofile  deterministic, per-function totals -> <name>.pstats
+#             (python -m pstats, snakeviz, or flameprof/gprof2dot for a flame graph)
+#   sample    a background thread samples the profiled threads' stacks every few ms
+#             -> <name>.folded, one "stage:frame;stage:detect;fn (file:line);... count"
+#             line per stack (flamegraph.pl, speedscope, inferno)
+#
+# Stage annotations: code marks its stages with `with profiling.stage("detect"):`.
+# Sampled stacks are prefixed with the active stages, and both modes write
+# <name>.stages.txt with the time spent per stage path.
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL_SEC = 0.005
+
+# thread ident -> stage names, only for threads currently running a profiled unit
+_stages = {}
+_active = 0
+_active_lock = threading.Lock()
+
+
+def _add_active(n):
+    global _active
+    with _active_lock:
+        _active += n
+
+
+# ---------------- STAGE ANNOTATIONS ----------------
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("name", "stack", "session", "t0")
+
+    def __init__(self, name, stack, session):
+        self.name, self.stack, self.session = name, stack, session
+
+    def __enter__(self):
+        self.stack.append(self.name)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.session._add_stage(";".join(self.stack), time.perf_counter() - self.t0)
+        self.stack.pop()
+        return False
+
+
+def stage(name):
+    """Context manager marking a stage of the current unit; free when nothing is profiled."""
+    if not _active:
+        return _NULL_STAGE
+    entry = _stages.get(threading.get_ident())
+    if entry is None:
+        return _NULL_STAGE
+    session, stack = entry
+    return _Stage(name, stack, session)
+
+
+# ---------------- SESSION ----------------
+class ProfileSession:
+    """Profiles `count` units (begin()/end() pairs, possibly in several threads) and writes the result."""
+
+    def __init__(self, name, count, mode="cprofile", out_dir=PROFILE_DIR, interval=SAMPLE_INTERVAL_SEC):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' ({', '.join(MODES)})")
+        self.name = name
+        self.count = max(1, int(count))
+        self.mode = mode
+        self.out_dir = out_dir
+        self.interval = interval
+        self.started = self.done = 0
+        self.files = []
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = None          # merged pstats.Stats (cprofile)
+        self._folded = {}           # stack -> samples (sample)
+        self._stage_times = {}      # stage path -> [calls, seconds]
+        self._sampler = None
+
+    # ---- units ----
+    def begin(self, root=None):
+        """Start one unit in this thread; returns a token for end(), or None if the session is full."""
+        with self._lock:
+            if self.started >= self.count:
+                return None
+            self.started += 1
+            _add_active(1)
+            if self.mode == "sample" and self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name=f"profile-{self.name}",
+                                                 daemon=True)
+                self._sampler.start()
+        ident = threading.get_ident()
+        stack = [root] if root else []
+        _stages[ident] = (self, stack)
+        prof = None
+        if self.mode == "cprofile":
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:
+                # another profiler already active (Python 3.12+ allows one at a time);
+                # the unit still counts and its stages are still timed
+                prof = None
+        return ident, prof, time.perf_counter(), root
+
+    def end(self, token):
+        if token is None:
+            return
+        ident, prof, t0, root = token
+        if prof is not None:
+            prof.disable()
+        _stages.pop(ident, None)
+        with self._lock:
+            if root:
+                self._add_stage_locked(root, time.perf_counter() - t0)
+            if prof is not None:
+                if self._stats is None:
+                    self._stats = pstats.Stats(prof)
+                else:
+                    self._stats.add(prof)
+            _add_active(-1)
+            self.done += 1
+            last = self.done >= self.count
+        if last:
+            self._write()
+
+    def run(self, fn, *args, root=None):
+        token = self.begin(root)
+        try:
+            return fn(*args)
+        finally:
+            self.end(token)
+
+    # ---- collection ----
+    def _add_stage(self, path, seconds):
+        with self._lock:
+            self._add_stage_locked(path, seconds)
+
+    def _add_stage_locked(self, path, seconds):
+        entry = self._stage_times.setdefault(path, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def _sample_loop(self):
+        while not self.finished.is_set():
+            frames = sys._current_frames()
+            for ident, (session, stack) in list(_stages.items()):
+                if session is not self or ident not in frames:
+                    continue
+                calls = []
+                f = frames[ident]
+                while f is not None:
+                    code = f.f_code
+                    calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    f = f.f_back
+                key = ";".join([f"stage:{s}" for s in stack] + calls[::-1])
+                with self._lock:
+                    self._folded[key] = self._folded.get(key, 0) + 1
+            time.sleep(self.interval)
+
+    # ---- output ----
+    def _write(self):
+        self.finished.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1)
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{self.mode}")
+        if self.mode == "cprofile" and self._stats is not None:
+            self._stats.dump_stats(base + ".pstats")
+            self.files.append(base + ".pstats")
+        elif self.mode == "sample":
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for stack, n in sorted(self._folded.items()):
+                    f.write(f"{stack} {n}\n")
+            self.files.append(base + ".folded")
+        with open(base + ".stages.txt", "w", encoding="utf-8") as f:
+            f.write(f"# {self.name}: {self.done} units, mode={self.mode}\n")
+            f.write(f"{'stage':<48} {'calls':>7} {'total ms':>10} {'mean ms':>9}\n")
+            for path, (calls, secs) in sorted(self._stage_times.items()):
+                f.write(f"{path:<48} {calls:>7} {1000 * secs:>10.1f} {1000 * secs / calls:>9.2f}\n")
+        self.files.append(base + ".stages.txt")
+        print(f"[INFO] Profile of {self.done} {self.name} units written: {', '.join(self.files)}")
+
+    def summary(self, limit=15):
+        """Top functions by cumulative time (cprofile mode), as text."""
+        if self._stats is None:
+            return ""
+        out = io.StringIO()
+        pstats.Stats(self._stats, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+# ---------------- PROFILER (arming) ----------------
+class Profiler:
+    """
+    Hands units of work to an armed ProfileSession; `target` restricts it to one key
+    (e.g. a Flask route rule). Disarmed, call() is one attribute check plus the call.
+    """
+
+    def __init__(self, name, out_dir=PROFILE_DIR):
+        self.name = name
+        self.out_dir = out_dir
+        self.session = None
+        self.target = None
+        self.history = []
+        self._lock = threading.Lock()
+
+    def arm(self, count, mode="cprofile", target=None):
+        with self._lock:
+            label = self.name if target is None else f"{self.name}-{_slug(target)}"
+            self.session = ProfileSession(label, count, mode, self.out_dir)
+            self.target = target
+            print(f"[INFO] Profiling the next {count} {self.name} units ({mode}"
+                  f"{', ' + target if target else ''}) into {self.out_dir}/")
+            return self.session
+
+    def begin(self, target=None, root=None):
+        session = self.session
+        if session is None or (self.target is not None and target != self.target):
+            return None
+        token = session.begin(root)
+        if token is None:
+            return None
+        return session, token
+
+    def end(self, handle):
+        if handle is None:
+            return
+        session, token = handle
+        session.end(token)
+        if session.finished.is_set():
+            with self._lock:
+                if self.session is session:
+                    self.session, self.target = None, None
+                    self.history.append({"name": session.name, "mode": session.mode,
+                                         "units": session.done, "files": session.files})
+
+    def call(self, fn, *args, target=None, root=None):
+        if self.session is None:
+            return fn(*args)
+        handle = self.begin(target, root)
+        try:
+            return fn(*args)
+        finally:
+            self.end(handle)
+
+    def status(self):
+        session = self.session
+        current = None
+        if session is not None:
+            current = {"name": session.name, "mode": session.mode, "target": self.target,
+                       "count": session.count, "done": session.done}
+        return {"armed": current, "finished": list(self.history)}
+
+
+def _slug(text):
+    return "".join(c if c.isalnum() else "_" for c in text).strip("_") or "root"
+
+
+def arm_from_env(profiler, count_var, target_var=None):
+    """Arm `profiler` at startup from env: <count_var>=N, PROFILE_MODE, optionally <target_var>."""
+    count = int(os.environ.get(count_var, "0") or 0)
+    if count <= 0:
+        return None
+    target = os.environ.get(target_var) if target_var else None
+    return profiler.arm(count, os.environ.get("PROFILE_MODE", "cprofile"), target)
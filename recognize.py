@@ -1,14 +1,32 @@
 import os
 import cv2
-import pickle
 import mysql.connector
 import numpy as np
 import datetime
+import queue
+import signal
+import sys
+import threading
 import time
-from keras_facenet import FaceNet
-from sklearn.metrics.pairwise import cosine_similarity
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
+
+from embedding import BatchEmbedder, CrossFrameBatcher, BatchEmbedError
+from tflite_embedder import load_facenet
+from attendance_writer import AttendanceWriter
+from attendance_cache import bump_attendance_versions
+from db import ConnectionPool
+from gallery import GalleryMatcher
+from ann import IVFGalleryMatcher
+from gallery_sync import GallerySync, GalleryReloader
+from embedding_codec import decode_embedding
+from detection import create_detector, CameraGeometry
+from motion import MotionGate, region_area_frac
+from tracking import IoUTracker
+from notifications import (NotificationDispatcher, TwilioTransport, FakeTransport,
+                           RecipientRateLimiter, ContactCache)
+from preview import MjpegPreview
+import metrics
+import profiling
+from pipeline import StageQueue, CaptureThread, WorkerThread, DROP_OLDEST, DROP_NEWEST
 
 # timezone support (Python 3.9+)
 try:
@@ -27,6 +45,114 @@ EMBED_THRESHOLD = 0.6
 COOLDOWN_SEC = 30
 IMG_SIZE = (160, 160)
 
+# Embedding batching: all faces of a frame are always embedded in one call.
+# With EMBED_CROSS_FRAME on, crops from consecutive frames are pooled until
+# EMBED_BATCH_MAX_FACES crops are waiting or the oldest has waited EMBED_BATCH_MAX_WAIT_SEC.
+EMBED_CROSS_FRAME = False
+EMBED_BATCH_MAX_FACES = 32
+EMBED_BATCH_MAX_WAIT_SEC = 0.15
+
+# Embedding backend: "keras" (keras_facenet, float32) or "tflite" (a model converted
+# offline with convert_tflite.py; float16 / int8 for CPU-only nodes).
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "keras")
+TFLITE_MODEL_PATH = os.environ.get("TFLITE_MODEL", "models/facenet_int8.tflite")
+TFLITE_THREADS = None  # interpreter threads; None lets TFLite decide
+
+# Face tracking between detection and embedding (see tracking.py): a tracked face is
+# re-embedded only when new, when its box moved below TRACK_REEMBED_IOU of the last
+# embedded box, or every TRACK_REEMBED_EVERY frames (TRACK_UNKNOWN_REEMBED_EVERY while unknown).
+TRACKING_ENABLED = True
+TRACK_MATCH_IOU = 0.3
+TRACK_REEMBED_IOU = 0.5
+TRACK_REEMBED_EVERY = 30
+TRACK_UNKNOWN_REEMBED_EVERY = 5
+TRACK_MAX_MISSES = 5
+
+# Motion gate in front of detection (see motion.py). Static frames skip Haar and
+# FaceNet; frames with motion only scan the moving regions unless they cover more
+# than MOTION_FULL_FRAME_FRAC of the frame. While faces are being tracked, a full
+# detection still runs every MOTION_KEEPALIVE_FRAMES static frames.
+MOTION_GATE_ENABLED = True
+MOTION_DOWNSCALE_WIDTH = 160
+MOTION_PIXEL_THRESHOLD = 25
+MOTION_MIN_AREA_FRAC = 0.002
+MOTION_LEARNING_RATE = 0.05
+MOTION_ROI_PAD_FRAC = 0.25
+MOTION_FULL_FRAME_FRAC = 0.4
+MOTION_KEEPALIVE_FRAMES = 50
+
+# Face detection (see detection.py). DETECTOR_BACKEND is one of detection.DETECTOR_PRESETS
+# ("haar", "haar-fast", "haar-alt2", "yunet", "ssd"; the DNN ones need their model file).
+# Detection runs on a copy of the frame at most DETECT_MAX_WIDTH pixels wide (less
+# shrinking if faces at FACE_MAX_DISTANCE_M would fall below the detector's window);
+# boxes are mapped back so crops keep full resolution.
+# Face size limits follow from the camera's vertical field of view and the distance
+# range people are recognized at; DETECT_MIN_FACE_PX / DETECT_MAX_FACE_PX (full-res
+# pixels) override them. Set DETECT_MAX_WIDTH = None to scan at full resolution.
+DETECTOR_BACKEND = os.environ.get("FACE_DETECTOR", "haar")
+DETECT_MAX_WIDTH = 640
+CAMERA_VFOV_DEG = 55.0
+FACE_MIN_DISTANCE_M = 0.5
+FACE_MAX_DISTANCE_M = 5.0
+DETECT_MIN_FACE_PX = None
+DETECT_MAX_FACE_PX = None
+
+# Pipeline queues (depth, drop policy): capture -> recognize -> persist/notify.
+# Frames keep only the newest one; attendance events refuse new items when full
+# so a stalled database never back-pressures the camera.
+FRAME_QUEUE_DEPTH = 1
+FRAME_QUEUE_POLICY = DROP_OLDEST
+EVENT_QUEUE_DEPTH = 256
+EVENT_QUEUE_POLICY = DROP_NEWEST
+DISPLAY_QUEUE_DEPTH = 1
+DISPLAY_QUEUE_POLICY = DROP_OLDEST
+STATS_INTERVAL_SEC = 30
+
+# Headless mode: no window and no drawing (for running as a service). With
+# PREVIEW_PORT set, annotated frames are served as MJPEG on http://PREVIEW_HOST:PREVIEW_PORT/
+# (see preview.py), at most PREVIEW_FPS frames/s and PREVIEW_MAX_WIDTH pixels wide;
+# frames are only drawn and encoded while a viewer is connected.
+HEADLESS = os.environ.get("RECOGNIZE_HEADLESS", "0") == "1"
+PREVIEW_HOST = os.environ.get("PREVIEW_HOST", "127.0.0.1")
+PREVIEW_PORT = int(os.environ.get("PREVIEW_PORT", "0")) or None
+PREVIEW_FPS = 5.0
+PREVIEW_MAX_WIDTH = 640
+PREVIEW_JPEG_QUALITY = 70
+
+# Prometheus metrics (see metrics.py) on http://METRICS_HOST:METRICS_PORT/metrics;
+# METRICS_PORT=0 turns the endpoint off.
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+
+# On-demand profiling (see profiling.py) of the next PROFILE_SIGNAL_FRAMES frames:
+# `kill -USR1 <pid>` for cProfile (.pstats), `kill -USR2 <pid>` for sampled stacks
+# (.folded, for flame graphs). PROFILE_FRAMES=N (with PROFILE_MODE) profiles the first
+# N frames after startup. Files go to PROFILE_DIR (default "profiles").
+PROFILE_SIGNAL_FRAMES = int(os.environ.get("PROFILE_SIGNAL_FRAMES", "300"))
+
+# Gallery hot-reload (see gallery_sync.py): employees enrolled, edited or deleted in
+# app.py are picked up within GALLERY_POLL_SEC without restarting recognition.
+GALLERY_RELOAD_ENABLED = True
+GALLERY_POLL_SEC = 5.0
+# Memory-mapped gallery snapshot (see gallery_snapshot.py): startup opens this file and
+# only fetches employees changed since it was written; processes on one machine share
+# its pages. None keeps the gallery in process memory only.
+GALLERY_SNAPSHOT_PATH = os.environ.get("GALLERY_SNAPSHOT", "gallery.snapshot")
+
+# Gallery index (see ann.py). "exact" scores every enrolled face; "ivf" only scores the
+# GALLERY_IVF_NPROBE closest of GALLERY_IVF_NLIST clusters (None = about 2*sqrt(n)),
+# trading a little recall for speed on galleries of tens of thousands. Galleries
+# smaller than GALLERY_IVF_MIN_SIZE always use exact search.
+GALLERY_INDEX = os.environ.get("GALLERY_INDEX", "exact")
+GALLERY_IVF_NLIST = None
+GALLERY_IVF_NPROBE = 8
+GALLERY_IVF_MIN_SIZE = 5000
+
+# Background attendance writer (pooled connections, batched upserts)
+DB_POOL_SIZE = 4
+ATTENDANCE_BATCH_MAX = 64
+ATTENDANCE_BATCH_WAIT_SEC = 0.2
+
 # Allowed attendance window (local Asia/Kolkata)
 WORK_START = datetime.time(8, 0, 0)      # 08:00:00 inclusive
 WORK_END = datetime.time(18, 30, 59)      # 18:30:00 inclusive
@@ -37,13 +163,30 @@ TWILIO_ACCOUNT_SID = "AC87623090c881a78388110fc072677480"
 TWILIO_AUTH_TOKEN = "a710314ee886cb5e54a96d1bcbd94423"
 TWILIO_WHATSAPP_FROM = "whatsapp:+14155238886"
 
-# Initialize Twilio
-try:
-    twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    print("[INFO] Twilio initialized")
-except Exception as e:
-    print("[ERROR] Twilio init failed:", e)
-    twilio_client = None
+# Outbound WhatsApp: queued and sent by a worker pool through one reused client.
+# NOTIFY_TRANSPORT=fake records messages locally instead of calling Twilio.
+NOTIFY_TRANSPORT = os.environ.get("NOTIFY_TRANSPORT", "twilio")
+NOTIFY_WORKERS = 2
+NOTIFY_QUEUE_DEPTH = 256
+NOTIFY_MAX_RETRIES = 3
+NOTIFY_BACKOFF_SEC = 1.0
+NOTIFY_PER_RECIPIENT_PER_MIN = 6
+CONTACT_CACHE_TTL_SEC = 600
+
+if NOTIFY_TRANSPORT == "fake":
+    notify_transport = FakeTransport()
+else:
+    notify_transport = TwilioTransport(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_FROM)
+
+whatsapp = NotificationDispatcher(
+    notify_transport,
+    name="whatsapp",
+    workers=NOTIFY_WORKERS,
+    queue_depth=NOTIFY_QUEUE_DEPTH,
+    max_retries=NOTIFY_MAX_RETRIES,
+    backoff=NOTIFY_BACKOFF_SEC,
+    rate_limiter=RecipientRateLimiter(per_minute=NOTIFY_PER_RECIPIENT_PER_MIN)
+)
 
 
 # ---------------- DB CONNECTION ----------------
@@ -56,25 +199,20 @@ def get_connection():
     )
 
 
+def create_pool(size=DB_POOL_SIZE):
+    return ConnectionPool({
+        "host": MYSQL_HOST,
+        "user": MYSQL_USER,
+        "password": MYSQL_PASSWORD,
+        "database": MYSQL_DB
+    }, size=size)
+
+
 # ---------------- SEND WHATSAPP ----------------
 def send_whatsapp_message(to_phone: str, text: str):
-    if twilio_client is None:
-        print("[WARN] Twilio not ready.")
-        return False
-
+    """Queue a WhatsApp message; returns False if it could not be queued."""
     to_phone = f"whatsapp:{to_phone}" if not str(to_phone).startswith("whatsapp:") else to_phone
-
-    try:
-        msg = twilio_client.messages.create(
-            body=text,
-            from_=TWILIO_WHATSAPP_FROM,
-            to=to_phone
-        )
-        print("[INFO] WhatsApp sent:", getattr(msg, "sid", "<no-sid>"))
-        return True
-    except Exception as e:
-        print("[ERROR] WhatsApp sending failed:", e)
-        return False
+    return whatsapp.send(to_phone, text)
 
 
 # ---------------- LOAD REGISTERED FACES ----------------
@@ -87,12 +225,8 @@ def load_known_faces():
         rows = cur.fetchall()
 
         for emp_id, name, emb_blob, contact in rows:
-            if emb_blob is None:
-                continue
-            try:
-                emb = pickle.loads(emb_blob)
-                emb = np.asarray(emb, dtype=np.float32)
-            except:
+            emb = decode_embedding(emb_blob)
+            if emb is None:
                 continue
 
             known.append({
@@ -110,9 +244,74 @@ def load_known_faces():
     return known
 
 
-# ---------------- MODEL LOAD ----------------
-embedder = FaceNet()
-haar = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+def load_gallery():
+    """
+    (records, GallerySync or None). Falls back to a one-off load_known_faces() when
+    hot-reload is off or the schema predates it (app.py adds the columns it needs).
+    """
+    if GALLERY_RELOAD_ENABLED:
+        sync = GallerySync(get_connection, decode_embedding, snapshot_path=GALLERY_SNAPSHOT_PATH)
+        try:
+            return sync.load(), sync
+        except Exception as e:
+            print(f"[WARN] Gallery hot-reload disabled: {e}")
+    return load_known_faces(), None
+
+
+def build_matcher(records, matrix=None):
+    """`matrix`: unit-length rows matching `records` (a snapshot mapping) to use without copying."""
+    if GALLERY_INDEX == "ivf" and len(records) >= GALLERY_IVF_MIN_SIZE:
+        return IVFGalleryMatcher.from_records(records, nlist=GALLERY_IVF_NLIST, nprobe=GALLERY_IVF_NPROBE)
+    if matrix is not None and len(matrix) == len(records):
+        return GalleryMatcher.from_normalized([r["id"] for r in records], [r["name"] for r in records],
+                                              [r.get("contact") for r in records], matrix)
+    return GalleryMatcher.from_records(records)
+
+
+def start_gallery_reloader(sync, matcher, recognizers, stop):
+    """Keep `recognizers` (and the contact cache) in step with the employees table."""
+    current = {"matcher": matcher}
+
+    def on_change(upserted, deleted):
+        matcher = current["matcher"]
+        if isinstance(matcher, IVFGalleryMatcher):
+            # updated in place: no k-means retraining for a handful of enrollments
+            matcher.apply_changes([sync.records[i] for i in upserted], deleted)
+        else:
+            matcher = current["matcher"] = build_matcher(sync.snapshot(), sync.matrix)
+        for emp_id in upserted | deleted:
+            contacts.invalidate(emp_id)
+        contacts.prime(sync.records[i] for i in upserted)
+        for r in recognizers:
+            r.set_matcher(matcher, upserted | deleted)
+        print(f"[INFO] Gallery reloaded: {len(matcher)} faces (+/~{len(upserted)} -{len(deleted)})")
+
+    reloader = GalleryReloader(sync, on_change, stop, interval=GALLERY_POLL_SEC)
+    reloader.start()
+    return reloader
+
+
+# ---------------- MODEL LOAD (Lazy Loading) ----------------
+# FaceNet (and TensorFlow) load on first use so processes that only coordinate
+# (e.g. the multi-camera supervisor) don't pay for a model they never run.
+embedder = None
+batch_embedder = None
+detector = create_detector(DETECTOR_BACKEND, max_width=DETECT_MAX_WIDTH,
+                           min_size=DETECT_MIN_FACE_PX, max_size=DETECT_MAX_FACE_PX,
+                           geometry=CameraGeometry(CAMERA_VFOV_DEG, FACE_MIN_DISTANCE_M, FACE_MAX_DISTANCE_M))
+
+
+def get_embedder():
+    global embedder, batch_embedder
+    if embedder is None:
+        embedder = load_facenet(EMBED_BACKEND, TFLITE_MODEL_PATH, TFLITE_THREADS)
+        batch_embedder = BatchEmbedder(embedder, capacity=EMBED_BATCH_MAX_FACES, size=IMG_SIZE)
+    return embedder
+
+
+def get_batch_embedder():
+    get_embedder()
+    return batch_embedder
 
 
 # ---------------- HELPERS ----------------
@@ -121,23 +320,33 @@ def compute_embedding_from_crop(face_crop_bgr):
         return None
     face_rgb = cv2.cvtColor(face_crop_bgr, cv2.COLOR_BGR2RGB)
     face_resized = cv2.resize(face_rgb, IMG_SIZE)
-    emb = embedder.embeddings([face_resized])[0]
+    emb = get_embedder().embeddings([face_resized])[0]
     return np.asarray(emb, dtype=np.float32)
 
 
-def find_best_match(embedding, known_list):
-    best = None
-    best_score = 0
-    for rec in known_list:
-        try:
-            score = float(cosine_similarity([embedding], [rec["embedding"]])[0][0])
-        except:
-            continue
+def compute_embeddings_batch(face_crops_bgr):
+    """Embed every crop of a frame with one FaceNet call; None for empty crops."""
+    return get_batch_embedder().embed_crops(face_crops_bgr)
+
 
-        if score > best_score:
-            best_score = score
-            best = rec
-    return best, best_score
+def find_best_match(embedding, matcher):
+    return matcher.best_match(embedding)
+
+
+def find_best_matches(embeddings, matcher):
+    """(record, score) per embedding, scored together with one matrix multiply."""
+    results = [(None, 0)] * len(embeddings)
+    present = [i for i, e in enumerate(embeddings) if e is not None]
+    if not present or len(matcher) == 0:
+        return results
+    rows = matcher.match_batch(np.stack([embeddings[i] for i in present]), k=1)
+    for i, row in zip(present, rows):
+        if not row:
+            continue  # e.g. every probed IVF list empty: no match
+        rec, score = row[0]
+        if score > 0:
+            results[i] = (rec, score)
+    return results
 
 
 def normalize_phone(num):
@@ -162,7 +371,10 @@ def ensure_attendance_row(emp_id, date):
     row = cur.fetchone()
 
     if row is None:
-        cur.execute("INSERT INTO attendance (emp_id, date) VALUES (%s, %s)", (emp_id, date))
+        # another camera may create the same day row first; the unique key turns that into a no-op
+        cur.execute("INSERT INTO attendance (emp_id, date) VALUES (%s, %s) "
+                    "ON DUPLICATE KEY UPDATE emp_id = emp_id", (emp_id, date))
+        bump_attendance_versions(cur, [emp_id])  # a new day row changes app.py's cached reads
         conn.commit()
         cur.execute("SELECT id, in1, out1, in2, out2 FROM attendance WHERE emp_id=%s AND date=%s",
                     (emp_id, date))
@@ -177,7 +389,7 @@ def ensure_attendance_row(emp_id, date):
 ALLOWED_FIELDS = {"in1", "out1", "in2", "out2"}
 
 
-def update_field(att_id, field_name, time_str):
+def update_field(att_id, field_name, time_str, emp_id):
     if field_name not in ALLOWED_FIELDS:
         print("[ERROR] Invalid field:", field_name)
         return
@@ -186,6 +398,7 @@ def update_field(att_id, field_name, time_str):
     cur = conn.cursor()
     query = f"UPDATE attendance SET {field_name}=%s WHERE id=%s"
     cur.execute(query, (time_str, att_id))
+    bump_attendance_versions(cur, [emp_id])  # invalidates app.py's cached reads
     conn.commit()
     cur.close()
     conn.close()
@@ -208,19 +421,28 @@ def is_within_attendance_window(dt_local):
 
 
 # ---------------- MARK ATTENDANCE & NOTIFY (updated formatting) ----------------
+def load_contact(emp_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT name, contact_number FROM employees WHERE id=%s LIMIT 1", (emp_id,))
+        return cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+
+contacts = ContactCache(load_contact, ttl=CONTACT_CACHE_TTL_SEC)
 
-def notify_student(emp_id, event_label, time_str):
+
+def notify_student(emp_id, event_label, time_str, now=None):
     """
     Fetch contact and name, then send a nicely formatted WhatsApp message.
     event_label: one of "IN1","OUT1","IN2","OUT2"
+    now: the event's datetime (defaults to the current local time)
     """
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT name, contact_number FROM employees WHERE id=%s LIMIT 1", (emp_id,))
-        row = cur.fetchone()
+        row = contacts.get(emp_id)
         if not row:
             print(f"[WARN] No employee row for {emp_id}")
             return False
@@ -243,7 +465,7 @@ def notify_student(emp_id, event_label, time_str):
         action = "checked in" if event_label.startswith("IN") else "checked out"
 
         # Use local date for message for clarity
-        now_dt = now_local()
+        now_dt = now or now_local()
         date_str = now_dt.date().isoformat()
         # Final polished message
         text = (f"Dear {emp_name},\n\n"
@@ -251,26 +473,23 @@ def notify_student(emp_id, event_label, time_str):
 
         # send
         sent = send_whatsapp_message(phone, text)
-        print(f"[INFO] notify_student -> emp={emp_id} to={phone} sent={sent}")
+        print(f"[INFO] notify_student -> emp={emp_id} to={phone} queued={sent}")
         return sent
     except Exception as e:
         print(f"[ERROR] notify_student exception for {emp_id}: {e}")
         return False
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 
-def mark_attendance(emp_id):
+def mark_attendance(emp_id, now=None):
     """
     Update attendance fields and call notify_student with the event label so notify_student
     decides the proper message text (morning/afternoon; check-in/check-out).
-    Uses timezone-aware local time for stamps.
+    Uses timezone-aware local time for stamps; `now` is the recognition time when the
+    write happens later than the recognition (pipeline mode).
     """
-    today = now_local().date()
-    now = now_local()
+    if now is None:
+        now = now_local()
+    today = now.date()
     t = now.time()
     ts = now.strftime("%H:%M:%S")
 
@@ -284,101 +503,438 @@ def mark_attendance(emp_id):
     if t < datetime.time(13, 45):
         # morning slot
         if in1 is None:
-            update_field(att_id, "in1", ts)
+            update_field(att_id, "in1", ts, emp_id)
             print(f"[IN1] {emp_id} at {ts}")
             notify_student(emp_id, "IN1", ts)
             return
         else:
-            update_field(att_id, "out1", ts)
+            update_field(att_id, "out1", ts, emp_id)
             print(f"[OUT1] {emp_id} updated {ts}")
             notify_student(emp_id, "OUT1", ts)
             return
     else:
         # afternoon slot
         if in2 is None:
-            update_field(att_id, "in2", ts)
+            update_field(att_id, "in2", ts, emp_id)
             print(f"[IN2] {emp_id} at {ts}")
             notify_student(emp_id, "IN2", ts)
             return
         else:
-            update_field(att_id, "out2", ts)
+            update_field(att_id, "out2", ts, emp_id)
             print(f"[OUT2] {emp_id} updated {ts}")
             notify_student(emp_id, "OUT2", ts)
             return
 
 
+def on_attendance_applied(emp_id, label, ts, dt):
+    print(f"[{label}] {emp_id} at {ts}")
+    notify_student(emp_id, label, ts, dt)
+
+
+def create_attendance_writer(on_applied=on_attendance_applied, queue_depth=EVENT_QUEUE_DEPTH):
+    """Background writer used by the live loop, the multi-camera supervisor and batch mode (not started)."""
+    return AttendanceWriter(create_pool(), on_applied=on_applied, fallback=mark_attendance,
+                            max_batch=ATTENDANCE_BATCH_MAX, max_wait=ATTENDANCE_BATCH_WAIT_SEC,
+                            queue_depth=queue_depth, queue_policy=EVENT_QUEUE_POLICY)
+
+
+# ---------------- METRICS ----------------
+FRAMES_CAPTURED = metrics.counter("recognizer_frames_captured_total", "Frames read from the camera", ["camera"])
+FRAMES_DROPPED = metrics.counter("recognizer_frames_dropped_total",
+                                 "Frames replaced in the capture queue before they were processed", ["camera"])
+FRAMES_PROCESSED = metrics.counter("recognizer_frames_processed_total", "Frames run through recognition", ["camera"])
+FRAMES_STATIC = metrics.counter("recognizer_frames_static_total", "Frames skipped by the motion gate", ["camera"])
+DETECT_SECONDS = metrics.histogram("recognizer_detect_seconds", "Face detection time per frame", ["camera"])
+FACES_PER_FRAME = metrics.histogram("recognizer_faces_per_frame", "Faces detected per frame", ["camera"],
+                                    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16))
+FACES_EMBEDDED = metrics.counter("recognizer_faces_embedded_total",
+                                 "Faces sent to FaceNet (the rest reuse their track's identity)", ["camera"])
+MATCH_SCORE = metrics.histogram("recognizer_match_score", "Best gallery cosine score per embedded face",
+                                buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0))
+FRAME_LATENCY = metrics.histogram("recognizer_frame_latency_seconds", "Capture to recognition result per frame")
+RECOGNITIONS = metrics.counter("recognizer_recognitions_total",
+                               "Recognized faces by outcome (recorded, outside_window, cooldown)", ["result"])
+PENDING_EVENTS = metrics.gauge("recognizer_pending_attendance_events", "Attendance events waiting for the writer")
+_recorded = RECOGNITIONS.labels(result="recorded")
+_outside_window = RECOGNITIONS.labels(result="outside_window")
+_cooldown = RECOGNITIONS.labels(result="cooldown")
+
+
+# ---------------- FRAME HANDLING ----------------
+def detect_faces(frame, regions=None):
+    """Face boxes (x, y, w, h); with `regions` only those (x1, y1, x2, y2) areas are scanned."""
+    return detector.detect(frame, regions)
+
+
+def face_boxes_and_crops(frame, faces):
+    boxes, crops = [], []
+    h_frame, w_frame = frame.shape[:2]
+    for (x, y, w, h) in faces:
+        # clamp coordinates just in case face near edge
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(w_frame, x + w)
+        y2 = min(h_frame, y + h)
+        if x2 <= x1 or y2 <= y1:
+            continue
+        boxes.append((x1, y1, x2, y2))
+        crops.append(frame[y1:y2, x1:x2])
+    return boxes, crops
+
+
+def handle_recognition(emp_id, last_seen, record=None, now_dt=None):
+    """
+    Apply cooldown and attendance window; `record(emp_id, now_dt)` defaults to mark_attendance.
+    `now_dt` is the recognition time when it is not the current time (recorded footage).
+    """
+    now_ts = time.time() if now_dt is None else now_dt.timestamp()
+    # Check cooldown
+    if now_ts - last_seen.get(emp_id, 0) > COOLDOWN_SEC:
+        # Check attendance window BEFORE recording
+        if now_dt is None:
+            now_dt = now_local()
+        if is_within_attendance_window(now_dt):
+            # within allowed window -> record attendance
+            (record or mark_attendance)(emp_id, now_dt)
+            last_seen[emp_id] = now_ts
+            _recorded.inc()
+            print(f"[INFO] Recorded attendance for {emp_id} at {now_dt.time().strftime('%H:%M:%S')}")
+        else:
+            # Outside window: do not record. Optionally log or notify admin.
+            print(f"[INFO] Recognition for {emp_id} at {now_dt.time().strftime('%H:%M:%S')} - outside attendance window. Skipping DB write.")
+            # Optional: send notification to admin or store attempt in audit table
+            # Example (commented):
+            # notify_admin_of_outside_attempt(emp_id, now_dt)
+            last_seen[emp_id] = now_ts  # still set cooldown to avoid repeated spam
+            _outside_window.inc()
+    else:
+        _cooldown.inc()
+
+
+def draw_result(frame, box, rec, score):
+    x1, y1, x2, y2 = box
+    if rec:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
+        cv2.putText(frame, f"{rec['name']} {score:.2f}", (x1, y1-10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
+    else:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0,0,255), 2)
+        cv2.putText(frame, "Unknown", (x1, y1-10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,255), 2)
+
+
+def handle_frame_results(frame, boxes, results, last_seen, record=None, annotate=True, now_dt=None):
+    """results: (record, score) per box; record is None unless score >= EMBED_THRESHOLD."""
+    for box, (rec, score) in zip(boxes, results):
+        if rec:
+            handle_recognition(rec["id"], last_seen, record, now_dt)
+        if annotate:
+            draw_result(frame, box, rec, score)
+
+
+def thresholded_matches(embs, matcher):
+    return [(rec, score) if rec and score >= EMBED_THRESHOLD else (None, score)
+            for rec, score in find_best_matches(embs, matcher)]
+
+
+# ---------------- CAMERA RECOGNIZER ----------------
+class CameraRecognizer:
+    """
+    Detection -> tracking -> embedding -> matching -> cooldown for one camera stream.
+
+    Recognitions that pass the cooldown and the attendance window are handed to
+    `record(emp_id, now_dt)`. Recognizers of several cameras can share one
+    `last_seen` dict so a person walking past two gates is recorded once.
+
+    With tracking on, a face that stays in view keeps its track's identity and is
+    only re-embedded when the tracker asks for it (new, moved a lot, or every N frames).
+
+    `event_time(captured_at)` maps a frame's capture stamp to the recognition datetime;
+    by default recognitions are stamped with the current local time.
+    """
+
+    def __init__(self, matcher, record, last_seen=None, name="camera",
+                 cross_frame=EMBED_CROSS_FRAME, annotate=True, tracking=TRACKING_ENABLED,
+                 motion_gate=MOTION_GATE_ENABLED, event_time=None):
+        self.matcher = matcher
+        self.record = record
+        self.last_seen = {} if last_seen is None else last_seen
+        self.name = name
+        self.annotate = annotate
+        self.event_time = event_time
+        self.batcher = None
+        if cross_frame:
+            self.batcher = CrossFrameBatcher(get_batch_embedder(), EMBED_BATCH_MAX_FACES, EMBED_BATCH_MAX_WAIT_SEC)
+        self.tracker = None
+        if tracking:
+            self.tracker = IoUTracker(TRACK_MATCH_IOU, TRACK_REEMBED_IOU, TRACK_REEMBED_EVERY,
+                                      TRACK_UNKNOWN_REEMBED_EVERY, TRACK_MAX_MISSES)
+        self.motion = None
+        if motion_gate:
+            self.motion = MotionGate(MOTION_DOWNSCALE_WIDTH, MOTION_PIXEL_THRESHOLD, MOTION_MIN_AREA_FRAC,
+                                     MOTION_LEARNING_RATE, MOTION_ROI_PAD_FRAC)
+        self.static_frames = 0
+        self._frames = FRAMES_PROCESSED.labels(camera=name)
+        self._static = FRAMES_STATIC.labels(camera=name)
+        self._detect_seconds = DETECT_SECONDS.labels(camera=name)
+        self._faces = FACES_PER_FRAME.labels(camera=name)
+        self._embedded = FACES_EMBEDDED.labels(camera=name)
+        self._next_matcher = None
+        self._matcher_lock = threading.Lock()
+
+    def set_matcher(self, matcher, changed_ids=()):
+        """Thread-safe; the new matcher takes over before the next frame is processed."""
+        with self._matcher_lock:
+            self._next_matcher = (matcher, set(changed_ids))
+
+    def _swap_matcher(self):
+        with self._matcher_lock:
+            pending, self._next_matcher = self._next_matcher, None
+        matcher, changed = pending
+        self.matcher = matcher
+        if self.tracker:
+            self.tracker.invalidate(changed)
+
+    def detection_regions(self, frame):
+        """
+        False to skip detection on this frame, None for a full-frame scan, or the list
+        of moving regions to scan.
+        """
+        if self.motion is None:
+            return None
+        moved = self.motion.update(frame)
+        if not moved:
+            self.static_frames += 1
+            keepalive = self.tracker is not None and self.tracker.tracks
+            if keepalive and self.static_frames >= MOTION_KEEPALIVE_FRAMES:
+                self.static_frames = 0
+                return None
+            return False
+        self.static_frames = 0
+        if region_area_frac(moved, frame.shape) >= MOTION_FULL_FRAME_FRAC:
+            return None
+        return moved
+
+    def process(self, frame, captured_at):
+        """Returns [(frame, captured_at)] for the frames whose results are now ready."""
+        if self._next_matcher is not None:
+            self._swap_matcher()
+        self._frames.inc()
+        with profiling.stage("motion"):
+            regions = self.detection_regions(frame)
+        if regions is False:
+            # static scene: nothing to detect, tracks stay as they are
+            self._static.inc()
+            boxes, crops, tracks, todo = [], [], [], []
+        else:
+            with self._detect_seconds.time(), profiling.stage("detect"):
+                faces = detect_faces(frame, regions)
+            boxes, crops = face_boxes_and_crops(frame, faces)
+            self._faces.observe(len(boxes))
+            if self.tracker:
+                with profiling.stage("track"):
+                    tracks = self.tracker.update(boxes)
+                    todo = [i for i, t in enumerate(tracks) if self.tracker.needs_embedding(t)]
+                    for i in todo:
+                        self.tracker.mark_embedding(tracks[i])
+                    self.tracker.mark_reused(len(boxes) - len(todo))
+            else:
+                tracks = [None] * len(boxes)
+                todo = list(range(len(boxes)))
+
+        context = (frame, boxes, tracks, todo, captured_at)
+        if todo:
+            self._embedded.inc(len(todo))
+        todo_crops = [crops[i] for i in todo]
+        with profiling.stage("embed"):
+            try:
+                if self.batcher:
+                    ready = self.batcher.add(context, todo_crops)
+                else:
+                    ready = [(context, compute_embeddings_batch(todo_crops) if todo_crops else [])]
+            except BatchEmbedError as e:
+                ready = self._embed_failed(e.contexts, e.cause)
+            except Exception as e:
+                ready = self._embed_failed([context], e)
+        return self._finish(ready)
+
+    def poll(self):
+        """Flush a cross-frame batch whose time limit expired."""
+        return self._finish(self._flush_batcher(self.batcher.poll)) if self.batcher else []
+
+    def flush(self):
+        """Flush any pending cross-frame batch now (end of stream)."""
+        return self._finish(self._flush_batcher(self.batcher.flush)) if self.batcher else []
+
+    def _flush_batcher(self, flush):
+        try:
+            return flush()
+        except BatchEmbedError as e:
+            return self._embed_failed(e.contexts, e.cause)
+
+    def _embed_failed(self, contexts, error):
+        """The failed frames, still finished (drawn, last identities kept) but with no embeddings."""
+        print(f"[ERROR] embedding faces of {len(contexts)} frame(s) failed: {error}")
+        return [(context, None) for context in contexts]
+
+    def _finish(self, ready):
+        done = []
+        for (frame, boxes, tracks, todo, captured_at), embs in ready:
+            results = [None] * len(boxes)
+            matches = []
+            try:
+                if embs is not None:
+                    with profiling.stage("match"):
+                        matches = thresholded_matches(embs, self.matcher)
+            except Exception as e:
+                print(f"[ERROR] matching {len(todo)} faces failed: {e}")
+                embs = None
+            if embs is None:
+                # keep the tracks' last identities and let them be embedded again
+                for i in todo:
+                    if tracks[i]:
+                        self.tracker.abandon_embedding(tracks[i])
+            for i, (rec, score) in zip(todo, matches):
+                results[i] = (rec, score)
+                MATCH_SCORE.observe(score)
+                if tracks[i]:
+                    self.tracker.set_identity(tracks[i], rec, score)
+            for i, t in enumerate(tracks):
+                if results[i] is None:
+                    results[i] = (t.rec, t.score) if t else (None, 0)
+            now_dt = self.event_time(captured_at) if self.event_time else None
+            with profiling.stage("record"):
+                handle_frame_results(frame, boxes, results, self.last_seen, self.record, self.annotate, now_dt)
+            done.append((frame, captured_at))
+        return done
+
+
 # ---------------- MAIN LOOP ----------------
-def main():
-    known_faces = load_known_faces()
-    print(f"[INFO] Loaded {len(known_faces)} faces.")
+def main(headless=None, preview_port=None):
+    """
+    Runs as a pipeline so slow stages cannot stall the camera:
 
-    last_seen = {}
+      capture thread --frames--> recognize worker --events--> AttendanceWriter (DB + WhatsApp)
+                                                  --display--> main thread (imshow / MJPEG preview)
+
+    Headless (HEADLESS or `headless`) opens no window and draws nothing unless a
+    preview viewer is connected; `preview_port` (PREVIEW_PORT) starts the preview server.
+    """
+    headless = HEADLESS if headless is None else headless
+    preview_port = PREVIEW_PORT if preview_port is None else preview_port
+    if not headless and sys.platform.startswith("linux") and not (
+            os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        print("[WARN] No display available; running headless.")
+        headless = True
+
+    known, gallery_sync = load_gallery()
+    contacts.prime(known)
+    matcher = build_matcher(known, getattr(gallery_sync, "matrix", None))
+    print(f"[INFO] Loaded {len(matcher)} faces ({type(matcher).__name__}).")
 
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         print("[ERROR] Camera not found.")
         return
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            continue
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = haar.detectMultiScale(gray, 1.1, 5)
-
-        for (x, y, w, h) in faces:
-            # clamp coordinates just in case face near edge
-            h_frame, w_frame = frame.shape[:2]
-            x1 = max(0, x)
-            y1 = max(0, y)
-            x2 = min(w_frame, x + w)
-            y2 = min(h_frame, y + h)
-            if x2 <= x1 or y2 <= y1:
-                continue
+    writer = create_attendance_writer()
 
-            face_crop = frame[y1:y2, x1:x2]
-            emb = compute_embedding_from_crop(face_crop)
-            if emb is None:
-                continue
+    stop = threading.Event()
+    frame_q = StageQueue("frames", FRAME_QUEUE_DEPTH, FRAME_QUEUE_POLICY)
+    display_q = StageQueue("display", DISPLAY_QUEUE_DEPTH, DISPLAY_QUEUE_POLICY)
 
-            rec, score = find_best_match(emb, known_faces)
-            if rec and score >= EMBED_THRESHOLD:
-                emp_id = rec["id"]
-
-                now_ts = time.time()
-                # Check cooldown
-                if now_ts - last_seen.get(emp_id, 0) > COOLDOWN_SEC:
-                    # Check attendance window BEFORE recording
-                    now_dt = now_local()
-                    if is_within_attendance_window(now_dt):
-                        # within allowed window -> record attendance
-                        mark_attendance(emp_id)
-                        last_seen[emp_id] = now_ts
-                        print(f"[INFO] Recorded attendance for {emp_id} at {now_dt.time().strftime('%H:%M:%S')}")
-                    else:
-                        # Outside window: do not record. Optionally log or notify admin.
-                        print(f"[INFO] Recognition for {emp_id} at {now_dt.time().strftime('%H:%M:%S')} - outside attendance window. Skipping DB write.")
-                        # Optional: send notification to admin or store attempt in audit table
-                        # Example (commented):
-                        # notify_admin_of_outside_attempt(emp_id, now_dt)
-                        last_seen[emp_id] = now_ts  # still set cooldown to avoid repeated spam
-
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
-                cv2.putText(frame, f"{rec['name']} {score:.2f}", (x1, y1-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
-            else:
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0,0,255), 2)
-                cv2.putText(frame, "Unknown", (x1, y1-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,255), 2)
+    preview = None
+    if preview_port:
+        preview = MjpegPreview(PREVIEW_HOST, preview_port, PREVIEW_FPS, PREVIEW_MAX_WIDTH,
+                               PREVIEW_JPEG_QUALITY).start()
 
-        cv2.imshow("Attendance", frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+    recognizer = CameraRecognizer(matcher, writer.submit, annotate=not headless)
+    if METRICS_PORT:
+        try:
+            metrics.start_http_server(METRICS_PORT, METRICS_HOST)
+        except OSError as e:
+            print(f"[WARN] Metrics endpoint not started on {METRICS_HOST}:{METRICS_PORT}: {e}")
+
+    frame_profiler = profiling.Profiler("frames")
+    profiling.arm_from_env(frame_profiler, "PROFILE_FRAMES")
+
+    def process_frame(item):
+        for frame, captured_at in recognizer.process(*item):
+            display_q.put((frame, captured_at))
+
+    def recognize_frame(item):
+        if headless:
+            # only spend time drawing when someone is watching the preview
+            recognizer.annotate = preview is not None and preview.wants_frame()
+        frame_profiler.call(process_frame, item, root="frame")
+
+    def flush_batch():
+        for frame, captured_at in recognizer.poll():
+            display_q.put((frame, captured_at))
+
+    capture = CaptureThread(cap, frame_q, stop)
+    FRAMES_CAPTURED.labels(camera=recognizer.name).set_function(lambda: capture.frames)
+    FRAMES_DROPPED.labels(camera=recognizer.name).set_function(lambda: frame_q.dropped)
+    PENDING_EVENTS.set_function(lambda: len(writer.q))
+    worker = WorkerThread("recognize", frame_q, recognize_frame, stop, on_idle=flush_batch)
+    for t in (capture, worker, writer):
+        t.start()
+    if gallery_sync:
+        start_gallery_reloader(gallery_sync, matcher, [recognizer], stop)
+    # service managers stop with SIGTERM; shut down like Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: frame_profiler.arm(PROFILE_SIGNAL_FRAMES, "cprofile"))
+        signal.signal(signal.SIGUSR2, lambda *_: frame_profiler.arm(PROFILE_SIGNAL_FRAMES, "sample"))
+
+    shown, latency_sum, stats_since = 0, 0.0, time.time()
+    try:
+        while worker.is_alive():
+            try:
+                frame, captured_at = display_q.get(timeout=0.1)
+            except queue.Empty:
+                if not headless:
+                    cv2.waitKey(1)
+                continue
 
-    cap.release()
-    cv2.destroyAllWindows()
+            shown += 1
+            latency_sum += time.time() - captured_at
+            FRAME_LATENCY.observe(time.time() - captured_at)
+            if time.time() - stats_since >= STATS_INTERVAL_SEC:
+                elapsed = time.time() - stats_since
+                print(f"[STATS] fps={shown / elapsed:.1f} latency_ms={1000 * latency_sum / max(shown, 1):.0f} "
+                      f"dropped frames={frame_q.dropped} events={writer.q.dropped} pending_events={len(writer.q)}")
+                shown, latency_sum, stats_since = 0, 0.0, time.time()
+
+            if preview:
+                preview.publish(frame)
+            if not headless:
+                cv2.imshow("Attendance", frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        capture.join(timeout=2)
+        worker.join(timeout=5)
+        # let queued attendance writes finish before exiting
+        writer.close()
+        writer.join()
+        whatsapp.close(timeout=10)
+        cap.release()
+        if preview:
+            preview.stop()
+        if not headless:
+            cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Live attendance recognition")
+    ap.add_argument("--headless", action="store_true", help="no window and no drawing (RECOGNIZE_HEADLESS=1)")
+    ap.add_argument("--preview-port", type=int, default=None,
+                    help="serve an MJPEG preview of annotated frames on this port (PREVIEW_PORT)")
+    args = ap.parse_args()
+    main(args.headless or None, args.preview_port)
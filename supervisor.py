@@ -0,0 +1,271 @@
+# supervisor.py
+# Multi-camera mode: one deployment covers many gates. Camera sources are spread
+# over worker processes (one per CPU core by default); each worker loads FaceNet and
+# the gallery once and runs all of its cameras. Recognitions come back to this
+# process, which applies one shared cooldown and writes attendance.
+#
+#   python supervisor.py rtsp://10.0.0.5:554/gate1 rtsp://10.0.0.6:554/gate2 0
+#   python supervisor.py gate1.mp4 gate2.mp4 gate3.mp4 --realtime --dry-run events.jsonl
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+STATS_INTERVAL_SEC = 10
+
+
+# ---------------- SOURCES ----------------
+def parse_source(src):
+    """'0' -> device index 0; existing path -> video file; anything else -> URL."""
+    src = str(src)
+    if src.isdigit():
+        return int(src)
+    return src
+
+
+def is_file_source(src):
+    return isinstance(src, str) and os.path.isfile(src)
+
+
+def camera_name(index, src):
+    if isinstance(src, int):
+        return f"cam{index}:dev{src}"
+    return f"cam{index}:{os.path.basename(src.rstrip('/')) or src}"
+
+
+def assign_sources(sources, workers):
+    """Round-robin camera sources over worker processes."""
+    workers = max(1, min(workers, len(sources)))
+    return [sources[i::workers] for i in range(workers)]
+
+
+# ---------------- WORKER PROCESS ----------------
+def limit_threads(threads):
+    """Keep each worker's OpenCV/TensorFlow thread pools within its share of cores."""
+    import cv2
+    cv2.setNumThreads(threads)
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except Exception:
+        pass
+
+
+def worker_main(worker_id, cameras, events, stats, stop, opts):
+    """
+    Runs in a child process. `cameras` is [(name, source)]. All cameras share this
+    process's FaceNet model, gallery matcher and cooldown dict; one recognition loop
+    round-robins over the newest frame of each camera.
+    """
+    limit_threads(opts["threads_per_worker"])
+
+    import cv2
+    import recognize
+    from pipeline import StageQueue, CaptureThread, DROP_OLDEST
+
+    known, gallery_sync = recognize.load_gallery()
+    matcher = recognize.build_matcher(known, getattr(gallery_sync, "matrix", None))
+    recognize.get_embedder()
+    print(f"[INFO] worker {worker_id}: {len(matcher)} faces, cameras={[n for n, _ in cameras]}")
+
+    local_stop = threading.Event()
+    last_seen = {}
+    cams = []
+    for name, src in cameras:
+        cap = cv2.VideoCapture(src)
+        if not cap.isOpened():
+            print(f"[ERROR] worker {worker_id}: cannot open {name} ({src})")
+            continue
+        finite = is_file_source(src)
+        pace = (cap.get(cv2.CAP_PROP_FPS) or 25.0) if finite and opts["realtime"] else None
+        q = StageQueue(name, 1, DROP_OLDEST)
+        capture = CaptureThread(cap, q, local_stop, name=f"capture-{name}",
+                                finite=finite, loop=opts["loop"], pace_fps=pace)
+
+        def record(emp_id, now_dt, cam=name):
+            events.put((cam, emp_id, now_dt))
+
+        cams.append({
+            "name": name, "cap": cap, "q": q, "capture": capture,
+            "recognizer": recognize.CameraRecognizer(matcher, record, last_seen=last_seen,
+                                                     name=name, annotate=False),
+            "processed": 0, "lag_sum": 0.0, "captured_mark": 0, "dropped_mark": 0,
+        })
+
+    for cam in cams:
+        cam["capture"].start()
+    if gallery_sync:
+        recognize.start_gallery_reloader(gallery_sync, matcher, [c["recognizer"] for c in cams], local_stop)
+
+    def account(cam, done):
+        now = time.time()
+        for _, captured_at in done:
+            cam["processed"] += 1
+            cam["lag_sum"] += now - captured_at
+
+    stats_since = time.time()
+    try:
+        while cams and not stop.is_set():
+            idle = True
+            for cam in cams:
+                try:
+                    frame, captured_at = cam["q"].get(timeout=0)
+                except queue.Empty:
+                    account(cam, cam["recognizer"].poll())
+                    continue
+                idle = False
+                account(cam, cam["recognizer"].process(frame, captured_at))
+
+            finished = [c for c in cams if not c["capture"].is_alive() and not len(c["q"])]
+            for cam in finished:
+                account(cam, cam["recognizer"].flush())
+                stats.put((worker_id, cam["name"], {"finished": True}))
+                cams.remove(cam)
+
+            now = time.time()
+            if now - stats_since >= opts["stats_interval"]:
+                elapsed = now - stats_since
+                for cam in cams:
+                    captured = cam["capture"].frames
+                    stats.put((worker_id, cam["name"], {
+                        "fps": cam["processed"] / elapsed,
+                        "capture_fps": (captured - cam["captured_mark"]) / elapsed,
+                        "lag_ms": 1000 * cam["lag_sum"] / cam["processed"] if cam["processed"] else None,
+                        "dropped": cam["q"].dropped - cam["dropped_mark"],
+                    }))
+                    cam.update(processed=0, lag_sum=0.0, captured_mark=captured, dropped_mark=cam["q"].dropped)
+                stats_since = now
+
+            if idle:
+                time.sleep(0.002)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        local_stop.set()
+        for cam in cams:
+            cam["capture"].join(timeout=2)
+            cam["cap"].release()
+
+
+# ---------------- SUPERVISOR ----------------
+def print_stats(latest):
+    print(f"[STATS] {'camera':<28} {'fps':>6} {'capture':>8} {'lag ms':>8} {'dropped':>8}")
+    for name in sorted(latest):
+        s = latest[name]
+        if s.get("finished"):
+            print(f"[STATS] {name:<28} {'finished':>6}")
+            continue
+        lag = f"{s['lag_ms']:.0f}" if s["lag_ms"] is not None else "-"
+        print(f"[STATS] {name:<28} {s['fps']:>6.1f} {s['capture_fps']:>8.1f} {lag:>8} {s['dropped']:>8}")
+
+
+def run(sources, workers=None, loop=False, realtime=False, dry_run=None, stats_interval=STATS_INTERVAL_SEC):
+    cameras = [(camera_name(i, src), src) for i, src in enumerate(sources)]
+    cores = os.cpu_count() or 1
+    groups = assign_sources(cameras, workers or cores)
+    opts = {
+        "loop": loop,
+        "realtime": realtime,
+        "stats_interval": stats_interval,
+        "threads_per_worker": max(1, cores // len(groups)),
+    }
+
+    ctx = mp.get_context("spawn")
+    events, stats, stop = ctx.Queue(), ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=worker_main, args=(i, group, events, stats, stop, opts),
+                         name=f"recognizer-{i}", daemon=True)
+             for i, group in enumerate(groups)]
+    for p in procs:
+        p.start()
+    print(f"[INFO] Supervisor: {len(cameras)} cameras on {len(procs)} worker processes")
+
+    # Imported after the workers are spawned; the parent never loads FaceNet.
+    import recognize
+
+    writer, out = None, None
+    if dry_run:
+        out = open(dry_run, "a", encoding="utf-8")
+    else:
+        writer = recognize.create_attendance_writer()
+        writer.start()
+
+    last_seen = {}
+    latest = {}
+    recorded = 0
+
+    def handle_event(cam, emp_id, now_dt):
+        nonlocal recorded
+        # cross-worker cooldown: the same person seen by two gates is recorded once
+        ts = now_dt.timestamp()
+        if ts - last_seen.get(emp_id, 0) <= recognize.COOLDOWN_SEC:
+            return
+        last_seen[emp_id] = ts
+        recorded += 1
+        if out:
+            out.write(json.dumps({"camera": cam, "emp_id": emp_id, "time": now_dt.isoformat()}) + "\n")
+            out.flush()
+        else:
+            writer.submit(emp_id, now_dt)
+
+    def drain():
+        while True:
+            try:
+                handle_event(*events.get_nowait())
+            except queue.Empty:
+                break
+        while True:
+            try:
+                _, cam, s = stats.get_nowait()
+                latest[cam] = s
+            except queue.Empty:
+                break
+
+    printed_at = time.time()
+    try:
+        while any(p.is_alive() for p in procs):
+            try:
+                handle_event(*events.get(timeout=0.2))
+            except queue.Empty:
+                pass
+            drain()
+            if time.time() - printed_at >= stats_interval and latest:
+                print_stats(latest)
+                printed_at = time.time()
+    except KeyboardInterrupt:
+        print("[INFO] Supervisor stopping...")
+    finally:
+        stop.set()
+        for p in procs:
+            p.join(timeout=10)
+        drain()
+        if latest:
+            print_stats(latest)
+        if writer:
+            writer.close()
+            writer.join()
+            recognize.whatsapp.close(timeout=10)
+        if out:
+            out.close()
+        print(f"[INFO] Supervisor recorded {recorded} attendance events.")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run many camera streams from one recognizer deployment")
+    ap.add_argument("sources", nargs="+", help="RTSP/HTTP URLs, device indexes or video files")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU cores)")
+    ap.add_argument("--loop", action="store_true", help="rewind video files at the end")
+    ap.add_argument("--realtime", action="store_true", help="play video files at their own FPS, like live cameras")
+    ap.add_argument("--dry-run", metavar="FILE", help="append events as JSON lines to FILE instead of the database")
+    ap.add_argument("--stats-interval", type=float, default=STATS_INTERVAL_SEC)
+    args = ap.parse_args(argv)
+    run([parse_source(s) for s in args.sources], args.workers, args.loop, args.realtime,
+        args.dry_run, args.stats_interval)
+
+
+if __name__ == "__main__":
+    main()
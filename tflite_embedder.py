@@ -0,0 +1,99 @@
+# tflite_embedder.py
+# FaceNet on the TensorFlow Lite interpreter, for CPU-only recognition nodes. The
+# .tflite model is produced offline by convert_tflite.py (float32, float16, dynamic-range
+# or full int8). TFLiteFaceNet looks like keras_facenet.FaceNet to the rest of the code:
+# .embeddings(rgb_images), and .model.predict_on_batch(standardized batch) with
+# metadata["fixed_image_standardization"] so BatchEmbedder feeds it directly.
+#
+# The interpreter comes from tflite_runtime / ai_edge_litert when installed (a few MB,
+# no TensorFlow needed on the edge box), otherwise from tensorflow itself.
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+IMG_SIZE = (160, 160)
+
+
+def interpreter_class():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteFaceNet:
+    """
+    Drop-in for keras_facenet.FaceNet backed by a .tflite model.
+
+    Quantized (int8/uint8) inputs and outputs are (de)quantized here with the
+    tensor's scale and zero point, so callers always pass and get float32. The
+    interpreter is not thread-safe; calls are serialized by a lock.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"TFLite model not found: {model_path}")
+        self.model_path = model_path
+        self.interpreter = interpreter_class()(model_path=model_path, num_threads=num_threads)
+        inp = self.interpreter.get_input_details()[0]
+        out = self.interpreter.get_output_details()[0]
+        self._in, self._out = inp["index"], out["index"]
+        self._in_dtype, self._in_quant = inp["dtype"], inp["quantization"]
+        self._out_dtype, self._out_quant = out["dtype"], out["quantization"]
+        self._batch = None
+        self._lock = threading.Lock()
+        self.metadata = {"fixed_image_standardization": True, "backend": "tflite",
+                         "input_dtype": np.dtype(self._in_dtype).name, "path": model_path}
+        self.model = self  # BatchEmbedder calls facenet.model.predict_on_batch
+
+    def _ensure_batch(self, n):
+        if self._batch != n:
+            w, h = IMG_SIZE
+            self.interpreter.resize_tensor_input(self._in, [n, h, w, 3])
+            self.interpreter.allocate_tensors()
+            self._batch = n
+
+    def predict_on_batch(self, batch):
+        """Standardized float32 batch (n, 160, 160, 3) -> (n, 512) float32 embeddings."""
+        x = np.asarray(batch, dtype=np.float32)
+        if self._in_dtype != np.float32:
+            scale, zero = self._in_quant
+            info = np.iinfo(self._in_dtype)
+            x = np.clip(np.round(x / scale + zero), info.min, info.max).astype(self._in_dtype)
+        with self._lock:
+            self._ensure_batch(x.shape[0])
+            self.interpreter.set_tensor(self._in, x)
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self._out)
+        if self._out_dtype != np.float32:
+            scale, zero = self._out_quant
+            return (out.astype(np.float32) - zero) * scale
+        return np.array(out, dtype=np.float32)
+
+    def embeddings(self, images):
+        """RGB uint8 face images (any size) -> (n, 512) float32, like FaceNet.embeddings."""
+        if not len(images):
+            return np.zeros((0, 0), dtype=np.float32)
+        x = np.stack([img if img.shape[:2] == IMG_SIZE[::-1] else cv2.resize(img, IMG_SIZE) for img in images])
+        return self.predict_on_batch((x.astype(np.float32) - 127.5) / 127.5)
+
+
+def load_facenet(backend="keras", tflite_model=None, num_threads=None):
+    """FaceNet for `backend` ("keras" or "tflite"); TensorFlow is only imported for keras."""
+    if backend == "tflite":
+        return TFLiteFaceNet(tflite_model, num_threads)
+    if backend != "keras":
+        raise ValueError(f"Unknown embedding backend '{backend}' (keras, tflite)")
+    from keras_facenet import FaceNet
+    return FaceNet()
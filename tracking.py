@@ -0,0 +1,140 @@
+# tracking.py
+# Lightweight IoU tracker between face detection and embedding: a face that stays in
+# view keeps its identity from frame to frame and is only re-embedded when it is new,
+# when its box changed a lot, or every few frames.
+
+import itertools
+
+import numpy as np
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU of boxes (x1, y1, x2, y2): a is (n, 4), b is (m, 4) -> (n, m)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def iou(a, b):
+    return float(iou_matrix([a], [b])[0, 0])
+
+
+class Track:
+    __slots__ = ("id", "box", "embedded_box", "rec", "score", "since_embed", "misses", "pending")
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.embedded_box = None   # box at the last embedding
+        self.rec = None            # matched gallery record, or None while unknown
+        self.score = 0
+        self.since_embed = 0       # frames since the last embedding was requested
+        self.misses = 0            # consecutive frames without a detection
+        self.pending = False       # embedding requested but not back yet (cross-frame batching)
+
+
+class IoUTracker:
+    """
+    Greedy IoU association of this frame's boxes to live tracks.
+
+    match_iou            minimum IoU to continue a track
+    reembed_iou          re-embed when the box drifted below this IoU of the last embedded box
+    reembed_every        re-embed an identified track every N frames anyway
+    unknown_reembed_every  same for tracks that are still unknown (retry sooner)
+    max_misses           frames a track survives without a detection
+    """
+
+    def __init__(self, match_iou=0.3, reembed_iou=0.5, reembed_every=30,
+                 unknown_reembed_every=5, max_misses=5):
+        self.match_iou = match_iou
+        self.reembed_iou = reembed_iou
+        self.reembed_every = reembed_every
+        self.unknown_reembed_every = unknown_reembed_every
+        self.max_misses = max_misses
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self.stats = {"detections": 0, "embedded": 0, "reused": 0}
+
+    def update(self, boxes):
+        """Associate boxes with tracks; returns the Track for each box, in order."""
+        assigned = [None] * len(boxes)
+        ious = iou_matrix(boxes, [t.box for t in self.tracks])
+        used = set()
+        if ious.size:
+            # greedy: best overlapping pairs first
+            for flat in np.argsort(-ious, axis=None):
+                i, j = divmod(int(flat), ious.shape[1])
+                if ious[i, j] < self.match_iou:
+                    break
+                if assigned[i] is not None or j in used:
+                    continue
+                assigned[i] = self.tracks[j]
+                used.add(j)
+
+        for j, t in enumerate(self.tracks):
+            if j not in used:
+                t.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for i, box in enumerate(boxes):
+            t = assigned[i]
+            if t is None:
+                t = Track(next(self._ids), box)
+                self.tracks.append(t)
+                assigned[i] = t
+            else:
+                t.box = box
+                t.misses = 0
+                t.since_embed += 1
+        self.stats["detections"] += len(boxes)
+        return assigned
+
+    def needs_embedding(self, track):
+        if track.pending:
+            return False
+        if track.embedded_box is None:
+            return True
+        every = self.reembed_every if track.rec else self.unknown_reembed_every
+        if track.since_embed >= every:
+            return True
+        return iou(track.box, track.embedded_box) < self.reembed_iou
+
+    def mark_embedding(self, track):
+        """Call when the track's crop is sent for embedding."""
+        track.pending = True
+        track.embedded_box = track.box
+        track.since_embed = 0
+        self.stats["embedded"] += 1
+
+    def abandon_embedding(self, track):
+        """Call when a requested embedding or its match failed: re-embed on the next detection."""
+        track.pending = False
+        track.embedded_box = None
+
+    def mark_reused(self, n=1):
+        self.stats["reused"] += n
+
+    def invalidate(self, emp_ids):
+        """
+        After a gallery change: tracks identified as one of `emp_ids`, and tracks that
+        are still unknown, are re-embedded on their next detection.
+        """
+        for t in self.tracks:
+            if t.rec is None or t.rec["id"] in emp_ids:
+                t.rec, t.score = None, 0
+                t.embedded_box = None
+
+    def set_identity(self, track, rec, score):
+        track.rec = rec
+        track.score = score
+        track.pending = False